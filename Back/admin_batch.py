@@ -0,0 +1,138 @@
+"""All-or-nothing admin changes (`POST /api/admin/batch`).
+
+A batch is an ordered list of project and skill operations. They are
+applied one after the other to a single draft of each document involved
+(`JsonDocument.transaction(deep=False)`), and each document is persisted
+once at the end. If any operation fails (unknown id, duplicate skill,
+...) the transactions are abandoned and nothing is written, so a batch of
+N operations costs one file rewrite instead of N, and never leaves half
+of an import behind.
+
+While the batch runs, projects are held in an id-keyed dict, so every
+operation except a move is O(1). A batch that touches both documents
+writes skills.json and then projects.json; each write is atomic on its
+own, but there is no atomic commit across the two files.
+"""
+import contextlib
+
+from content_store import new_project_id
+
+
+class BatchError(Exception):
+    def __init__(self, index, status_code, detail):
+        super().__init__(detail)
+        self.index = index
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _ProjectsDraft:
+    def __init__(self, projects):
+        self.by_id = {project['id']: project for project in projects}
+        self.added = 0
+        self.removed = 0
+
+    def _require(self, project_id):
+        if project_id not in self.by_id:
+            raise LookupError('Project not found')
+
+    def add(self, op):
+        project = {**op['project'], 'id': new_project_id()}
+        self.by_id[project['id']] = project
+        self.added += 1
+        return {"id": project['id'], "status": 201}
+
+    def update(self, op):
+        self._require(op['id'])
+        self.by_id[op['id']] = {**op['project'], 'id': op['id']}
+        return {"id": op['id'], "status": 200}
+
+    def delete(self, op):
+        self._require(op['id'])
+        del self.by_id[op['id']]
+        self.removed += 1
+        return {"id": op['id'], "status": 200}
+
+    def move(self, op):
+        self._require(op['id'])
+        order = [project_id for project_id in self.by_id if project_id != op['id']]
+        position = max(0, min(op['position'], len(order)))
+        order.insert(position, op['id'])
+        self.by_id = {project_id: self.by_id[project_id] for project_id in order}
+        return {"id": op['id'], "status": 200, "position": position}
+
+
+class _SkillsDraft:
+    def __init__(self, skills):
+        self.skills = skills
+        self._copied = set()
+
+    def _category(self, name, create=False):
+        # Copy-on-write, once per category per batch: the maps are shared with the published snapshot
+        if name not in self._copied:
+            if name not in self.skills and not create:
+                raise LookupError('Category not found')
+            self.skills[name] = dict(self.skills.get(name, {}))
+            self._copied.add(name)
+        return self.skills[name]
+
+    def add(self, op):
+        skills = self._category(op['category'], create=True)
+        if op['skill']['name'] in skills:
+            raise ValueError('Skill already exists')
+        skills[op['skill']['name']] = op['skill']
+        return {"category": op['category'], "name": op['skill']['name'], "status": 201}
+
+    def update(self, op):
+        skills = self._category(op['category'])
+        name, new_name = op['name'], op['skill']['name']
+        if name not in skills:
+            raise LookupError('Skill not found')
+        if new_name != name and new_name in skills:
+            raise ValueError('Skill already exists')
+        if new_name == name:
+            skills[name] = op['skill']
+        else:
+            renamed = {(new_name if key == name else key): (op['skill'] if key == name else value)
+                       for key, value in skills.items()}
+            skills.clear()
+            skills.update(renamed)
+        return {"category": op['category'], "name": new_name, "status": 200}
+
+    def delete(self, op):
+        skills = self._category(op['category'])
+        if skills.pop(op['name'], None) is None:
+            raise LookupError('Skill not found')
+        return {"category": op['category'], "name": op['name'], "status": 200}
+
+
+async def apply_batch(content_store, operations):
+    """Apply `operations` (validated dicts with an "op" key) atomically.
+
+    Returns `(results, projects_delta)`; raises `BatchError` for the first
+    operation that cannot be applied, in which case nothing is persisted.
+    """
+    needs_projects = any(op['op'].endswith('_project') for op in operations)
+    needs_skills = any(op['op'].endswith('_skill') for op in operations)
+    results = []
+    async with contextlib.AsyncExitStack() as stack:
+        # Always projects before skills, so concurrent batches cannot deadlock
+        projects = skills = None
+        if needs_projects:
+            draft = await stack.enter_async_context(content_store.projects.transaction(deep=False))
+            projects = _ProjectsDraft(draft)
+        if needs_skills:
+            skills = _SkillsDraft(await stack.enter_async_context(content_store.skills.transaction(deep=False)))
+        for index, op in enumerate(operations):
+            kind, _, target = op['op'].partition('_')
+            handler = getattr(projects if target == 'project' else skills, kind)
+            try:
+                results.append({"op": op['op'], **handler(op)})
+            except LookupError as e:
+                raise BatchError(index, 404, str(e))
+            except ValueError as e:
+                raise BatchError(index, 409, str(e))
+        if projects is not None:
+            draft[:] = projects.by_id.values()
+    delta = projects.added - projects.removed if projects is not None else 0
+    return results, delta
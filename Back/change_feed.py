@@ -0,0 +1,231 @@
+"""Server-Sent Events feed of content changes (`GET /api/events`).
+
+Every committed change to projects, skills or recommendations becomes one
+event carrying the document's new version and a compact diff:
+
+    id: 3f9a1c2b-17
+    event: projects
+    data: {"version":12,"upserted":{"p1a2b3c4d5e6":{...}},"removed":[]}
+
+Fan-out is built so that idle subscribers cost next to nothing:
+
+* an event is encoded once and appended to a shared ring buffer
+  (`EVENTS_BUFFER` entries); there is no per-subscriber queue;
+* subscribers wait on one shared `asyncio.Event` per generation, which
+  publishing (or the single heartbeat ticker) sets and replaces, waking
+  everybody at once; each then sends what it has not seen yet from the
+  buffer;
+* heartbeats (an SSE comment every `EVENTS_HEARTBEAT` seconds) come from
+  that one ticker, not from a timer per connection.
+
+Each worker publishes what its own documents see. So that writes made by
+other workers (or processes) show up too, the ticker also checks every
+watched document for a new version each `EVENTS_POLL_INTERVAL` seconds
+(a `stat` of the file when nothing changed).
+
+Reconnecting clients send `Last-Event-ID` and get the events they missed
+from the buffer. If those are gone (too old, or another process/restart:
+ids carry a per-process epoch), they get a `reset` event and should
+refetch the documents.
+
+`publish` may be called from any thread (document listeners run in the
+thread that saved or reloaded the document).
+
+An open stream never ends by itself, and uvicorn only runs the shutdown
+hooks (`stop`) once every connection has finished: its
+`timeout_graceful_shutdown` bounds that wait (see uvicorn_worker.py).
+"""
+import asyncio
+import collections
+import logging
+import os
+import secrets
+
+import fast_json
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "512"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "10000"))
+# Reconnection delay suggested to EventSource clients (ms)
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+
+
+def diff_map(old, new):
+    """Changes from one ordered mapping to another; `order` only when it moved."""
+    upserted = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    if not upserted and not removed and list(old) == list(new):
+        return None
+    changes = {"upserted": upserted, "removed": removed}
+    expected = [key for key in old if key in new] + [key for key in new if key not in old]
+    if list(new) != expected:
+        changes["order"] = list(new)
+    return changes
+
+
+def project_changes(previous, snapshot):
+    old = {project['id']: project for project in previous.data}
+    new = {project['id']: project for project in snapshot.data}
+    return diff_map(old, new)
+
+
+def recommendation_changes(previous, snapshot):
+    # The outbox journal is append-only
+    added = list(snapshot.data[len(previous.data):])
+    return {"added": added} if added else None
+
+
+def skill_changes(previous, snapshot):
+    categories = {}
+    for category, skills in snapshot.data.items():
+        changes = diff_map(previous.data.get(category, {}), skills)
+        if changes is not None:
+            categories[category] = changes
+    removed = [category for category in previous.data if category not in snapshot.data]
+    if not categories and not removed:
+        return None
+    return {"categories": categories, "removed_categories": removed}
+
+
+class ChangeFeed:
+    def __init__(self, buffer_size=EVENTS_BUFFER, heartbeat=EVENTS_HEARTBEAT, poll_interval=EVENTS_POLL_INTERVAL):
+        self.epoch = secrets.token_hex(4)
+        self.heartbeat = heartbeat
+        self.poll_interval = poll_interval
+        self.subscribers = 0
+        self.published = 0
+        self.closed = False
+        self._seq = 0
+        self._buffer = collections.deque(maxlen=buffer_size)  # (seq, encoded event)
+        self._wakeup = asyncio.Event()
+        self._loop = None
+        self._ticker = None
+        self._sources = []  # snapshot() of every watched document
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.closed = False
+        self._ticker = asyncio.create_task(self._tick())
+
+    async def stop(self):
+        """End every open stream."""
+        self.closed = True
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        self._wake()
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat
+        while True:
+            await asyncio.sleep(max(0, min(self.poll_interval, next_heartbeat - loop.time())))
+            if self._sources:
+                # New versions written by other workers; their listeners publish
+                await asyncio.to_thread(self._poll)
+            if loop.time() >= next_heartbeat:
+                next_heartbeat = loop.time() + self.heartbeat
+                self._wake()
+
+    def _poll(self):
+        for snapshot in self._sources:
+            try:
+                snapshot()
+            except Exception:
+                logger.exception("Could not check %s for changes", snapshot)
+
+    def _wake(self):
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def watch(self, document, name, changes_of, snapshot=None):
+        """Publish `changes_of(previous, snapshot)` for every new version of `document`.
+
+        `snapshot` (default `document.snapshot`) is called by the ticker to
+        pick up versions written by other processes.
+        """
+        self._sources.append(snapshot or document.snapshot)
+        def on_publish(previous, snapshot):
+            if previous is None:
+                return  # first load, not a change
+            changes = changes_of(previous, snapshot)
+            if changes is not None:
+                self.publish(name, {"version": snapshot.version, **changes})
+        document.subscribe(on_publish)
+
+    def publish(self, event, data):
+        """Queue an event for every subscriber; callable from any thread."""
+        loop = self._loop
+        if loop is None or self.closed:
+            return
+        # Encoded once here, in the caller's thread; subscribers share the bytes
+        body = f"event: {event}\ndata: ".encode() + fast_json.dumps(data) + b"\n\n"
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._append(body)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._append, body)
+            except RuntimeError:
+                pass  # loop already closed (shutdown)
+
+    def _append(self, body):
+        self._seq += 1
+        self.published += 1
+        self._buffer.append((self._seq, f"id: {self.epoch}-{self._seq}\n".encode() + body))
+        self._wake()
+
+    def _resume_after(self, last_event_id):
+        """Sequence number to resume after, or None if the client must refetch."""
+        if not last_event_id:
+            return self._seq
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+        return int(seq) if int(seq) >= oldest - 1 else None
+
+    def _events_after(self, seq):
+        if seq == self._seq:
+            return []
+        oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+        if seq < oldest - 1:
+            return None  # fell behind the buffer
+        start = seq - oldest + 1
+        return [self._buffer[i] for i in range(start, len(self._buffer))]
+
+    def _reset(self):
+        return f"id: {self.epoch}-{self._seq}\nevent: reset\ndata: {{}}\n\n".encode("utf-8")
+
+    async def stream(self, last_event_id=None):
+        """The byte stream of one subscriber."""
+        self.subscribers += 1
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+            seq = self._resume_after(last_event_id)
+            if seq is None:
+                seq = self._seq
+                yield self._reset()
+            while not self.closed:
+                # Take the event before reading the buffer, so no publish is missed
+                wakeup = self._wakeup
+                pending = self._events_after(seq)
+                if pending is None:
+                    seq = self._seq
+                    yield self._reset()
+                    continue
+                if pending:
+                    seq = pending[-1][0]
+                    yield b"".join(encoded for _, encoded in pending)
+                    continue
+                await wakeup.wait()
+                if not self.closed and self._seq == seq:
+                    yield b": heartbeat\n\n"
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,131 @@
+"""Response compression (brotli / gzip) negotiated from `Accept-Encoding`.
+
+`CompressionMiddleware` compresses single-message responses of textual
+types above `COMPRESS_MIN_SIZE` bytes. Streaming responses, files and
+anything that already has a `Content-Encoding` pass through untouched:
+the cached read endpoints compress their `CachedBody` once per data
+version (see `http_cache`), and `/cv` serves precompressed siblings.
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli not installed: gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Per-request compression favours speed; cached bodies are compressed once, at the max level
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+_COMPRESSIBLE = ("application/json", "application/javascript", "image/svg+xml")
+
+
+def accepted_values(header):
+    """Values listed with q > 0 in an `Accept`-style header (content-codings, media types)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate(accept_encoding):
+    """Best coding we can produce for the client: "br", "gzip" or None."""
+    accepted = accepted_values(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", ())}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not is_compressible(content_type):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            raw_headers = [(k, v) for k, v in start.get("headers", ()) if k.lower() != b"vary"]
+            vary = [v for k, v in start.get("headers", ()) if k.lower() == b"vary"]
+            if b"accept-encoding" not in b", ".join(vary).lower():
+                vary.append(b"Accept-Encoding")
+            raw_headers.append((b"vary", b", ".join(vary)))
+            passthrough = True
+            if message.get("more_body") or len(body) < self.minimum_size:
+                # Streaming or too small to be worth it
+                await send({**start, "headers": raw_headers})
+                await send(message)
+                return
+            compressed = compress(body, encoding)
+            headers = []
+            for name, value in raw_headers:
+                name = name.lower()
+                if name == b"content-length":
+                    value = str(len(compressed)).encode()
+                elif name == b"etag" and value.startswith(b'"'):
+                    # Strong validators must differ per representation
+                    value = value[:-1] + b"-" + encoding.encode() + b'"'
+                headers.append((name, value))
+            headers.append((b"content-encoding", encoding.encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,326 @@
+"""In-memory cache for the JSON documents under `Back/data`.
+
+Each document is parsed once and kept in memory together with its
+serialized form. Reads only pay for an `os.stat`: the cached snapshot is
+reused while the file's (mtime, size, inode) signature is unchanged, so an
+edit made directly on the volume is picked up on the next request.
+
+Admin mutations go through `JsonDocument.transaction()`, which serializes
+writers (an asyncio lock inside the process plus an advisory lock file
+across uvicorn workers), writes a temp file that is fsynced and moved into
+place with `os.replace`, and then publishes the new snapshot. Readers
+always see either the old or the new document, never a partial one.
+State that is maintained incrementally from a document (the search index)
+`subscribe`s to be told about every new snapshot.
+"""
+import asyncio
+import contextlib
+import copy
+import hashlib
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+
+import fast_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class Snapshot:
+    """An immutable view of one version of a document.
+
+    `data` is shared by every reader and must never be mutated in place.
+    Values computed from it (serialized bytes, indexes, ...) are memoized
+    with `derive` and disappear together with the snapshot.
+    """
+
+    __slots__ = ('data', 'version', 'signature', '_derived', '_lock')
+
+    def __init__(self, data, version, signature):
+        self.data = data
+        self.version = version
+        self.signature = signature
+        self._derived = {}
+        # Re-entrant: a derived value may be built from another one
+        self._lock = threading.RLock()
+
+    def derive(self, key, build):
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self.data)
+            return self._derived[key]
+
+    @property
+    def body(self):
+        """Compact UTF-8 JSON for `data`."""
+        return self.derive('body', fast_json.dumps)
+
+
+class JsonDocument:
+    """A JSON file cached in memory and reloaded when it changes on disk."""
+
+    def __init__(self, path, default, normalize=None, serialize=None):
+        self.path = path
+        self.default = default
+        # normalize: file contents -> in-memory shape; serialize: the reverse
+        self.normalize = normalize or (lambda data: data)
+        self.serialize = serialize or (lambda data: data)
+        self.reloads = 0
+        self._version = 0
+        self._snapshot = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._write_lock = asyncio.Lock()
+
+    def snapshot(self):
+        current = self._snapshot
+        signature = _file_signature(self.path)
+        if current is not None and signature == current.signature:
+            return current
+        with self._lock:
+            current = self._snapshot
+            if current is not None and signature == current.signature:
+                return current
+            return self._reload(signature)
+
+    @property
+    def data(self):
+        return self.snapshot().data
+
+    def subscribe(self, listener):
+        """Call `listener(previous, snapshot)` for every new version (saved here or reloaded from disk).
+
+        Listeners run in order, with the document lock held, so they must be
+        quick; `previous` is None for the first call, made right away when
+        a version is already loaded.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._snapshot is not None:
+                self._notify(listener, None, self._snapshot)
+        return listener
+
+    def _notify(self, listener, previous, snapshot):
+        try:
+            listener(previous, snapshot)
+        except Exception:
+            logger.exception("Listener of %s failed", os.path.basename(self.path))
+
+    def _publish(self, snapshot):
+        """Make `snapshot` current (call with the lock held)."""
+        previous, self._snapshot = self._snapshot, snapshot
+        for listener in self._listeners:
+            self._notify(listener, previous, snapshot)
+        return snapshot
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next read goes back to disk."""
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.signature = None
+
+    def _reload(self, signature):
+        try:
+            with open(self.path, 'rb') as f:
+                data = self.normalize(fast_json.loads(f.read()))
+        except Exception as e:
+            logger.error("Could not load %s: %s", os.path.basename(self.path), e, extra={"path": self.path})
+            # Keep serving the last good version while a broken file is on disk
+            if self._snapshot is not None:
+                self._snapshot.signature = signature
+                return self._snapshot
+            data = self.default()
+        self._version += 1
+        self.reloads += 1
+        return self._publish(Snapshot(data, self._version, signature))
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, deep=True):
+        """Read-modify-write the document as one atomic step.
+
+        Yields a private deep copy of the latest data; mutate it in place.
+        When the block exits normally the copy is persisted and published,
+        if it raises nothing is written.
+
+            async with content_store.projects.transaction() as projects:
+                projects.append(project_dict)
+
+        With `deep=False` only the top-level container is copied, which is
+        much cheaper for large documents: entries are shared with the
+        current snapshot, so replace them instead of mutating them.
+        """
+        async with self._write_lock:
+            lock = FileLock(self.path + '.lock')
+            await asyncio.to_thread(lock.acquire)
+            try:
+                # Another worker may have written since our last read
+                data = self.snapshot().data
+                draft = copy.deepcopy(data) if deep else copy.copy(data)
+                yield draft
+                await asyncio.to_thread(self._persist, draft)
+            finally:
+                lock.release()
+
+    def _persist(self, data):
+        _atomic_write_json(self.path, self.serialize(data))
+        data = self.normalize(data)
+        with self._lock:
+            self._version += 1
+            return self._publish(Snapshot(data, self._version, _file_signature(self.path)))
+
+
+class FileLock:
+    """Advisory exclusive lock shared by every process using the same path."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _atomic_write_json(path, data):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(fast_json.dumps_pretty(data))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # mkstemp creates 0600 files; keep the permissions of the file we replace
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def new_project_id():
+    return 'p' + secrets.token_hex(6)
+
+
+def _assign_project_ids(projects):
+    """Give every project a unique `id`.
+
+    Projects saved before ids existed get one derived from their content,
+    so every worker computes the same id; it is written to disk with the
+    next transaction and stays fixed from then on.
+    """
+    seen = set()
+    for project in projects:
+        if not isinstance(project, dict):
+            continue
+        project_id = project.get('id')
+        if not isinstance(project_id, str) or not project_id or project_id in seen:
+            digest = hashlib.sha256(json.dumps(project, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+            project_id = 'p' + digest[:12]
+            suffix = 1
+            while project_id in seen:
+                suffix += 1
+                project_id = f"p{digest[:12]}-{suffix}"
+            project['id'] = project_id
+        seen.add(project_id)
+    return projects
+
+
+def project_positions(projects):
+    """id -> position in the list (derived once per snapshot)."""
+    return {project['id']: position for position, project in enumerate(projects) if isinstance(project, dict)}
+
+
+def _normalize_projects(data):
+    if isinstance(data, list):
+        return _assign_project_ids(data)
+    if isinstance(data, dict):
+        for k in ('projects', 'data', 'items'):
+            if k in data and isinstance(data[k], list):
+                return _assign_project_ids(data[k])
+    return []
+
+
+def _normalize_skills(data):
+    """`{category: [skill, ...]}` -> `{category: {name: skill}}`, keeping the order.
+
+    Entries without a name (or with a repeated one) get a synthetic key
+    ("#3", "React#2") so nothing in the file is lost on the next write.
+    """
+    if not isinstance(data, dict):
+        return {}
+    skills = {}
+    for category, items in data.items():
+        if isinstance(items, dict):
+            # Already indexed (a draft being published)
+            skills[category] = items
+            continue
+        by_name = {}
+        for position, skill in enumerate(items if isinstance(items, list) else ()):
+            name = skill.get('name') if isinstance(skill, dict) else None
+            key = name if isinstance(name, str) and name else f"#{position}"
+            unique, suffix = key, 1
+            while unique in by_name:
+                suffix += 1
+                unique = f"{key}#{suffix}"
+            by_name[unique] = skill
+        skills[category] = by_name
+    return skills
+
+
+def _serialize_skills(skills):
+    return {category: list(by_name.values()) for category, by_name in skills.items()}
+
+
+class ContentStore:
+    """The documents served by the public read endpoints."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.projects = JsonDocument(os.path.join(data_dir, 'projects.json'), list, _normalize_projects)
+        # In memory: category -> {name: skill}; on disk (and in /api/skills): category -> [skill, ...]
+        self.skills = JsonDocument(os.path.join(data_dir, 'skills.json'), dict, _normalize_skills, _serialize_skills)
+
+    def documents(self):
+        return (self.projects, self.skills)
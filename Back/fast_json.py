@@ -0,0 +1,146 @@
+"""JSON encoding for responses and data files.
+
+Everything the app serializes itself (response bodies, projects.json /
+skills.json, the outbox journal) goes through `dumps` / `loads` here.
+They use orjson when it is installed (about 10x faster than the stdlib
+at encoding, see scripts/bench_json.py) and fall back to `json`
+otherwise; `JSON_BACKEND=json` forces the stdlib. Both backends produce
+the same bytes: compact UTF-8 without ASCII escaping, or 2-space
+indentation for the data files.
+
+`FastJSONResponse` is the app's default response class, and
+`exact_shape(Model)` tells whether stored records already look exactly
+like the model's JSON dump (everything the API writes does), so they can
+be encoded without another round of pydantic validation.
+"""
+import itertools
+import json
+import os
+import typing
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson not installed: stdlib json only
+    orjson = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson is not None else "json")
+if JSON_BACKEND not in ("orjson", "json") or (JSON_BACKEND == "orjson" and orjson is None):
+    JSON_BACKEND = "json"
+
+if JSON_BACKEND == "orjson":
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        """Compact UTF-8 JSON."""
+        try:
+            return orjson.dumps(data, option=_OPTIONS)
+        except TypeError:
+            # Integers beyond 64 bits and other types only the stdlib handles
+            return _std_dumps(data)
+
+    def dumps_pretty(data):
+        """JSON indented by 2 spaces (data files)."""
+        try:
+            return orjson.dumps(data, option=_OPTIONS | orjson.OPT_INDENT_2)
+        except TypeError:
+            return _std_dumps_pretty(data)
+
+    loads = orjson.loads
+else:
+    def dumps(data):
+        """Compact UTF-8 JSON."""
+        return _std_dumps(data)
+
+    def dumps_pretty(data):
+        """JSON indented by 2 spaces (data files)."""
+        return _std_dumps_pretty(data)
+
+    loads = json.loads
+
+
+def _std_dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _std_dumps_pretty(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _json_types(annotation):
+    """[(type, item types)] a value of `annotation` can have in its JSON dump, or None if unsupported."""
+    if annotation in (str, int, bool):
+        return [(annotation, None)]
+    if annotation is float:
+        return [(float, None), (int, None)]
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union and len(args) == 2 and type(None) in args:
+        inner = _json_types(args[0] if args[1] is type(None) else args[1])
+        return inner and inner + [(type(None), None)]
+    if origin is list and len(args) == 1:
+        items = _json_types(args[0])
+        if items and all(item_types is None for _, item_types in items):
+            return [(list, frozenset(item for item, _ in items))]
+    return None
+
+
+class ExactShape:
+    """Tells whether records already look exactly like `model`'s JSON dump.
+
+    A record passes when it is a dict with exactly the model's fields, in
+    order, and values of the declared types: encoding it directly then
+    gives the same bytes as validating and dumping it.
+    """
+
+    def __init__(self, model, options):
+        self.fields = tuple(model.model_fields)
+        # Every allowed combination of value types, compared in one go
+        self._shapes = frozenset(itertools.product(*([value_type for value_type, _ in option] for option in options)))
+        self._lists = tuple((name, item_types) for name, option in zip(self.fields, options)
+                            for value_type, item_types in option if value_type is list)
+        self._known = {}
+
+    def __call__(self, record):
+        return (type(record) is dict and tuple(record) == self.fields
+                and tuple(map(type, record.values())) in self._shapes
+                and all(type(record[name]) is not list or set(map(type, record[name])) <= item_types
+                        for name, item_types in self._lists))
+
+    def all(self, records):
+        """`all(map(self, records))`, checking only records not seen by the previous call.
+
+        Stored records are never mutated and are shared between versions of
+        a document, so after a write only the new or replaced ones are
+        checked. The previous call's records are kept alive, so their ids
+        cannot be reused.
+        """
+        known = self._known
+        seen = {}
+        for record in records:
+            key = id(record)
+            if known.get(key) is not record and not self(record):
+                return False
+            seen[key] = record
+        self._known = seen
+        return True
+
+
+def exact_shape(model):
+    """An `ExactShape` for `model`, or None when validating is the better path.
+
+    None when the model uses types the check does not know, and with the
+    stdlib backend, whose encoder is slower than pydantic's.
+    """
+    if JSON_BACKEND != "orjson":
+        return None
+    options = [_json_types(field.annotation) for field in model.model_fields.values()]
+    if not all(options):
+        return None
+    return ExactShape(model, options)
@@ -0,0 +1,79 @@
+# Configuração de produção: gunicorn a gerir workers uvicorn (uvloop + httptools)
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# Tudo é configurável por variáveis de ambiente (ver abaixo). Reload sem
+# downtime: `kill -HUP <pid do master>` arranca workers novos com o código
+# atual e termina os antigos depois de acabarem os pedidos em curso.
+#
+# Throughput medido em GET /api/projects (scripts/bench_workers.py, 64
+# ligações keep-alive, 10 s), numa máquina de 1 CPU partilhada com o
+# gerador de carga:
+#
+#   uvicorn main:app, 1 processo (CMD anterior)   2651 req/s, p99  68 ms
+#   gunicorn, 1 worker (uvloop + httptools)       2779 req/s, p99  67 ms
+#   gunicorn, 2 workers                           1914 req/s, p99 193 ms
+#
+# Numa só CPU mais workers só competem pelo mesmo core, por isso o número
+# de workers segue as CPUs disponíveis (a máquina shared-cpu-1x fica com 1);
+# o ganho vem em máquinas com mais cores. Correr o script na máquina alvo
+# para números comparáveis.
+import glob
+import os
+import tempfile
+
+
+def _available_cpus():
+    try:
+        # Respeita cpusets / limites do container
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# UvicornWorker com uvloop + httptools (ver uvicorn_worker.py)
+worker_class = "uvicorn_worker.PortfolioWorker"
+# Workers async: um por CPU (cada um é um event loop single-threaded)
+workers = int(os.getenv("WEB_CONCURRENCY", str(_available_cpus())))
+
+# Keep-alive acima do idle timeout do proxy à frente, para que ele nunca
+# reutilize uma ligação que o worker já fechou
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+backlog = int(os.getenv("GUNICORN_BACKLOG", "2048"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Tempo para acabar pedidos em curso e esvaziar a fila de emails no shutdown/reload
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Carregar a app no master antes do fork (arranque mais rápido, memória
+# partilhada). Threads não sobrevivem ao fork: o que o import arranca no
+# master tem de ser recriado em cada worker (o listener dos logs fá-lo com
+# os.register_at_fork, ver structured_logging.py). Com preload, HUP não
+# recarrega o código.
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# States OAuth / tokens admin têm de ser partilhados entre workers
+if workers > 1:
+    os.environ.setdefault("SESSION_STORE", "sqlite")
+    # /metrics soma os ficheiros que cada worker escreve aqui (ver metrics.py)
+    os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"portfolio-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    # Métricas de uma execução anterior no mesmo diretório não contam para esta
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.unlink(path)
+
+
+def when_ready(server):
+    server.log.info("Portfolio API: %d worker(s), session store=%s, preload=%s, metrics dir=%s",
+                    workers, os.getenv("SESSION_STORE", "memory"), preload_app, os.getenv("METRICS_DIR"))
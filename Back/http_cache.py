@@ -0,0 +1,81 @@
+"""Pre-serialized JSON responses with strong ETags.
+
+The read endpoints build a `CachedBody` once per data version and answer
+every request from it: a matching `If-None-Match` gets `304 Not Modified`,
+anything else gets the stored bytes, with no model validation or JSON
+encoding on the request path. Brotli / gzip variants are compressed the
+first time a client asks for them and kept on the `CachedBody`, so each
+data version is compressed at most once per coding.
+"""
+import hashlib
+import threading
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import fast_json
+from compression import COMPRESS_MIN_SIZE, compress, negotiate
+from metrics import registry
+
+
+class CachedBody:
+    """JSON bytes plus the strong ETag derived from their content hash."""
+
+    __slots__ = ('body', 'etag', '_encoded', '_lock')
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """`body` compressed with `encoding` ("br" / "gzip"), memoized."""
+        if encoding is None:
+            return self.body
+        cached = self._encoded.get(encoding)
+        if cached is None:
+            with self._lock:
+                cached = self._encoded.get(encoding)
+                if cached is None:
+                    registry.inc("compressed_body_cache_total", (("result", "miss"),))
+                    cached = self._encoded[encoding] = compress(self.body, encoding, best=True)
+                    return cached
+        registry.inc("compressed_body_cache_total", (("result", "hit"),))
+        return cached
+
+    def etag_for(self, encoding):
+        # Each representation gets its own strong validator
+        return self.etag if encoding is None else self.etag[:-1] + '-' + encoding + '"'
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(fast_json.dumps(data))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        # If-None-Match uses the weak comparison function (RFC 9110 13.1.2)
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_json_response(request: Request, cached: CachedBody) -> Response:
+    encoding = None
+    if len(cached.body) >= COMPRESS_MIN_SIZE:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+    etag = cached.etag_for(encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        registry.inc("http_cache_not_modified_total")
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=cached.encoded(encoding), media_type="application/json", headers=headers)
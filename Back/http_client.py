@@ -0,0 +1,107 @@
+"""Shared async HTTP client for the GitHub / Google OAuth round trips.
+
+One `httpx.AsyncClient` is created at startup and reused by every handler,
+so connections to the OAuth hosts stay alive between requests instead of
+blocking the event loop on a fresh synchronous `requests` call each time.
+The media proxy streams remote images through the same client.
+"""
+import asyncio
+import contextlib
+import importlib.util
+import os
+import time
+import urllib.parse
+
+import httpx
+
+from metrics import registry
+
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_PER_HOST = int(os.getenv("UPSTREAM_MAX_PER_HOST", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class UpstreamClient:
+    """Pooled keep-alive client with a connection cap per upstream host."""
+
+    def __init__(self, max_per_host=UPSTREAM_MAX_PER_HOST):
+        self.max_per_host = max_per_host
+        self._client = None
+        self._loop = None
+        self._host_limits = {}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            # Pooled connections belong to the loop that opened them
+            self._client = None
+            self._host_limits = {}
+        if self._client is None:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS,
+                    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+            )
+
+    async def close(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    def _host_limit(self, host):
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return limit
+
+    async def request(self, method, url, **kwargs) -> httpx.Response:
+        # Startup hooks do not run everywhere (e.g. a bare TestClient)
+        await self.start()
+        host = urllib.parse.urlsplit(url).netloc
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._host_limit(host):
+                response = await self._client.request(method, url, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            _record(host, method, start, outcome)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Like `request`, but the body is read by the caller (`response.aiter_bytes()`)."""
+        await self.start()
+        host = urllib.parse.urlsplit(url).netloc
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._host_limit(host):
+                async with self._client.stream(method, url, **kwargs) as response:
+                    outcome = str(response.status_code)
+                    yield response
+        finally:
+            _record(host, method, start, outcome)
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+def _record(host, method, start, outcome):
+    # Includes the wait for a free per-host slot: the latency the handler sees
+    labels = (("host", host), ("method", method))
+    registry.observe("upstream_request_duration_seconds", time.perf_counter() - start, labels)
+    registry.inc("upstream_requests_total", labels + (("outcome", outcome),))
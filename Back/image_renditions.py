@@ -0,0 +1,235 @@
+"""Resized / re-encoded renditions of the hero image.
+
+After an upload the source image is rendered, in a process pool, into a
+set of width buckets and formats (AVIF when the Pillow AVIF plugin is
+installed, WebP, and the original format). Renditions live under
+`<hero_dir>/renditions/<fingerprint of the source>/`, so uploading the
+same image again reuses them. `current.json` points at the active set;
+beyond `HERO_KEEP_SETS` sets, the least recently used ones are deleted.
+`pick` chooses the best file for a request's `Accept` header and width.
+
+Pillow is optional: without it only the original upload is served.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from compression import accepted_values
+from static_assets import fingerprint
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow not installed: serve originals only
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF encoder with Pillow)
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+HERO_WIDTHS = tuple(int(w) for w in os.getenv("HERO_WIDTHS", "480,768,1080,1600").split(",") if w.strip())
+HERO_QUALITY = int(os.getenv("HERO_QUALITY", "80"))
+# Rendition sets kept on disk (the current one included), most recently used first
+HERO_KEEP_SETS = max(1, int(os.getenv("HERO_KEEP_SETS", "3")))
+
+CONTENT_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+_EXTENSIONS = {"avif": ".avif", "webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+
+
+def available_formats():
+    """Modern formats Pillow can encode here, best first."""
+    if Image is None:
+        return ()
+    Image.init()
+    return tuple(fmt for fmt in ("avif", "webp") if fmt.upper() in Image.SAVE)
+
+
+def _render(source_path, out_dir, widths, formats, quality):
+    """Process-pool entry point: write every rendition and return the manifest."""
+    with Image.open(source_path) as im:
+        im = ImageOps.exif_transpose(im)
+        fallback = "png" if im.mode in ("RGBA", "LA", "P") else "jpeg"
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if fallback == "png" else "RGB")
+        manifest = {"source_width": im.width, "fallback": fallback, "renditions": []}
+        # Never upscale: widths above the source collapse into the source width
+        targets = sorted({min(w, im.width) for w in widths} | {im.width})
+        for width in targets:
+            height = max(1, round(im.height * width / im.width))
+            resized = im if width == im.width else im.resize((width, height), Image.LANCZOS)
+            for fmt in (*formats, fallback):
+                frame = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+                name = f"w{width}{_EXTENSIONS[fmt]}"
+                options = {"optimize": True} if fmt in ("jpeg", "png") else {}
+                if fmt != "png":
+                    options["quality"] = quality
+                frame.save(os.path.join(out_dir, name), format=fmt.upper(), **options)
+                manifest["renditions"].append({"format": fmt, "width": width, "file": name})
+    return manifest
+
+
+def _accepted(accept):
+    """Formats the client accepts (q > 0), from an `Accept` header."""
+    media_types = accepted_values(accept)
+    accepted = {fmt for fmt, content_type in CONTENT_TYPES.items() if content_type in media_types}
+    if media_types & {"image/*", "*/*"}:
+        accepted.update(("jpeg", "png"))
+    return accepted
+
+
+class HeroRenditions:
+    def __init__(self, hero_dir, widths=HERO_WIDTHS, quality=HERO_QUALITY, keep_sets=HERO_KEEP_SETS):
+        self.hero_dir = hero_dir
+        self.keep_sets = keep_sets
+        self.root = os.path.join(hero_dir, "renditions")
+        self.widths = widths
+        self.quality = quality
+        self._pool = None
+        self._current = (None, None)  # (signature of current.json, manifest)
+        self._lock = threading.Lock()
+        self._task = None
+        self._pending = None  # newest upload waiting for the running job
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def schedule(self, source_path):
+        """Generate renditions for a new upload in the background.
+
+        The previous set stops being served right away; until the new one is
+        ready requests fall back to the original upload. One job runs at a
+        time: uploads that land meanwhile are folded into a single rerun
+        with the newest file.
+        """
+        try:
+            os.unlink(os.path.join(self.root, "current.json"))
+        except OSError:
+            pass
+        if not self.enabled:
+            return None
+        if self._task is not None and not self._task.done():
+            self._pending = source_path
+            return self._task
+        self._task = asyncio.get_running_loop().create_task(self._generate_logged(source_path))
+        return self._task
+
+    async def join(self):
+        """Wait for the running job (and any rerun it picked up)."""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _generate_logged(self, source_path):
+        while source_path is not None:
+            try:
+                await self.generate(source_path)
+            except Exception as e:
+                logger.error("Could not render hero renditions for %s: %s", source_path, e)
+            source_path, self._pending = self._pending, None
+
+    async def generate(self, source_path):
+        digest = await asyncio.to_thread(fingerprint, source_path)
+        target = os.path.join(self.root, digest)
+        manifest_path = os.path.join(target, "manifest.json")
+        if not os.path.exists(manifest_path):
+            os.makedirs(self.root, exist_ok=True)
+            work_dir = tempfile.mkdtemp(dir=self.root, prefix=".render-")
+            try:
+                if self._pool is None:
+                    self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+                manifest = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, _render, source_path, work_dir, self.widths, available_formats(), self.quality)
+                manifest["sha256"] = digest
+                with open(os.path.join(work_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+                try:
+                    os.rename(work_dir, target)
+                except OSError:
+                    # Another worker rendered the same image first
+                    pass
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            logger.info("Rendered hero renditions for %s into %s", source_path, target)
+        else:
+            logger.info("Reusing hero renditions for %s", digest[:12])
+            # Most recently used: kept when older sets are pruned
+            os.utime(target)
+        # Only while this is still the newest upload: otherwise the job of the
+        # newer one (here, or in the worker that replaced the file) sets it
+        if self._pending is None and await asyncio.to_thread(fingerprint, source_path) == digest:
+            self._set_current(digest)
+            await asyncio.to_thread(self._prune_sets, digest)
+        return digest
+
+    def _set_current(self, digest):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".current-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"sha256": digest}, f)
+        os.replace(tmp, os.path.join(self.root, "current.json"))
+
+    def _prune_sets(self, digest):
+        """Keep the current set and the most recently used others, up to `HERO_KEEP_SETS` in all.
+
+        Recency is the directory's mtime (set when rendered, bumped when
+        reused); in-progress renders start with a dot and are left alone.
+        """
+        others = [entry for entry in os.scandir(self.root)
+                  if entry.is_dir() and entry.name != digest and not entry.name.startswith(".")]
+        others.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in others[self.keep_sets - 1:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            logger.info("Removed old hero renditions %s", entry.name)
+
+    def current(self):
+        """Manifest of the active rendition set, or None (re-read when it changes)."""
+        pointer = os.path.join(self.root, "current.json")
+        try:
+            st = os.stat(pointer)
+        except OSError:
+            return None
+        signature = (st.st_mtime_ns, st.st_ino)
+        if self._current[0] == signature:
+            return self._current[1]
+        with self._lock:
+            try:
+                with open(pointer, encoding="utf-8") as f:
+                    digest = json.load(f)["sha256"]
+                with open(os.path.join(self.root, digest, "manifest.json"), encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError, KeyError):
+                return None
+            self._current = (signature, manifest)
+            return manifest
+
+    def pick(self, accept, width=None):
+        """(path, content_type) of the best rendition, or None when there are none."""
+        manifest = self.current()
+        if not manifest:
+            return None
+        accepted = _accepted(accept)
+        renditions = manifest["renditions"]
+        formats = {r["format"] for r in renditions}
+        # Every client can decode the fallback (JPEG, or PNG for images with alpha)
+        fmt = next((f for f in ("avif", "webp") if f in accepted and f in formats), manifest["fallback"])
+        candidates = sorted((r for r in renditions if r["format"] == fmt), key=lambda r: r["width"])
+        chosen = candidates[-1]
+        if width:
+            chosen = next((r for r in candidates if r["width"] >= width), candidates[-1])
+        return os.path.join(self.root, manifest["sha256"], chosen["file"]), CONTENT_TYPES[fmt]
@@ -0,0 +1,226 @@
+"""Background delivery of contact-form emails.
+
+`/api/contact` only enqueues the message; a single worker task drains the
+queue in batches over one authenticated SMTP session that is kept alive
+between messages (NOOP while idle) and re-established when the server drops
+it. Failed sends are retried with exponential backoff. `smtplib` is
+blocking, so every SMTP exchange runs in a worker thread.
+"""
+import asyncio
+import logging
+import os
+import smtplib
+import time
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE = float(os.getenv("MAIL_RETRY_BASE", "1"))
+MAIL_RETRY_MAX = float(os.getenv("MAIL_RETRY_MAX", "60"))
+# Idle time after which the session is checked with NOOP (and dropped if dead)
+MAIL_KEEPALIVE = float(os.getenv("MAIL_KEEPALIVE", "60"))
+MAIL_SMTP_TIMEOUT = float(os.getenv("MAIL_SMTP_TIMEOUT", "30"))
+
+
+class OutgoingMail:
+    __slots__ = ('sender', 'recipient', 'content', 'meta', 'attempts', 'enqueued_at')
+
+    def __init__(self, sender, recipient, content, meta=None):
+        self.sender = sender
+        self.recipient = recipient
+        self.content = content
+        self.meta = meta
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+class MailQueue:
+    def __init__(self, host, port, username, password, starttls=True, on_result=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        # Called (or awaited) as on_result(mail, sent) once a message is delivered or given up on
+        self.on_result = on_result
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.connects = 0
+        self.send_time_total = 0.0
+        self.send_time_max = 0.0
+        self.last_error = None
+        self._smtp = None
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=MAIL_QUEUE_SIZE)
+        self._task = loop.create_task(self._run())
+
+    async def stop(self, timeout=10.0):
+        """Try to flush what is queued, then close the SMTP session."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown before the mail queue drained (%d message(s) still queued)", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._disconnect)
+
+    def enqueue(self, mail: OutgoingMail) -> bool:
+        """Queue `mail` for delivery; False when the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(mail)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "connects": self.connects,
+            "avg_send_ms": round(self.send_time_total / self.sent * 1000, 2) if self.sent else None,
+            "max_send_ms": round(self.send_time_max * 1000, 2),
+            "last_error": self.last_error,
+        }
+
+    # -- worker ----------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            try:
+                mail = await asyncio.wait_for(self._queue.get(), MAIL_KEEPALIVE)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self._keepalive)
+                continue
+            batch = [mail]
+            while len(batch) < MAIL_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch):
+        pending = batch
+        while pending:
+            start = time.perf_counter()
+            delivered, failed = await asyncio.to_thread(self._send_batch, pending)
+            registry.observe("smtp_send_duration_seconds", time.perf_counter() - start)
+            registry.inc("smtp_messages_total", (("result", "sent"),), len(delivered))
+            for mail in delivered:
+                await self._report(mail, True)
+            retry = []
+            for mail in failed:
+                if mail.attempts >= MAIL_MAX_ATTEMPTS:
+                    self.failed += 1
+                    registry.inc("smtp_messages_total", (("result", "failed"),))
+                    await self._report(mail, False)
+                else:
+                    retry.append(mail)
+            if retry:
+                self.retries += len(retry)
+                registry.inc("smtp_messages_total", (("result", "retried"),), len(retry))
+                delay = min(MAIL_RETRY_MAX, MAIL_RETRY_BASE * 2 ** (retry[0].attempts - 1))
+                await asyncio.sleep(delay)
+            pending = retry
+
+    async def _report(self, mail, sent):
+        if self.on_result is None:
+            return
+        try:
+            result = self.on_result(mail, sent)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.exception("Mail on_result callback failed: %s", e)
+
+    # -- SMTP (worker thread) ---------------------------------------------
+
+    def _send_batch(self, batch):
+        """Send `batch` over the shared session; return (delivered, failed)."""
+        delivered = []
+        failed = []
+        for mail in batch:
+            mail.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._connection().sendmail(mail.sender, mail.recipient, mail.content)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                # The session is gone: reconnect on the next attempt
+                self.last_error = str(e)
+                self._disconnect()
+                failed.append(mail)
+                continue
+            except smtplib.SMTPException as e:
+                self.last_error = str(e)
+                failed.append(mail)
+                continue
+            elapsed = time.perf_counter() - start
+            self.sent += 1
+            self.send_time_total += elapsed
+            self.send_time_max = max(self.send_time_max, elapsed)
+            delivered.append(mail)
+        return delivered, failed
+
+    def _connection(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=MAIL_SMTP_TIMEOUT)
+            try:
+                # Extensions (STARTTLS, AUTH) are only known after EHLO, and
+                # STARTTLS forgets them: greet again on the encrypted channel
+                smtp.ehlo()
+                if self.starttls:
+                    smtp.starttls()
+                    smtp.ehlo()
+                if self.password:
+                    smtp.login(self.username, self.password)
+            except BaseException:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self.connects += 1
+        return self._smtp
+
+    def _keepalive(self):
+        if self._smtp is None:
+            return
+        try:
+            code, _ = self._smtp.noop()
+            if code == 250:
+                return
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._disconnect()
+
+    def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
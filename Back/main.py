@@ -1,118 +1,296 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Optional
-import requests
-import smtplib
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional, Union
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
-import json
 from datetime import datetime
 import secrets
 import urllib.parse
 
+from admin_batch import BatchError, apply_batch
+from change_feed import EVENTS_MAX_SUBSCRIBERS, ChangeFeed, project_changes, recommendation_changes, skill_changes
+from content_store import ContentStore, new_project_id, project_positions
+from fast_json import FastJSONResponse, exact_shape
+from http_cache import CachedBody, cached_json_response, etag_matches
+from http_client import UpstreamClient
+from token_cache import TokenProfileCache
+from mailer import MailQueue, OutgoingMail
+from outbox import Outbox
+from stats import StatsCounters
+from compression import CompressionMiddleware
+from session_store import MemorySessionStore, create_session_store
+from uploads import MAX_UPLOAD_BYTES, UploadLimitMiddleware, save_upload
+from image_renditions import HeroRenditions
+from media_proxy import MEDIA_MAX_AGE, MediaCache, MediaError
+from static_assets import AssetFiles, Precompressor, fingerprinted_url
+from metrics import METRICS_FLUSH_INTERVAL, MetricsMiddleware, registry as metrics
+from search_index import SEARCH_MAX_RESULTS, ContentSearch
+from project_index import PROJECTS_PAGE_MAX, InvalidQuery, ProjectIndex, decode_cursor
+from structured_logging import RequestIdMiddleware, configure_logging, dropped_records, request_id
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Logs JSON escritos por uma thread em background (nunca bloqueiam um pedido)
+configure_logging()
+logger = logging.getLogger("portfolio")
+
 # Configurações do GitHub OAuth
 GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
 GITHUB_REDIRECT_URI = os.getenv("GITHUB_REDIRECT_URI", "https://portfolio-backend-shy-butterfly-71.fly.dev/api/auth/github/callback")
+GITHUB_TOKEN_URL = os.getenv("GITHUB_TOKEN_URL", "https://github.com/login/oauth/access_token")
+GITHUB_USER_URL = os.getenv("GITHUB_USER_URL", "https://api.github.com/user")
 
 # Configurações do Google OAuth
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "https://portfolio-backend-shy-butterfly-71.fly.dev/api/auth/google/callback")
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
 
 # Configurações da base de dados
 DATABASE_PATH = os.getenv("DATABASE_PATH", "portfolio.db")
+# Journal append-only com recomendações e mensagens de contacto (ao lado da DB por omissão)
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.splitext(DATABASE_PATH)[0] + ".outbox.jsonl")
+
+# Configurações do Email (SMTP)
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no")
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
+
+# Intervalo (segundos) da reconciliação dos contadores de /api/stats
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
 
 # Caminho customizável para o arquivo projects.json (em deploys pode ser diferente)
 PROJECTS_PATH_ENV = os.getenv("PROJECTS_PATH")
 
 # Origens permitidas (CORS). Pode ser uma lista separada por vírgulas ou "*" para permitir todas.
 ALLOWED_ORIGINS_ENV = os.getenv("ALLOWED_ORIGINS")
+# Máximo de operações num POST /api/admin/batch
+ADMIN_BATCH_MAX = int(os.getenv("ADMIN_BATCH_MAX", "1000"))
 # Senha admin para edição via UI (defina como secret no Fly)
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
-# Store tokens for admin sessions (in-memory, ephemeral)
-admin_tokens = {}
+# Sessões de curta duração: tokens admin e states OAuth. Com SESSION_STORE=sqlite
+# ficam num ficheiro partilhado por todos os workers (necessário com --workers N)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.splitext(DATABASE_PATH)[0] + ".sessions.db")
+ADMIN_TOKEN_TTL = int(os.getenv("ADMIN_TOKEN_TTL", str(24 * 3600)))
+OAUTH_STATE_TTL = int(os.getenv("OAUTH_STATE_TTL", "600"))
+
+# Token opcional para GET /metrics (Authorization: Bearer <token>); sem ele o endpoint é público
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Store tokens for admin sessions (expire after ADMIN_TOKEN_TTL)
+admin_tokens = create_session_store("admin_tokens", maxsize=int(os.getenv("ADMIN_TOKENS_MAX", "1000")),
+                                    path=SESSION_DB_PATH)
+
+# projects.json / skills.json ficam em memória e só são relidos quando mudam no disco
+content_store = ContentStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+# Índice de pesquisa (/api/search), atualizado a cada nova versão de projects.json / skills.json
+content_search = ContentSearch(content_store)
+
+# Recomendações e mensagens de contacto (journal em disco + índice em memória)
+outbox = Outbox(OUTBOX_PATH)
+
+# Feed SSE (/api/events): uma mensagem por cada nova versão de projects.json / skills.json / recomendações,
+# venha a escrita deste worker ou de outro
+change_feed = ChangeFeed()
+change_feed.watch(content_store.projects, "projects", project_changes)
+change_feed.watch(content_store.skills, "skills", skill_changes)
+change_feed.watch(outbox, "recommendations", recommendation_changes, snapshot=outbox.recommendations)
+
+# Contadores de /api/stats, atualizados nos pontos de escrita
+stats_counters = StatsCounters(extra={"database_path": OUTBOX_PATH})
+
+def _count_stats():
+    """Recompute the stats from the in-memory indexes (used at startup and to reconcile)."""
+    return {
+        "recommendations_count": len(outbox.recommendations().data),
+        "projects_count": len(content_store.projects.data),
+        "contact_messages_count": outbox.contact_messages_count,
+        "sent_messages_count": outbox.sent_messages_count,
+    }
 
 def init_database():
-    # No database initialization required when DB removed
-    print("⚠️  Database disabled - running without persistent storage.")
+    # Replay do journal para reconstruir o índice em memória
+    outbox.load()
+    stats_counters.rebuild(_count_stats())
+    logger.info("Outbox: %s (%d registos)", OUTBOX_PATH, outbox.journal.records)
+
+async def _reconcile_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+        try:
+            drift = await asyncio.to_thread(lambda: stats_counters.reconcile(_count_stats()))
+            if drift:
+                logger.warning("Stats counters reconciled", extra={"drift": drift})
+        except Exception as e:
+            logger.exception("Stats reconciliation failed: %s", e)
 
 def get_projects_from_db():
     """Load projects from `Back/data/projects.json` (no DB).
 
-    This function reads the static JSON bundled with the backend and
-    returns it. If the file is missing or invalid, return empty list.
+    Served from the in-memory `content_store`, which re-reads the file only
+    when it changes on disk. If the file is missing or invalid, return empty list.
+    The returned list is shared: callers must not mutate it.
     """
-    try:
-        here = os.path.dirname(os.path.abspath(__file__))
-        projects_path = os.path.normpath(os.path.join(here, 'data', 'projects.json'))
-        with open(projects_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            if isinstance(data, dict):
-                for k in ('projects', 'data', 'items'):
-                    if k in data and isinstance(data[k], list):
-                        return data[k]
-            return []
-    except Exception as e:
-        print(f"Could not load backend projects.json: {e}")
-        print(f"Tried path: {projects_path}")
-        return []
+    return content_store.projects.data
 
 def get_recommendations_from_db():
-    # No persistent recommendations
-    return []
+    """Recommendations from the outbox index, oldest first (shared: do not mutate)."""
+    return outbox.recommendations().data
 
 def get_skills_from_db():
-    """Load skills from `Back/data/skills.json` (no DB)."""
-    try:
-        here = os.path.dirname(os.path.abspath(__file__))
-        skills_path = os.path.normpath(os.path.join(here, 'data', 'skills.json'))
-        with open(skills_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data
-    except Exception as e:
-        print(f"Could not load backend skills.json: {e}")
-        print(f"Tried path: {skills_path}")
-        return {}
+    """Load skills from `Back/data/skills.json` (no DB), via `content_store`."""
+    return content_store.skills.data
 
-def add_recommendation_to_db(*args, **kwargs):
-    # No-op when DB removed
-    return None
+async def add_recommendation_to_db(name: str, text: str, avatar: str, username: Optional[str] = None, provider: Optional[str] = 'github'):
+    return await outbox.add_recommendation(name, text, avatar, username=username, provider=provider)
 
 def add_project_to_db(*args, **kwargs):
     # No-op
     return None
 
-def save_contact_message(name: str, email: str, message: str, sent_by_email: bool = False):
-    # Do not save messages to a database; just log
-    print(f"[contact] {name} <{email}> — sent_by_email={sent_by_email}")
-    return None
+async def save_contact_message(name: str, email: str, message: str, sent_by_email: bool = False):
+    message_id = await outbox.add_contact_message(name, email, message, sent_by_email)
+    logger.info("Contact message saved", extra={"message_id": message_id, "sent_by_email": sent_by_email})
+    return message_id
+
+# Respostas JSON via orjson quando disponível (ver fast_json.py)
+app = FastAPI(default_response_class=FastJSONResponse)
+
+_background_tasks = []
+
+@app.on_event("startup")
+async def _init_database():
+    init_database()
+    _background_tasks.append(asyncio.create_task(_reconcile_stats_periodically()))
+
+@app.on_event("startup")
+async def _start_change_feed():
+    change_feed.start()
 
-app = FastAPI()
+@app.on_event("shutdown")
+async def _stop_change_feed():
+    await change_feed.stop()
+
+@app.on_event("shutdown")
+async def _stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+
+# Cliente HTTP partilhado (keep-alive) para as chamadas ao GitHub/Google
+upstream = UpstreamClient()
+
+@app.on_event("startup")
+async def _start_upstream_client():
+    await upstream.start()
+
+@app.on_event("shutdown")
+async def _close_upstream_client():
+    await upstream.close()
+
+# Imagens remotas (projetos, avatares) guardadas em disco e servidas em /media/proxy
+media_cache = MediaCache(upstream)
+
+# Perfis já verificados por token (chave = hash do token, nunca o token em si)
+token_cache = TokenProfileCache()
+
+def _github_profile(user_data):
+    return {k: user_data[k] for k in ("login", "name", "avatar_url", "email") if k in user_data}
+
+def _google_profile(google_data):
+    # Adaptar dados do Google para o formato esperado
+    return {
+        "id": google_data.get("id", "user"),
+        "name": google_data.get("name", "Usuário Google"),
+        "login": f"google_{google_data.get('id', 'user')}",  # Usar ID do Google em vez do email
+        "avatar_url": google_data.get("picture", ""),
+        "email": google_data.get("email", "")
+    }
+
+async def _fetch_github_profile(token):
+    response = await upstream.get(GITHUB_USER_URL, headers={"Authorization": f"token {token}"})
+    if response.status_code != 200:
+        return None
+    return _github_profile(response.json())
+
+async def _fetch_google_profile(token):
+    response = await upstream.get(GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {token}"})
+    if response.status_code != 200:
+        return None
+    return _google_profile(response.json())
+
+async def get_github_profile(token):
+    return await token_cache.get("github", token, _fetch_github_profile)
+
+async def get_google_profile(token):
+    return await token_cache.get("google", token, _fetch_google_profile)
+
+async def _on_mail_result(mail, sent):
+    contact, message_id, rid = mail.meta
+    # Os logs do envio ficam associados ao pedido que colocou a mensagem na fila
+    token = request_id.set(rid)
+    try:
+        if not sent:
+            logger.error("Erro ao enviar email após %d tentativas: %s", mail.attempts, mail_queue.last_error,
+                         extra={"message_id": message_id})
+            return
+        await outbox.mark_contact_sent(message_id)
+        stats_counters.add("sent_messages_count")
+        logger.info("Contact message sent by email", extra={"message_id": message_id})
+    finally:
+        request_id.reset(token)
+
+# Fila de envio de emails: uma sessão SMTP persistente num worker em background
+mail_queue = MailQueue(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD,
+                       starttls=SMTP_STARTTLS, on_result=_on_mail_result)
+
+@app.on_event("startup")
+async def _start_mail_queue():
+    if SENDER_EMAIL and SENDER_PASSWORD and RECIPIENT_EMAIL:
+        mail_queue.start()
+
+@app.on_event("shutdown")
+async def _stop_mail_queue():
+    await mail_queue.stop()
 
 # Ensure backend has a public folder to serve uploaded CVs
 here = os.path.dirname(os.path.abspath(__file__))
 backend_cv_dir = os.path.normpath(os.path.join(here, 'public', 'cv'))
 os.makedirs(backend_cv_dir, exist_ok=True)
 # Mount static files so uploaded CV is available at /cv/Bernardo_Meneses.pdf
-app.mount('/cv', StaticFiles(directory=backend_cv_dir), name='cv')
+# (and at /cv/<fingerprint>/Bernardo_Meneses.pdf with immutable caching)
+app.mount('/cv', AssetFiles(directory=backend_cv_dir), name='cv')
 
 # Ensure backend has a public folder to serve hero images
 backend_hero_dir = os.path.normpath(os.path.join(here, 'public', 'hero'))
 os.makedirs(backend_hero_dir, exist_ok=True)
 # Mount hero images at /hero
-app.mount('/hero', StaticFiles(directory=backend_hero_dir), name='hero')
+app.mount('/hero', AssetFiles(directory=backend_hero_dir), name='hero')
+
+# Gera os irmãos .br/.gz dos ficheiros enviados, fora do pedido
+precompressor = Precompressor()
+
+# Versões redimensionadas (AVIF/WebP) da imagem hero, servidas em GET /hero
+hero_renditions = HeroRenditions(backend_hero_dir)
+
+@app.on_event("shutdown")
+def _close_hero_renditions():
+    hero_renditions.close()
 
 # Resolver lista de origins para CORS a partir de variável de ambiente
 def _resolve_allowed_origins():
@@ -131,7 +309,19 @@ def _resolve_allowed_origins():
     return parts if parts else default
 
 allowed_origins = _resolve_allowed_origins()
-print(f"CORS allowed_origins: {allowed_origins}")
+logger.info("CORS allowed_origins: %s", allowed_origins)
+
+# Compressão br/gzip das respostas JSON acima de COMPRESS_MIN_SIZE bytes
+# (os endpoints em cache já enviam o corpo comprimido e passam intactos)
+app.add_middleware(CompressionMiddleware)
+
+# Limite de tamanho aplicado enquanto o upload ainda está a ser recebido
+# (adicionado antes do CORS para que as respostas 413 também levem os headers CORS)
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=["/api/admin/upload-cv", "/api/admin/upload-hero"],
+    max_bytes=MAX_UPLOAD_BYTES,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -141,6 +331,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por rota (contagem, latência, tamanho, pedidos em curso). Adicionado
+# por último para ser o middleware mais exterior e medir o pedido completo
+app.add_middleware(MetricsMiddleware)
+
+# Request id (X-Request-ID) em todas as linhas de log do pedido; o mais exterior de todos
+app.add_middleware(RequestIdMiddleware)
+
 class Project(BaseModel):
     title: str
     description: str
@@ -148,6 +345,15 @@ class Project(BaseModel):
     repo: str
     image: str
 
+class StoredProject(Project):
+    # Atribuído pelo servidor; estável (ver content_store._assign_project_ids)
+    id: str
+
+class ProjectPage(BaseModel):
+    # Resposta paginada de GET /api/projects (com `limit`/`cursor`)
+    items: List[StoredProject]
+    next_cursor: Optional[str] = None
+
 class Recommendation(BaseModel):
     name: str
     text: str
@@ -170,11 +376,60 @@ class ContactMessage(BaseModel):
     email: str
     message: str
 
+class Skill(BaseModel, extra='allow'):
+    name: str = Field(min_length=1)
+
+# Operações aceites por POST /api/admin/batch (escolhidas pelo campo "op")
+class AddProjectOp(BaseModel):
+    op: Literal["add_project"]
+    project: Project
+
+class UpdateProjectOp(BaseModel):
+    op: Literal["update_project"]
+    id: str
+    project: Project
+
+class DeleteProjectOp(BaseModel):
+    op: Literal["delete_project"]
+    id: str
+
+class MoveProjectOp(BaseModel):
+    op: Literal["move_project"]
+    id: str
+    position: int = Field(ge=0)
+
+class AddSkillOp(BaseModel):
+    op: Literal["add_skill"]
+    category: str = Field(min_length=1)
+    skill: Skill
+
+class UpdateSkillOp(BaseModel):
+    op: Literal["update_skill"]
+    category: str
+    name: str
+    skill: Skill
+
+class DeleteSkillOp(BaseModel):
+    op: Literal["delete_skill"]
+    category: str
+    name: str
+
+class BatchRequest(BaseModel):
+    operations: List[Union[AddProjectOp, UpdateProjectOp, DeleteProjectOp, MoveProjectOp,
+                           AddSkillOp, UpdateSkillOp, DeleteSkillOp]] = Field(
+        discriminator="op", min_length=1, max_length=ADMIN_BATCH_MAX)
+
 # Os dados agora são geridos pela base de dados SQLite
 # Não precisamos mais de variáveis em memória
 
-# Store para códigos OAuth temporários (em produção, usar Redis ou base de dados)
-oauth_states = {}
+# Store para states OAuth temporários (expiram após OAUTH_STATE_TTL; tamanho limitado)
+oauth_states = create_session_store("oauth_states", maxsize=int(os.getenv("OAUTH_STATES_MAX", "10000")),
+                                    path=SESSION_DB_PATH)
+
+@app.on_event("shutdown")
+def _close_session_stores():
+    oauth_states.close()
+    admin_tokens.close()
 
 @app.get("/")
 def read_root():
@@ -190,7 +445,7 @@ def check_config():
             "redirect_uri": GITHUB_REDIRECT_URI
         },
         "email": {
-            "smtp_configured": bool(os.getenv("SMTP_SERVER") and os.getenv("SENDER_EMAIL"))
+            "smtp_configured": bool(os.getenv("SMTP_SERVER") and SENDER_EMAIL)
         }
     }
     return config_status
@@ -198,15 +453,12 @@ def check_config():
 @app.get("/api/auth/github/login")
 async def github_login():
     """Inicia o fluxo OAuth do GitHub"""
-    print(f"GitHub login endpoint chamado")
-    print(f"GITHUB_CLIENT_ID: {GITHUB_CLIENT_ID}")
-    
     if not GITHUB_CLIENT_ID:
         raise HTTPException(status_code=500, detail="GitHub Client ID não configurado")
     
     # Gerar um state único para segurança
     state = secrets.token_urlsafe(32)
-    oauth_states[state] = True
+    oauth_states.put(state, True, OAUTH_STATE_TTL)
     
     # Construir URL de autorização do GitHub
     params = {
@@ -217,7 +469,6 @@ async def github_login():
     }
     
     auth_url = f"https://github.com/login/oauth/authorize?{urllib.parse.urlencode(params)}"
-    print(f"Auth URL gerado: {auth_url}")
     return {"auth_url": auth_url}
 
 @app.get("/api/auth/github/callback")
@@ -230,13 +481,11 @@ async def github_callback(code: str, state: str):
             return RedirectResponse(url=error_url)
         
         # Verificar se o state é válido
-        if state not in oauth_states:
+        # (consumido de forma atómica: um state só pode ser usado uma vez)
+        if oauth_states.pop(state) is None:
             error_url = f"https://bernardomeneses.fly.dev/callback.html?error=invalid_state"
             return RedirectResponse(url=error_url)
         
-        # Remover state usado
-        del oauth_states[state]
-        
         # Trocar código por token de acesso
         token_data = {
             "client_id": GITHUB_CLIENT_ID,
@@ -246,8 +495,8 @@ async def github_callback(code: str, state: str):
         }
         
         headers = {"Accept": "application/json"}
-        response = requests.post(
-            "https://github.com/login/oauth/access_token",
+        response = await upstream.post(
+            GITHUB_TOKEN_URL,
             data=token_data,
             headers=headers
         )
@@ -265,13 +514,14 @@ async def github_callback(code: str, state: str):
         
         # Obter dados do usuário
         user_headers = {"Authorization": f"token {access_token}"}
-        user_response = requests.get("https://api.github.com/user", headers=user_headers)
+        user_response = await upstream.get(GITHUB_USER_URL, headers=user_headers)
         
         if user_response.status_code != 200:
             error_url = f"https://bernardomeneses.fly.dev/github/callback.html?error=user_data_failed"
             return RedirectResponse(url=error_url)
         
         user_data = user_response.json()
+        token_cache.put("github", access_token, _github_profile(user_data))
         
         # Criar URL de sucesso com dados do usuário
         user_params = {
@@ -298,7 +548,7 @@ async def google_login():
     
     # Gerar um state único para segurança
     state = secrets.token_urlsafe(32)
-    oauth_states[state] = True
+    oauth_states.put(state, True, OAUTH_STATE_TTL)
     
     # Construir URL de autorização do Google
     params = {
@@ -322,13 +572,11 @@ async def google_callback(code: str, state: str):
             return RedirectResponse(url=error_url)
         
         # Verificar se o state é válido
-        if state not in oauth_states:
+        # (consumido de forma atómica: um state só pode ser usado uma vez)
+        if oauth_states.pop(state) is None:
             error_url = f"https://bernardomeneses.fly.dev/google/callback.html?error=invalid_state"
             return RedirectResponse(url=error_url)
         
-        # Remover state usado
-        del oauth_states[state]
-        
         # Trocar código por token de acesso
         token_data = {
             "client_id": GOOGLE_CLIENT_ID,
@@ -339,8 +587,8 @@ async def google_callback(code: str, state: str):
         }
         
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = requests.post(
-            "https://oauth2.googleapis.com/token",
+        response = await upstream.post(
+            GOOGLE_TOKEN_URL,
             data=token_data,
             headers=headers
         )
@@ -358,13 +606,14 @@ async def google_callback(code: str, state: str):
         
         # Obter dados do usuário
         user_headers = {"Authorization": f"Bearer {access_token}"}
-        user_response = requests.get("https://www.googleapis.com/oauth2/v2/userinfo", headers=user_headers)
+        user_response = await upstream.get(GOOGLE_USERINFO_URL, headers=user_headers)
         
         if user_response.status_code != 200:
             error_url = f"https://bernardomeneses.fly.dev/google/callback.html?error=user_data_failed"
             return RedirectResponse(url=error_url)
         
         user_data = user_response.json()
+        token_cache.put("google", access_token, _google_profile(user_data))
         
         # Criar URL de sucesso com dados do usuário
         user_params = {
@@ -384,35 +633,160 @@ async def google_callback(code: str, state: str):
         error_url = f"https://bernardomeneses.fly.dev/google/callback.html?error=server_error&message={str(e)}"
         return RedirectResponse(url=error_url)
 
-@app.get("/api/projects", response_model=List[Project])
-def get_projects():
-    """Obter todos os projetos da base de dados"""
-    return get_projects_from_db()
+# Respostas de leitura pré-serializadas: a validação pelo response_model é feita
+# uma vez por versão dos dados e não em cada pedido. Registos que já estão
+# exatamente na forma do modelo (tudo o que a API escreve) nem passam pelo
+# pydantic: são serializados diretamente
+_projects_adapter = TypeAdapter(List[StoredProject])
+_project_adapter = TypeAdapter(StoredProject)
+_is_stored_project = exact_shape(StoredProject)
+
+def _public_projects(projects):
+    if _is_stored_project and _is_stored_project.all(projects):
+        return projects
+    return _projects_adapter.dump_python(_projects_adapter.validate_python(projects), mode='json')
+
+def _projects_response_body(projects):
+    if _is_stored_project and _is_stored_project.all(projects):
+        return CachedBody.from_data(projects)
+    return CachedBody(_projects_adapter.dump_json(_projects_adapter.validate_python(projects)))
+
+def _project_response_body(project):
+    if _is_stored_project and _is_stored_project(project):
+        return CachedBody.from_data(project)
+    return CachedBody(_project_adapter.dump_json(_project_adapter.validate_python(project)))
+
+def _projects_index(projects):
+    return ProjectIndex(_public_projects(projects), StoredProject.model_fields)
+
+@app.get("/api/projects", response_model=Union[List[StoredProject], ProjectPage])
+def get_projects(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=PROJECTS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    tech: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None,
+):
+    """Obter os projetos.
+
+    Sem parâmetros devolve a lista completa. `tech` filtra (repetido ou
+    separado por vírgulas; todos têm de estar presentes), `fields`
+    escolhe os campos (ex.: `fields=title,tech`) e `limit`/`cursor`
+    paginam: a resposta passa a ser um `ProjectPage`
+    (`{"items": [...], "next_cursor": ...}`). Com `fields` cada projeto só
+    traz os campos pedidos.
+    """
+    snapshot = content_store.projects.snapshot()
+    if limit is None and cursor is None and not tech and not fields:
+        return cached_json_response(request, snapshot.derive('response', _projects_response_body))
+    index = snapshot.derive('index', _projects_index)
+    try:
+        start = decode_cursor(cursor) if cursor else 0
+        field_names = index.parse_fields(fields)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor and limit is None:
+        limit = PROJECTS_PAGE_MAX
+    return cached_json_response(request, index.page(index.parse_tech(tech), field_names, start, limit))
+
+_recommendations_adapter = TypeAdapter(List[Recommendation])
+_is_recommendation = exact_shape(Recommendation)
+
+def _recommendations_response_body(recommendations):
+    if _is_recommendation and _is_recommendation.all(recommendations):
+        return CachedBody.from_data(recommendations)
+    try:
+        valid = _recommendations_adapter.validate_python(recommendations)
+    except ValidationError:
+        # Um registo inválido no journal não pode deitar abaixo a lista inteira
+        valid = []
+        for record in recommendations:
+            try:
+                valid.append(Recommendation.model_validate(record))
+            except ValidationError as e:
+                logger.warning("Recomendação inválida ignorada: %s", e.errors(include_url=False))
+    return CachedBody(_recommendations_adapter.dump_json(valid))
+
+def _project_position(snapshot, project_ref):
+    """Position of a project given its id (or, for older clients, its list index)."""
+    position = snapshot.derive('positions', project_positions).get(project_ref)
+    if position is None and project_ref.isdigit() and int(project_ref) < len(snapshot.data):
+        # Compatibilidade: /api/projects/{index} continua a funcionar
+        position = int(project_ref)
+    return position
+
+@app.get("/api/projects/{project_id}", response_model=StoredProject)
+def get_project(request: Request, project_id: str):
+    """Obter um projeto pelo id"""
+    snapshot = content_store.projects.snapshot()
+    position = _project_position(snapshot, project_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail='Project not found')
+    cached = snapshot.derive(('project', position), lambda data: _project_response_body(data[position]))
+    return cached_json_response(request, cached)
 
 @app.get("/api/recommendations", response_model=List[Recommendation])
-def get_recommendations():
+def get_recommendations(request: Request):
     """Obter todas as recomendações da base de dados"""
-    return get_recommendations_from_db()
-
+    cached = outbox.recommendations().derive('response', _recommendations_response_body)
+    return cached_json_response(request, cached)
+
+
+@app.get("/api/search")
+def search(
+    q: str = Query("", max_length=200),
+    limit: int = Query(10, ge=1, le=SEARCH_MAX_RESULTS),
+    type: Optional[str] = Query(None, pattern="^(project|skill)$"),
+):
+    """Pesquisa em projetos (título, descrição, tecnologias) e skills, com prefixos para typeahead."""
+    return {"query": q, "results": content_search.search(q, limit=limit, kind=type)}
+
+@app.get("/api/events")
+async def content_events(request: Request):
+    """Stream SSE com as alterações a projetos, skills e recomendações (retoma com Last-Event-ID)."""
+    if change_feed.subscribers >= EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many subscribers")
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    return StreamingResponse(change_feed.stream(last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/api/skills")
-def get_skills():
+def get_skills(request: Request):
     """Obter skills estáticos do backend"""
-    return get_skills_from_db()
+    snapshot = content_store.skills.snapshot()
+    cached = snapshot.derive('response', lambda data: CachedBody.from_data(content_store.skills.serialize(data)))
+    return cached_json_response(request, cached)
+
+@app.get("/api/skills/{category}")
+def get_skill_category(request: Request, category: str):
+    """Skills de uma só categoria, com o seu próprio ETag"""
+    snapshot = content_store.skills.snapshot()
+    if category not in snapshot.data:
+        raise HTTPException(status_code=404, detail='Category not found')
+    cached = snapshot.derive(('category', category),
+                             lambda data: CachedBody.from_data(list(data[category].values())))
+    return cached_json_response(request, cached)
+
+@app.get("/api/skills/{category}/{name:path}")
+def get_skill(request: Request, category: str, name: str):
+    """Uma skill pelo nome (pode conter "/", p.ex. "Sass/SCSS")"""
+    snapshot = content_store.skills.snapshot()
+    if name not in snapshot.data.get(category, {}):
+        raise HTTPException(status_code=404, detail='Skill not found')
+    cached = snapshot.derive(('skill', category, name), lambda data: CachedBody.from_data(data[category][name]))
+    return cached_json_response(request, cached)
 
 @app.post("/api/auth/github")
 async def verify_github_token(request: dict):
     """Verifica o token do GitHub e retorna informações do usuário"""
     try:
         token = request.get("token")
-        headers = {"Authorization": f"token {token}"}
-        response = requests.get("https://api.github.com/user", headers=headers)
+        user_data = await get_github_profile(token)
         
-        if response.status_code == 200:
-            user_data = response.json()
+        if user_data:
             return {
                 "login": user_data["login"],
-                "name": user_data.get("name", user_data["login"]),
+                "name": user_data.get("name") or user_data["login"],
                 "avatar_url": user_data["avatar_url"]
             }
         else:
@@ -426,55 +800,40 @@ async def add_recommendation(comment: CommentRequest):
     try:
         user_data = None
         provider = None
-        google_data = None  # Adicionar variável para dados do Google
         
         # Verificar se é token GitHub
         if comment.github_token:
-            headers = {"Authorization": f"token {comment.github_token}"}
-            response = requests.get("https://api.github.com/user", headers=headers)
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                provider = "github"
+            user_data = await get_github_profile(comment.github_token)
+            provider = "github"
         
         # Verificar se é token Google
         elif comment.google_token:
-            headers = {"Authorization": f"Bearer {comment.google_token}"}
-            response = requests.get("https://www.googleapis.com/oauth2/v2/userinfo", headers=headers)
-            
-            if response.status_code == 200:
-                google_data = response.json()  # Guardar dados originais do Google
-                # Adaptar dados do Google para o formato esperado
-                user_data = {
-                    "name": google_data.get("name", "Usuário Google"),
-                    "login": f"google_{google_data.get('id', 'user')}",  # Usar ID do Google em vez do email
-                    "avatar_url": google_data.get("picture", ""),
-                    "email": google_data.get("email", "")
-                }
-                provider = "google"
+            user_data = await get_google_profile(comment.google_token)
+            provider = "google"
         
         if not user_data:
             raise HTTPException(status_code=401, detail="Token inválido ou não fornecido")
         
         # Criar nova recomendação na base de dados
-        username = None
-        if provider == "google":
-            username = f"google_{google_data.get('id', 'user')}"
-        else:
-            username = user_data.get("login", "unknown")
+        # (para Google o login já é google_<id>)
+        username = user_data.get("login") or "unknown"
+        # O GitHub devolve "name": null para contas sem nome definido
+        name = user_data.get("name") or user_data.get("login") or "Usuário"
+        avatar = user_data.get("avatar_url") or ""
             
-        recommendation_id = add_recommendation_to_db(
-            name=user_data.get("name", user_data.get("login", "Usuário")),
+        await add_recommendation_to_db(
+            name=name,
             text=comment.text,
-            avatar=user_data.get("avatar_url", ""),
+            avatar=avatar,
             username=username,
             provider=provider
         )
+        stats_counters.add("recommendations_count")
         
         new_recommendation = {
-            "name": user_data.get("name", user_data.get("login", "Usuário")),
+            "name": name,
             "text": comment.text,
-            "avatar": user_data.get("avatar_url", ""),
+            "avatar": avatar,
             "username": username,
             "provider": provider
         }
@@ -496,46 +855,46 @@ async def add_skill(request: Request, payload: dict):
         skill = payload.get('skill')
         if not category or not skill:
             raise HTTPException(status_code=400, detail='category and skill required')
-        here = os.path.dirname(os.path.abspath(__file__))
-        skills_path = os.path.normpath(os.path.join(here, 'data', 'skills.json'))
-        with open(skills_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # Ensure category exists and is a list
-        if category not in data or not isinstance(data.get(category), list):
-            data[category] = []
-        data[category].append(skill)
-        with open(skills_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[skills] Added skill to {category}: {skill.get('name')}")
+        if not isinstance(skill, dict) or not isinstance(skill.get('name'), str) or not skill['name']:
+            raise HTTPException(status_code=400, detail='skill.name required')
+        async with content_store.skills.transaction(deep=False) as data:
+            # Copy-on-write da categoria: o mapa atual é partilhado com o snapshot publicado
+            skills = dict(data.get(category, {}))
+            if skill['name'] in skills:
+                raise HTTPException(status_code=409, detail='Skill already exists')
+            skills[skill['name']] = skill
+            data[category] = skills
+        logger.info("Added skill to %s: %s", category, skill.get('name'))
         return {"message": "Skill adicionada com sucesso", "skill": skill}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao adicionar skill: {e}")
+        logger.exception("Erro ao adicionar skill: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao adicionar skill")
 
+def _log_unsent_contact(message_id, contact):
+    # Sem envio por email, o log é onde a mensagem é lida
+    logger.warning("Mensagem guardada sem envio por email", extra={
+        "message_id": message_id, "contact_name": contact.name, "contact_email": contact.email,
+        "contact_message": contact.message})
+
 @app.post("/api/contact")
 async def send_contact_message(contact: ContactMessage):
-    """Envia mensagem de contato por email"""
+    """Guarda a mensagem de contato e coloca-a na fila de envio por email"""
+    # Gravar primeiro no outbox: a mensagem fica guardada mesmo que o envio falhe
+    message_id = await save_contact_message(contact.name, contact.email, contact.message, False)
+    stats_counters.add("contact_messages_count")
     try:
         # Configurações do email - carregadas do arquivo .env
-        smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        sender_email = os.getenv("SENDER_EMAIL")
-        sender_password = os.getenv("SENDER_PASSWORD")
-        recipient_email = os.getenv("RECIPIENT_EMAIL")
+        sender_email = SENDER_EMAIL
+        recipient_email = RECIPIENT_EMAIL
         
         # Verificar se as configurações estão definidas
-        if not sender_email or not sender_password or not recipient_email:
-            # Modo de teste - salvar na base de dados sem enviar email
-            message_id = save_contact_message(contact.name, contact.email, contact.message, False)
-            print(f"=== MENSAGEM SALVA NA BD (ID: {message_id}) ===")
-            print(f"De: {contact.name} ({contact.email})")
-            print(f"Mensagem: {contact.message}")
-            print(f"=============================================")
+        if not sender_email or not SENDER_PASSWORD or not recipient_email:
+            # Modo de teste - mensagem guardada sem enviar email
+            _log_unsent_contact(message_id, contact)
             return {"message": "Mensagem recebida e salva! Configure o arquivo .env para envio automático por email."}
         
-        # Tentar enviar email e salvar na base de dados
         # Criar mensagem
         msg = MIMEMultipart()
         msg['From'] = sender_email
@@ -558,27 +917,16 @@ async def send_contact_message(contact: ContactMessage):
         
         msg.attach(MIMEText(body, 'plain'))
         
-        # Enviar email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, recipient_email, text)
-        server.quit()
-        
-        # Salvar na base de dados como enviado com sucesso
-        message_id = save_contact_message(contact.name, contact.email, contact.message, True)
+        # Enviar em background; o worker grava o resultado via _on_mail_result
+        if not mail_queue.enqueue(OutgoingMail(sender_email, recipient_email, msg.as_string(), meta=(contact, message_id, request_id.get()))):
+            raise RuntimeError("fila de email cheia")
         
-        return {"message": "Mensagem enviada com sucesso!"}
+        return {"message": "Mensagem recebida! Será enviada por email em instantes."}
         
     except Exception as e:
-        print(f"Erro ao enviar email: {e}")
-        # Em caso de erro, salvar mensagem na base de dados
-        message_id = save_contact_message(contact.name, contact.email, contact.message, False)
-        print(f"=== MENSAGEM SALVA NA BD (ID: {message_id}) ===")
-        print(f"De: {contact.name} ({contact.email})")
-        print(f"Mensagem: {contact.message}")
-        print(f"=============================================")
+        logger.error("Erro ao enviar email: %s", e)
+        # Em caso de erro, a mensagem já está guardada no outbox
+        _log_unsent_contact(message_id, contact)
         return {"message": "Mensagem recebida e salva! Houve um erro no envio automático."}
 
 @app.post("/api/admin/login")
@@ -591,12 +939,12 @@ async def admin_login(payload: dict):
         if password != ADMIN_PASSWORD:
             raise HTTPException(status_code=401, detail="Invalid password")
         token = secrets.token_urlsafe(32)
-        admin_tokens[token] = True
+        admin_tokens.put(token, True, ADMIN_TOKEN_TTL)
         return {"token": token}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"admin login error: {e}")
+        logger.exception("admin login error: %s", e)
         raise HTTPException(status_code=500, detail="Server error")
 
 
@@ -611,53 +959,38 @@ async def add_project(request: Request, project: Project):
     """Adicionar novo projeto gravando em Back/data/projects.json (admin only)"""
     try:
         _validate_admin_token(request)
-        here = os.path.dirname(os.path.abspath(__file__))
-        projects_path = os.path.normpath(os.path.join(here, 'data', 'projects.json'))
-        # Read existing
-        with open(projects_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if not isinstance(data, list):
-            data = []
-        # Append new project
-        project_dict = project.dict()
-        data.append(project_dict)
-        # Write back
-        with open(projects_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[project] Added project: {project.title}")
+        project_dict = {**project.dict(), "id": new_project_id()}
+        # Read, append and write back as one locked step
+        async with content_store.projects.transaction(deep=False) as data:
+            data.append(project_dict)
+        stats_counters.add("projects_count")
+        logger.info("Added project: %s", project.title, extra={"project_id": project_dict["id"]})
         return {"message": "Projeto adicionado com sucesso", "project": project_dict}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao adicionar projeto: {e}")
-        raise HTTPException(status_code=500, detail="Erro ao adicionar projeto")
-    except Exception as e:
-        print(f"Erro ao adicionar projeto: {e}")
+        logger.exception("Erro ao adicionar projeto: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao adicionar projeto")
 
 
-@app.delete("/api/projects/{index}")
-async def delete_project(request: Request, index: int):
-    """Delete a project by index from Back/data/projects.json (admin only)."""
+@app.delete("/api/projects/{project_id}")
+async def delete_project(request: Request, project_id: str):
+    """Delete a project by id (or legacy list index) from Back/data/projects.json (admin only)."""
     try:
         _validate_admin_token(request)
-        here = os.path.dirname(os.path.abspath(__file__))
-        projects_path = os.path.normpath(os.path.join(here, 'data', 'projects.json'))
-        with open(projects_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if not isinstance(data, list):
-            raise HTTPException(status_code=400, detail='Projects file invalid')
-        if index < 0 or index >= len(data):
-            raise HTTPException(status_code=404, detail='Project index out of range')
-        removed = data.pop(index)
-        with open(projects_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[project] Removed project: {removed.get('title')}")
+        async with content_store.projects.transaction(deep=False) as data:
+            # Com o lock de escrita, este é o snapshot de onde `data` foi copiado
+            position = _project_position(content_store.projects.snapshot(), project_id)
+            if position is None:
+                raise HTTPException(status_code=404, detail='Project not found')
+            removed = data.pop(position)
+        stats_counters.add("projects_count", -1)
+        logger.info("Removed project: %s", removed.get('title'), extra={"project_id": removed.get('id')})
         return {"message": "Projeto removido com sucesso", "project": removed}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao remover projeto: {e}")
+        logger.exception("Erro ao remover projeto: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao remover projeto")
 
 
@@ -673,56 +1006,41 @@ async def delete_skill(request: Request, payload: dict):
         name = payload.get('name')
         if not category or not name:
             raise HTTPException(status_code=400, detail='category and name required')
-        here = os.path.dirname(os.path.abspath(__file__))
-        skills_path = os.path.normpath(os.path.join(here, 'data', 'skills.json'))
-        with open(skills_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if category not in data or not isinstance(data.get(category), list):
-            raise HTTPException(status_code=404, detail='Category not found')
-        removed = None
-        new_list = []
-        for item in data.get(category, []):
-            if isinstance(item, dict) and item.get('name') == name and removed is None:
-                removed = item
-                continue
-            new_list.append(item)
-        if removed is None:
-            raise HTTPException(status_code=404, detail='Skill not found')
-        data[category] = new_list
-        with open(skills_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[skills] Removed skill from {category}: {name}")
+        async with content_store.skills.transaction(deep=False) as data:
+            if category not in data:
+                raise HTTPException(status_code=404, detail='Category not found')
+            skills = dict(data[category])
+            removed = skills.pop(name, None)
+            if removed is None:
+                raise HTTPException(status_code=404, detail='Skill not found')
+            data[category] = skills
+        logger.info("Removed skill from %s: %s", category, name)
         return {"message": "Skill removida com sucesso", "skill": removed}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao remover skill: {e}")
+        logger.exception("Erro ao remover skill: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao remover skill")
 
 
-@app.put("/api/projects/{index}")
-async def edit_project(request: Request, index: int, project: Project):
-    """Edit a project at a given index in Back/data/projects.json (admin only)."""
+@app.put("/api/projects/{project_id}")
+async def edit_project(request: Request, project_id: str, project: Project):
+    """Edit a project by id (or legacy list index) in Back/data/projects.json (admin only)."""
     try:
         _validate_admin_token(request)
-        here = os.path.dirname(os.path.abspath(__file__))
-        projects_path = os.path.normpath(os.path.join(here, 'data', 'projects.json'))
-        with open(projects_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if not isinstance(data, list):
-            raise HTTPException(status_code=400, detail='Projects file invalid')
-        if index < 0 or index >= len(data):
-            raise HTTPException(status_code=404, detail='Project index out of range')
-        project_dict = project.dict()
-        data[index] = project_dict
-        with open(projects_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[project] Edited project at index {index}: {project_dict.get('title')}")
+        async with content_store.projects.transaction(deep=False) as data:
+            # Com o lock de escrita, este é o snapshot de onde `data` foi copiado
+            position = _project_position(content_store.projects.snapshot(), project_id)
+            if position is None:
+                raise HTTPException(status_code=404, detail='Project not found')
+            project_dict = {**project.dict(), "id": data[position]["id"]}
+            data[position] = project_dict
+        logger.info("Edited project: %s", project_dict.get('title'), extra={"project_id": project_dict["id"]})
         return {"message": "Projeto atualizado com sucesso", "project": project_dict}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao editar projeto: {e}")
+        logger.exception("Erro ao editar projeto: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao editar projeto")
 
 
@@ -739,34 +1057,145 @@ async def edit_skill(request: Request, payload: dict):
         new_skill = payload.get('skill')
         if not category or not name or not new_skill:
             raise HTTPException(status_code=400, detail='category, name and skill required')
-        here = os.path.dirname(os.path.abspath(__file__))
-        skills_path = os.path.normpath(os.path.join(here, 'data', 'skills.json'))
-        with open(skills_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if category not in data or not isinstance(data.get(category), list):
-            raise HTTPException(status_code=404, detail='Category not found')
-        updated = None
-        new_list = []
-        for item in data.get(category, []):
-            if isinstance(item, dict) and item.get('name') == name and updated is None:
-                new_list.append(new_skill)
-                updated = new_skill
-                continue
-            new_list.append(item)
-        if updated is None:
-            raise HTTPException(status_code=404, detail='Skill not found')
-        data[category] = new_list
-        with open(skills_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[skills] Edited skill in {category}: {name} -> {new_skill.get('name')}")
+        new_name = new_skill.get('name') if isinstance(new_skill, dict) else None
+        if not isinstance(new_name, str) or not new_name:
+            raise HTTPException(status_code=400, detail='skill.name required')
+        async with content_store.skills.transaction(deep=False) as data:
+            if category not in data:
+                raise HTTPException(status_code=404, detail='Category not found')
+            skills = data[category]
+            if name not in skills:
+                raise HTTPException(status_code=404, detail='Skill not found')
+            if new_name == name:
+                skills = {**skills, name: new_skill}
+            elif new_name in skills:
+                raise HTTPException(status_code=409, detail='Skill already exists')
+            else:
+                # Renomear mantendo a posição na categoria
+                skills = {(new_name if key == name else key): (new_skill if key == name else value)
+                          for key, value in skills.items()}
+            data[category] = skills
+        logger.info("Edited skill in %s: %s -> %s", category, name, new_skill.get('name'))
         return {"message": "Skill atualizada com sucesso", "skill": new_skill}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro ao editar skill: {e}")
+        logger.exception("Erro ao editar skill: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao editar skill")
 
 
+@app.post("/api/admin/batch")
+async def admin_batch(request: Request, batch: BatchRequest):
+    """Aplica uma lista ordenada de operações de projetos/skills: todas ou nenhuma (admin only).
+
+    Cada ficheiro é escrito uma só vez no fim. Se uma operação falhar, a
+    resposta indica qual (`operation`, índice na lista) e nada é gravado.
+    """
+    _validate_admin_token(request)
+    operations = [op.model_dump() for op in batch.operations]
+    try:
+        results, projects_delta = await apply_batch(content_store, operations)
+    except BatchError as e:
+        raise HTTPException(status_code=e.status_code, detail={
+            "message": e.detail, "operation": e.index, "op": operations[e.index]["op"]})
+    if projects_delta:
+        stats_counters.add("projects_count", projects_delta)
+    logger.info("Admin batch applied", extra={"operations": len(operations)})
+    return {"message": "Operações aplicadas", "results": results}
+
+
+@app.get("/api/admin/mail-queue")
+def mail_queue_status(request: Request):
+    """Estado da fila de emails: profundidade, latência de envio e falhas (admin only)."""
+    _validate_admin_token(request)
+    return mail_queue.stats()
+
+
+@app.get("/api/admin/sessions")
+def session_store_status(request: Request):
+    """Tamanho e expirações dos stores de sessão (admin only)."""
+    _validate_admin_token(request)
+    return {"oauth_states": oauth_states.stats(), "admin_tokens": admin_tokens.stats()}
+
+
+@metrics.collector
+def _component_metrics():
+    """Contadores que os componentes já mantêm, lidos no momento do scrape."""
+    samples = []
+    for document in content_store.documents():
+        name = os.path.basename(document.path)
+        samples.append(("counter", "json_reloads_total", (("document", name),), document.reloads))
+    token_stats = token_cache.stats()
+    for result in ("hits", "misses", "coalesced"):
+        samples.append(("counter", "token_cache_lookups_total", (("result", result),), token_stats[result]))
+    samples.append(("gauge", "token_cache_entries", (), token_stats["size"]))
+    mail_stats = mail_queue.stats()
+    samples.append(("gauge", "mail_queue_depth", (), mail_stats["queue_depth"]))
+    samples.append(("counter", "smtp_connects_total", (), mail_stats["connects"]))
+    samples.append(("counter", "outbox_records_total", (), outbox.journal.records))
+    samples.append(("counter", "outbox_fsyncs_total", (), outbox.journal.fsyncs))
+    samples.append(("counter", "log_records_dropped_total", (), dropped_records()))
+    samples.append(("gauge", "events_subscribers", (), change_feed.subscribers))
+    for result in ("hits", "misses", "coalesced", "stale"):
+        samples.append(("counter", "media_cache_requests_total", (("result", result),), getattr(media_cache, result)))
+    samples.append(("counter", "media_cache_evictions_total", (), media_cache.evictions))
+    samples.append(("counter", "events_published_total", (), change_feed.published))
+    for store_name, store in (("oauth_states", oauth_states), ("admin_tokens", admin_tokens)):
+        labels = (("store", store_name),)
+        samples.append(("counter", "session_store_expired_total", labels, store.expired))
+        samples.append(("counter", "session_store_evicted_total", labels, store.evicted))
+        if isinstance(store, MemorySessionStore):
+            # O store SQLite é partilhado: somar o tamanho visto por cada worker contaria a dobrar
+            samples.append(("gauge", "session_store_entries", labels, len(store)))
+    return samples
+
+metrics.counter("json_reloads_total", "Reloads of projects.json / skills.json after a change on disk.")
+metrics.counter("token_cache_lookups_total", "OAuth token profile lookups by result.")
+metrics.gauge("token_cache_entries", "Profiles held in the token cache.")
+metrics.gauge("mail_queue_depth", "Contact emails waiting to be sent.")
+metrics.counter("smtp_connects_total", "SMTP sessions opened.")
+metrics.counter("outbox_records_total", "Records appended to the outbox journal.")
+metrics.counter("outbox_fsyncs_total", "fsync calls on the outbox journal (records are group-committed).")
+metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+metrics.gauge("events_subscribers", "Open /api/events streams.")
+metrics.counter("events_published_total", "Change events published on /api/events.")
+metrics.counter("media_cache_requests_total", "/media/proxy lookups by result (stale = upstream failed, cached copy served).")
+metrics.counter("media_cache_evictions_total", "Images dropped from the media cache to stay under its size limit.")
+metrics.counter("session_store_expired_total", "Session entries dropped after their TTL.")
+metrics.counter("session_store_evicted_total", "Session entries evicted because the store was full.")
+metrics.gauge("session_store_entries", "Live entries in the in-memory session stores.")
+
+async def _flush_metrics_periodically():
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(metrics.flush)
+        except OSError as e:
+            logger.error("Falha ao escrever métricas: %s", e)
+
+@app.on_event("startup")
+async def _start_metrics_flush():
+    # Com vários workers cada um escreve as suas métricas em METRICS_DIR
+    if metrics.directory:
+        _background_tasks.append(asyncio.create_task(_flush_metrics_periodically()))
+
+@app.on_event("shutdown")
+def _final_metrics_flush():
+    try:
+        metrics.flush()
+    except OSError as e:
+        logger.error("Falha ao escrever métricas: %s", e)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Métricas no formato de texto do Prometheus (somadas entre workers)."""
+    if METRICS_TOKEN:
+        auth = request.headers.get("authorization", "")
+        if not secrets.compare_digest(auth.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/admin/upload-cv")
 async def upload_cv(request: Request, file: UploadFile = File(...)):
     """Upload a CV PDF from the admin UI and save it into the backend mounted `public/cv`.
@@ -786,16 +1215,18 @@ async def upload_cv(request: Request, file: UploadFile = File(...)):
         os.makedirs(dest_dir, exist_ok=True)
         dest_path = os.path.join(dest_dir, 'Bernardo_Meneses.pdf')
 
-        contents = await file.read()
-        with open(dest_path, 'wb') as f:
-            f.write(contents)
+        # Stream to a temp file in the same directory, then rename into place
+        size = await save_upload(file, dest_path)
+        # Build the .br/.gz siblings off the request path
+        precompressor.schedule(dest_path)
+        path = await run_in_threadpool(fingerprinted_url, '/cv', dest_path)
 
-        print(f"[admin] CV uploaded to {dest_path}")
-        return {"message": "CV uploaded successfully", "path": "/cv/Bernardo_Meneses.pdf"}
+        logger.info("CV uploaded to %s (%d bytes)", dest_path, size)
+        return {"message": "CV uploaded successfully", "path": path}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error uploading CV: {e}")
+        logger.exception("Error uploading CV: %s", e)
         raise HTTPException(status_code=500, detail='Error uploading CV')
 
 
@@ -819,29 +1250,75 @@ async def upload_hero(request: Request, file: UploadFile = File(...)):
         ext = ext or '.jpg'
         dest_path = os.path.join(dest_dir, 'hero' + ext)
 
-        contents = await file.read()
-        with open(dest_path, 'wb') as f:
-            f.write(contents)
+        size = await save_upload(file, dest_path)
+        # Renditions are rendered in a process pool, off the request path
+        hero_renditions.schedule(dest_path)
 
-        print(f"[admin] Hero image uploaded to {dest_path}")
-        return {"message": "Hero image uploaded successfully", "path": "/hero/hero" + ext}
+        path = await run_in_threadpool(fingerprinted_url, '/hero', dest_path)
+
+        logger.info("Hero image uploaded to %s (%d bytes)", dest_path, size)
+        return {"message": "Hero image uploaded successfully", "path": path}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error uploading hero image: {e}")
+        logger.exception("Error uploading hero image: %s", e)
         raise HTTPException(status_code=500, detail='Error uploading hero image')
 
-@app.get("/api/stats")
-def get_stats():
-    """Obter estatísticas da base de dados"""
-    # Database disabled: return zeros and a note
-    return {
-        "recommendations_count": 0,
-        "projects_count": 0,
-        "contact_messages_count": 0,
-        "sent_messages_count": 0,
-        "database_path": None
+def _latest_hero_upload():
+    candidates = [os.path.join(backend_hero_dir, name) for name in os.listdir(backend_hero_dir)
+                  if name.startswith('hero.')]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+@app.get("/hero")
+def get_hero(request: Request, w: Optional[int] = None):
+    """Serve the best hero rendition for the client's `Accept` header and width.
+
+    The width comes from `?w=` or the `Sec-CH-Width` client hint; without
+    renditions (no Pillow, or still rendering) the original upload is served.
+    """
+    hint = request.headers.get("sec-ch-width") or request.headers.get("width")
+    width = w or (int(hint) if hint and hint.isdigit() else None)
+    headers = {
+        "Vary": "Accept, Sec-CH-Width",
+        "Accept-CH": "Sec-CH-Width",
+        "Cache-Control": "no-cache",
+    }
+    picked = hero_renditions.pick(request.headers.get("accept"), width)
+    if picked is not None:
+        path, media_type = picked
+        return FileResponse(path, media_type=media_type, headers=headers)
+    original = _latest_hero_upload()
+    if original is None:
+        raise HTTPException(status_code=404, detail='Hero image not uploaded')
+    return FileResponse(original, headers=headers)
+
+
+@app.get("/media/proxy")
+async def media_proxy(request: Request, url: str = Query(..., max_length=4096)):
+    """Serve uma imagem remota (hosts permitidos) a partir da cache em disco."""
+    try:
+        entry = await media_cache.get(url)
+    except MediaError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    headers = {
+        "Cache-Control": f"public, max-age={MEDIA_MAX_AGE}",
+        "ETag": entry.etag,
+        "X-Content-Type-Options": "nosniff",
+        # Um SVG aberto diretamente não pode correr scripts na nossa origem
+        "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
     }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(entry.path, media_type=entry.content_type, headers=headers)
+
+
+@app.get("/api/stats")
+def get_stats(request: Request):
+    """Obter estatísticas da base de dados (contadores em memória, O(1))"""
+    cached = stats_counters.snapshot().derive('response', CachedBody.from_data)
+    return cached_json_response(request, cached)
 
 if __name__ == "__main__":
     import uvicorn
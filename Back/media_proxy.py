@@ -0,0 +1,304 @@
+"""Local caching proxy for remote images (`GET /media/proxy?url=...`).
+
+Project images and recommendation avatars live on third-party hosts
+(Discord CDN, GitHub, Google). `MediaCache` fetches each one once, keeps
+it on disk under `MEDIA_CACHE_DIR`, and serves it from there afterwards:
+
+* keyed by URL, without the signature parameters of re-signed links
+  (`MEDIA_VOLATILE_PARAMS`, Discord's `ex`/`is`/`hm`), so a Discord
+  attachment keeps working after its signed link has expired;
+* bounded: least recently used entries are deleted once the cache grows
+  past `MEDIA_CACHE_MAX_BYTES` (recency is the body file's mtime, bumped
+  on every hit, so it is shared by all workers);
+* concurrent misses for the same URL share one upstream fetch;
+* after `MEDIA_REVALIDATE_AFTER` an entry is revalidated upstream
+  (conditional GET); if the upstream fails, the cached copy keeps being
+  served.
+
+Only hosts in `MEDIA_ALLOWED_HOSTS` are fetched (redirects included), so
+the proxy cannot be pointed at internal services, and only `image/*`
+responses up to `MEDIA_MAX_BYTES` are stored. Workers share the cache
+directory: each one keeps the metadata it has read in memory, but the
+files are the source of truth. Evicting scans the directory under a lock
+(so the limit holds for the cache as a whole), and an entry another worker
+has evicted is fetched again.
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import urllib.parse
+
+import httpx
+
+import fast_json
+from content_store import FileLock
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(256 * 2**20)))
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 2**20)))
+# Browser cache lifetime of proxied images
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", str(7 * 24 * 3600)))
+MEDIA_REVALIDATE_AFTER = float(os.getenv("MEDIA_REVALIDATE_AFTER", str(7 * 24 * 3600)))
+MEDIA_MAX_REDIRECTS = int(os.getenv("MEDIA_MAX_REDIRECTS", "3"))
+# "host", "host:port" or "*.domain"
+MEDIA_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.getenv(
+    "MEDIA_ALLOWED_HOSTS",
+    "cdn.discordapp.com,media.discordapp.net,avatars.githubusercontent.com,*.googleusercontent.com",
+).split(",") if host.strip())
+MEDIA_VOLATILE_PARAMS = frozenset(name.strip() for name in os.getenv("MEDIA_VOLATILE_PARAMS", "ex,is,hm").split(",")
+                                  if name.strip())
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class MediaError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def host_allowed(parts, allowed_hosts=MEDIA_ALLOWED_HOSTS):
+    host = (parts.hostname or "").lower()
+    netloc = f"{host}:{parts.port}" if parts.port else host
+    for pattern in allowed_hosts:
+        if pattern.startswith("*."):
+            if host.endswith(pattern[1:]):
+                return True
+        elif pattern in (host, netloc):
+            return True
+    return False
+
+
+def cache_key(url, allowed_hosts=MEDIA_ALLOWED_HOSTS):
+    """Normalized URL used as the cache key; raises `MediaError` for URLs the proxy refuses."""
+    try:
+        parts = urllib.parse.urlsplit(url)
+        parts.port  # noqa: B018  (raises ValueError for an invalid port)
+    except ValueError:
+        raise MediaError(400, "Invalid url")
+    if parts.scheme not in ("http", "https") or not parts.hostname or parts.username or parts.password:
+        raise MediaError(400, "Invalid url")
+    if not host_allowed(parts, allowed_hosts):
+        raise MediaError(403, "Host not allowed")
+    query = urllib.parse.urlencode([(name, value) for name, value in urllib.parse.parse_qsl(parts.query)
+                                    if name not in MEDIA_VOLATILE_PARAMS])
+    netloc = parts.hostname.lower() + (f":{parts.port}" if parts.port else "")
+    return urllib.parse.urlunsplit((parts.scheme, netloc, parts.path or "/", query, ""))
+
+
+class MediaEntry:
+    __slots__ = ("digest", "path", "content_type", "etag", "size", "fetched_at", "upstream_etag",
+                 "upstream_last_modified")
+
+    def __init__(self, digest, path, meta):
+        self.digest = digest
+        self.path = path
+        self.content_type = meta["content_type"]
+        self.etag = meta["etag"]
+        self.size = meta["size"]
+        self.fetched_at = meta["fetched_at"]
+        self.upstream_etag = meta.get("upstream_etag")
+        self.upstream_last_modified = meta.get("upstream_last_modified")
+
+    def meta(self):
+        return {name: getattr(self, name) for name in self.__slots__[2:]}
+
+
+class MediaCache:
+    def __init__(self, client, directory=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES,
+                 allowed_hosts=MEDIA_ALLOWED_HOSTS):
+        self.client = client
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allowed_hosts = allowed_hosts
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.bytes = 0  # on disk, as of the last eviction pass
+        self._entries = {}  # digest -> MediaEntry (metadata only; the files are the source of truth)
+        self._flights = SingleFlight()
+
+    @property
+    def coalesced(self):
+        return self._flights.coalesced
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read_entry(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path + ".json", "rb") as f:
+                meta = fast_json.loads(f.read())
+            if os.path.getsize(path) != meta["size"]:
+                return None
+            return MediaEntry(digest, path, meta)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _touch(self, entry):
+        """Mark `entry` as used (its body's mtime); False if another worker evicted it."""
+        try:
+            os.utime(entry.path)
+            return True
+        except FileNotFoundError:
+            self._entries.pop(entry.digest, None)
+            return False
+
+    def _evict(self, keep):
+        """Delete the least recently used bodies, whichever worker stored them, until the cache fits.
+
+        Runs under a lock on the cache directory, so concurrent passes of
+        several workers do not evict more than needed. Returns the bytes
+        left on disk and the evicted digests.
+        """
+        lock = FileLock(os.path.join(self.directory, ".lock"))
+        lock.acquire()
+        try:
+            bodies = []  # (mtime, size, digest)
+            with contextlib.suppress(FileNotFoundError):
+                for shard in os.scandir(self.directory):
+                    if not shard.is_dir():
+                        continue
+                    for item in os.scandir(shard.path):
+                        if item.name.startswith(".") or item.name.endswith(".json"):
+                            continue
+                        with contextlib.suppress(FileNotFoundError):
+                            stat = item.stat()
+                            bodies.append((stat.st_mtime, stat.st_size, item.name))
+            total = sum(size for _, size, _ in bodies)
+            evicted = []
+            for _, size, digest in sorted(bodies):
+                if total <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                _remove([self._path(digest)])
+                total -= size
+                evicted.append(digest)
+            return total, evicted
+        finally:
+            lock.release()
+
+    async def get(self, url):
+        """The cached `MediaEntry` for `url`, fetching it first if needed."""
+        key = cache_key(url, self.allowed_hosts)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        entry = self._entries.get(digest)
+        if entry is None:
+            # Fetched by another worker, or before a restart
+            entry = await asyncio.to_thread(self._read_entry, digest)
+            if entry is not None:
+                self._entries[digest] = entry
+        if entry is not None and time.time() - entry.fetched_at < MEDIA_REVALIDATE_AFTER and self._touch(entry):
+            self.hits += 1
+            return entry
+        if entry is not None and not os.path.exists(entry.path):
+            entry = None
+        return await self._flights.run(digest, lambda: self._refresh(url, digest, entry))
+
+    async def _refresh(self, url, digest, cached):
+        self.misses += 1
+        try:
+            return await self._fetch(url, digest, cached)
+        except (MediaError, httpx.HTTPError) as e:
+            if cached is None or not self._touch(cached):
+                if isinstance(e, MediaError):
+                    raise
+                raise MediaError(502, "Upstream fetch failed")
+            # Expired signed link, upstream down, ...: keep serving what we have
+            logger.warning("Serving stale media: %s", e, extra={"url": cache_key(url, self.allowed_hosts)})
+            self.stale += 1
+            return cached
+
+    async def _fetch(self, url, digest, cached):
+        headers = {"Accept": "image/*"}
+        if cached is not None:
+            if cached.upstream_etag:
+                headers["If-None-Match"] = cached.upstream_etag
+            if cached.upstream_last_modified:
+                headers["If-Modified-Since"] = cached.upstream_last_modified
+        for _ in range(MEDIA_MAX_REDIRECTS + 1):
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code in _REDIRECTS and "location" in response.headers:
+                    url = urllib.parse.urljoin(url, response.headers["location"])
+                    # Every hop is checked against the allowlist
+                    cache_key(url, self.allowed_hosts)
+                    continue
+                if response.status_code == 304 and cached is not None and self._touch(cached):
+                    cached.fetched_at = time.time()
+                    await asyncio.to_thread(_write_atomic, cached.path + ".json", fast_json.dumps(cached.meta()))
+                    return cached
+                if response.status_code in (404, 410):
+                    raise MediaError(404, "Image not found upstream")
+                if response.status_code != 200:
+                    raise MediaError(502, f"Upstream returned {response.status_code}")
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if not content_type.startswith("image/"):
+                    raise MediaError(502, "Upstream did not return an image")
+                try:
+                    declared = int(response.headers.get("content-length") or 0)
+                except ValueError:
+                    raise MediaError(502, "Invalid Content-Length from upstream")
+                if declared > MEDIA_MAX_BYTES:
+                    raise MediaError(502, "Image too large")
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > MEDIA_MAX_BYTES:
+                        raise MediaError(502, "Image too large")
+                    chunks.append(chunk)
+                upstream_etag = response.headers.get("etag")
+                upstream_last_modified = response.headers.get("last-modified")
+            body = b"".join(chunks)
+            entry = MediaEntry(digest, self._path(digest), {
+                "content_type": content_type,
+                "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+                "size": len(body),
+                "fetched_at": time.time(),
+                "upstream_etag": upstream_etag,
+                "upstream_last_modified": upstream_last_modified,
+            })
+            await asyncio.to_thread(self._store, entry, body)
+            self._entries[digest] = entry
+            self.bytes, evicted = await asyncio.to_thread(self._evict, digest)
+            self.evictions += len(evicted)
+            for victim in evicted:
+                self._entries.pop(victim, None)
+            return entry
+        raise MediaError(502, "Too many redirects")
+
+    def _store(self, entry, body):
+        os.makedirs(os.path.dirname(entry.path), exist_ok=True)
+        # Body first: an entry only exists once its metadata is in place
+        _write_atomic(entry.path, body)
+        _write_atomic(entry.path + ".json", fast_json.dumps(entry.meta()))
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def _remove(paths):
+    for path in paths:
+        for name in (path + ".json", path):
+            with contextlib.suppress(OSError):
+                os.unlink(name)
@@ -0,0 +1,364 @@
+"""Prometheus-style metrics, exposed at `/metrics`.
+
+`registry` holds counters, gauges and histograms keyed by (name, labels).
+Updates take no lock: each thread (the event loop, the thread pool used by
+sync endpoints and `to_thread`) writes to its own cells, and a scrape sums
+them. `MetricsMiddleware` records per-route request counts, latency,
+response sizes and in-flight requests; other modules record their own
+metrics (upstream calls, SMTP sends, cache hits) and `collector`
+callbacks add values that components already count (JSON reloads, token
+cache hits, queue depth) at scrape time.
+
+With several workers, set `METRICS_DIR` (gunicorn.conf.py does): every
+worker periodically writes its own values to `<METRICS_DIR>/<pid>.json`
+(each file has a single writer, so no cross-process locking), and a
+scrape on any worker sums all files. The files of workers that have
+exited are folded into `archive.json`: their gauges are dropped, their
+counters and histograms kept, so totals never go backwards.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+from content_store import FileLock
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+ARCHIVE_FILE = "archive.json"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Cells:
+    """Counters, gauge deltas and histograms written by one thread only."""
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}    # (name, labels) -> value
+        self.gauges = {}      # (name, labels) -> sum of `add` deltas
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def fold(self, other):
+        """Add `other`'s values to ours; `other` may still be written by its thread."""
+        # dict() and list() copy in one step under the GIL, so a concurrent
+        # update is either fully in the copy or left for the next scrape
+        for key, value in dict(other.counters).items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, value in dict(other.gauges).items():
+            self.gauges[key] = self.gauges.get(key, 0) + value
+        for key, state in dict(other.histograms).items():
+            total = self.histograms.get(key)
+            self.histograms[key] = list(state) if total is None else [a + b for a, b in zip(total, state)]
+
+
+class Registry:
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._meta = {}        # name -> (type, help, buckets)
+        self._gauges = {}      # (name, labels) -> value from `set`
+        self._collectors = []
+        self._local = threading.local()
+        self._threads = []     # every live thread's _Cells
+        self._retired = _Cells()  # values of threads that have exited
+        self._lock = threading.Lock()  # first update of a thread, and scrapes
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, tuple(buckets) if buckets else None)
+
+    def counter(self, name, help_text):
+        self.describe(name, "counter", help_text)
+
+    def gauge(self, name, help_text):
+        self.describe(name, "gauge", help_text)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.describe(name, "histogram", help_text, buckets)
+
+    def _cells(self):
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = _Cells(threading.current_thread())
+            with self._lock:
+                self._threads.append(cells)
+            return cells
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._cells().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def set(self, name, value, labels=()):
+        """Set a gauge (one that is only ever `set`, never `add`ed to)."""
+        self._gauges[(name, labels)] = value
+
+    def add(self, name, delta, labels=()):
+        gauges = self._cells().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + delta
+
+    def observe(self, name, value, labels=()):
+        histograms = self._cells().histograms
+        key = (name, labels)
+        state = histograms.get(key)
+        if state is None:
+            state = histograms[key] = [0] * (len(self._meta[name][2]) + 1) + [0.0]
+        state[bisect.bisect_left(self._meta[name][2], value)] += 1
+        state[-1] += value
+
+    def collector(self, func):
+        """Register `func() -> [(kind, name, labels, value)]`, called at scrape/flush time."""
+        self._collectors.append(func)
+        return func
+
+    def _local_state(self):
+        total = _Cells()
+        with self._lock:
+            live = []
+            for cells in self._threads:
+                if cells.thread.is_alive():
+                    live.append(cells)
+                else:
+                    self._retired.fold(cells)
+            self._threads = live
+            total.fold(self._retired)
+        for cells in live:
+            total.fold(cells)
+        counters = total.counters
+        gauges = {**total.gauges, **self._gauges}
+        for func in self._collectors:
+            for kind, name, labels, value in func():
+                (counters if kind == "counter" else gauges)[(name, tuple(labels))] = value
+        return {
+            "pid": os.getpid(),
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "gauges": [[name, labels, value] for (name, labels), value in gauges.items()],
+            "histograms": [[name, labels, state] for (name, labels), state in total.histograms.items()],
+        }
+
+    def flush(self):
+        """Write this worker's values to `<directory>/<pid>.json` (no-op without a directory)."""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        state = self._local_state()
+        _write_state(os.path.join(self.directory, f"{state['pid']}.json"), state)
+
+    def _states(self):
+        if not self.directory:
+            return [self._local_state()]
+        self.flush()
+        states, dead = [], []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name == ARCHIVE_FILE:
+                continue
+            state = _read_state(os.path.join(self.directory, name))
+            if state is None:
+                continue  # being replaced right now; picked up on the next scrape
+            if _pid_alive(state["pid"]):
+                states.append(state)
+            else:
+                dead.append(name)
+        archive = self._archive(dead) if dead else _read_state(os.path.join(self.directory, ARCHIVE_FILE))
+        if archive is not None:
+            states.append(archive)
+        return states
+
+    def _archive(self, dead):
+        """Fold the files of exited workers (names in `dead`) into the archive and return it."""
+        path = os.path.join(self.directory, ARCHIVE_FILE)
+        lock = FileLock(os.path.join(self.directory, ".archive.lock"))
+        lock.acquire()
+        try:
+            total = _Cells()
+            archive = _read_state(path)
+            if archive is not None:
+                total.fold(_cells_of(archive))
+            for name in dead:
+                state = _read_state(os.path.join(self.directory, name))
+                if state is not None:  # None: another worker folded it first
+                    total.fold(_cells_of(state))
+            archive = {
+                "pid": None,
+                "counters": [[name, labels, value] for (name, labels), value in total.counters.items()],
+                "gauges": [],
+                "histograms": [[name, labels, state] for (name, labels), state in total.histograms.items()],
+            }
+            _write_state(path, archive)
+            for name in dead:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            return archive
+        finally:
+            lock.release()
+
+    def render(self):
+        """All metrics, summed across workers, in the Prometheus text format."""
+        counters, gauges, histograms = {}, {}, {}
+        for state in self._states():
+            for name, labels, value in state["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in state["gauges"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                gauges[key] = gauges.get(key, 0) + value
+            for name, labels, values in state["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.get(key)
+                histograms[key] = list(values) if total is None else [a + b for a, b in zip(total, values)]
+
+        by_name = {}
+        for kind, samples in (("counter", counters), ("gauge", gauges), ("histogram", histograms)):
+            for (name, labels), value in samples.items():
+                by_name.setdefault(name, (kind, []))[1].append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, samples = by_name[name]
+            meta = self._meta.get(name)
+            if meta is not None:
+                lines.append(f"# HELP {name} {meta[1]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples):
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(meta[2] + (float("inf"),), value[:-1]):
+                    cumulative += count
+                    le = labels + (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(path, state):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".metrics-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _cells_of(state):
+    """The counters and histograms of a worker file as `_Cells` (its gauges are dropped)."""
+    cells = _Cells()
+    for name, labels, value in state["counters"]:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        cells.counters[key] = cells.counters.get(key, 0) + value
+    for name, labels, values in state["histograms"]:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        cells.histograms[key] = list(values)
+    return cells
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+registry = Registry()
+
+registry.counter("http_requests_total", "HTTP requests by method, route and status.")
+registry.histogram("http_request_duration_seconds", "HTTP request latency by method and route.")
+registry.histogram("http_response_size_bytes", "HTTP response body size (as sent) by method and route.",
+                   buckets=SIZE_BUCKETS)
+registry.gauge("http_requests_in_flight", "HTTP requests being processed, by method.")
+registry.histogram("upstream_request_duration_seconds", "Calls to GitHub / Google by host and method.")
+registry.counter("upstream_requests_total", "Calls to GitHub / Google by host, method and outcome.")
+registry.histogram("smtp_send_duration_seconds", "Time to hand a batch of emails to the SMTP server.")
+registry.counter("smtp_messages_total", "Contact emails sent, retried or given up on.")
+registry.counter("http_cache_not_modified_total", "Cached JSON responses answered with 304.")
+registry.counter("compressed_body_cache_total", "Compressed cached bodies reused (hit) or built (miss).")
+
+
+class MetricsMiddleware:
+    """Per-route request count, latency, response size and in-flight gauge."""
+
+    def __init__(self, app, registry=registry):
+        self.app = app
+        self.registry = registry
+        self._routes = None  # endpoint -> route path template
+
+    def _route_template(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "<unmatched>"
+        if self._routes is None:
+            routes = {}
+            for route in scope["app"].routes:
+                # Mounted apps (StaticFiles) are the endpoint of their Mount
+                target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                routes.setdefault(target, route.path if hasattr(route, "endpoint") else route.path + "/{path}")
+            self._routes = routes
+        return self._routes.get(endpoint, "<unmatched>")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        registry = self.registry
+        method = scope["method"]
+        in_flight = (("method", method),)
+        registry.add("http_requests_in_flight", 1, in_flight)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def measuring_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, measuring_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.add("http_requests_in_flight", -1, in_flight)
+            labels = (("method", method), ("route", self._route_template(scope)))
+            registry.inc("http_requests_total", labels + (("status", status),))
+            registry.observe("http_request_duration_seconds", elapsed, labels)
+            registry.observe("http_response_size_bytes", size, labels)
@@ -0,0 +1,236 @@
+"""Durable outbox for recommendations and contact messages.
+
+Everything is appended to one line-delimited JSON journal. Writers hand
+their record to `Journal.append` and wait; whichever batch of records has
+accumulated while the previous fsync was running is written with a single
+`write` + `fsync` (group commit), so throughput grows with concurrency
+instead of being capped at one fsync per post.
+
+Reads never scan the file: the records are replayed once at startup into an
+in-memory index, and afterwards only the new tail of the file is applied.
+Because the index is rebuilt from the file itself (and not from what this
+process wrote), appends made by other uvicorn workers show up as well.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import threading
+from datetime import datetime, timezone
+
+import fast_json
+from content_store import Snapshot, FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Append-only JSONL file with group commit and incremental replay."""
+
+    def __init__(self, path, apply):
+        self.path = path
+        self.apply = apply
+        self.fsyncs = 0
+        self.records = 0
+        self._offset = 0
+        self._read_lock = threading.Lock()
+        self._pending = []
+        self._flusher = None
+
+    def recover(self):
+        """Drop a torn trailing record left by a crash, then replay the log."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock = FileLock(self.path + '.lock')
+        lock.acquire()
+        try:
+            with open(self.path, 'ab+') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    f.seek(max(0, size - 65536))
+                    tail = f.read()
+                    if not tail.endswith(b'\n'):
+                        cut = tail.rfind(b'\n')
+                        keep = size - len(tail) + cut + 1 if cut >= 0 else 0
+                        logger.warning("Discarding %d bytes of incomplete record at the end of %s", size - keep, self.path)
+                        f.truncate(keep)
+        finally:
+            lock.release()
+        self.refresh()
+
+    def refresh(self):
+        """Apply records appended since the last call (by any process)."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self._offset:
+            return
+        with self._read_lock:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            end = chunk.rfind(b'\n') + 1  # only complete lines
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    record = fast_json.loads(line)
+                except ValueError as e:
+                    logger.warning("Skipping unreadable outbox record: %s", e)
+                    continue
+                self.apply(record)
+                self.records += 1
+            self._offset += end
+
+    async def append(self, record):
+        """Durably append `record`; returns once it has been fsynced."""
+        line = fast_json.dumps(record) + b'\n'
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((line, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush())
+        await future
+        return record
+
+    async def _flush(self):
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, b''.join(line for line, _ in batch))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.refresh()
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, data):
+        lock = FileLock(self.path + '.lock')
+        lock.acquire()
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                os.fsync(fd)
+                self.fsyncs += 1
+            finally:
+                os.close(fd)
+        finally:
+            lock.release()
+
+
+class Outbox:
+    """Recommendations and contact messages, backed by a `Journal`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.journal = Journal(path, self._apply)
+        self.contact_messages_count = 0
+        self.sent_messages_count = 0
+        self._contact_sent = {}
+        self._recommendations = []
+        self._snapshot = Snapshot((), 0, None)
+        self._publish_lock = threading.Lock()
+        self._listeners = []
+        self._loaded = False
+
+    def load(self):
+        if not self._loaded:
+            self.journal.recover()
+            # What the journal already holds is the starting point, not a change
+            self._snapshot = Snapshot(tuple(self._recommendations), 1, None)
+            self._loaded = True
+
+    def subscribe(self, listener):
+        """Call `listener(previous, snapshot)` for every new recommendations snapshot.
+
+        Like `JsonDocument.subscribe`, listeners run with the lock held and
+        must be quick; new snapshots are built by `recommendations`, so
+        appends by other processes are seen on the next call.
+        """
+        with self._publish_lock:
+            self._listeners.append(listener)
+        return listener
+
+    def recommendations(self):
+        """Current recommendations as a `Snapshot` (data is a tuple, oldest first)."""
+        self.load()
+        self.journal.refresh()
+        if len(self._recommendations) != len(self._snapshot.data):
+            with self._publish_lock:
+                current = self._snapshot
+                if len(self._recommendations) != len(current.data):
+                    # Readers keep whatever tuple they already hold
+                    self._snapshot = Snapshot(tuple(self._recommendations), current.version + 1, None)
+                    for listener in self._listeners:
+                        try:
+                            listener(current, self._snapshot)
+                        except Exception:
+                            logger.exception("Listener of the outbox failed")
+        return self._snapshot
+
+    async def add_recommendation(self, name, text, avatar, username=None, provider='github'):
+        self.load()
+        record = await self.journal.append({
+            "type": "recommendation",
+            "id": secrets.token_hex(8),
+            "created_at": _now(),
+            "name": name,
+            "text": text,
+            "avatar": avatar,
+            "username": username,
+            "provider": provider,
+        })
+        self.recommendations()  # new snapshot (and listeners) right away
+        return record["id"]
+
+    async def add_contact_message(self, name, email, message, sent_by_email=False):
+        self.load()
+        record = await self.journal.append({
+            "type": "contact",
+            "id": secrets.token_hex(8),
+            "created_at": _now(),
+            "name": name,
+            "email": email,
+            "message": message,
+            "sent_by_email": sent_by_email,
+        })
+        return record["id"]
+
+    async def mark_contact_sent(self, message_id, sent=True):
+        self.load()
+        await self.journal.append({"type": "contact_status", "id": message_id, "sent_by_email": sent, "at": _now()})
+
+    def _apply(self, record):
+        kind = record.get("type")
+        if kind == "recommendation":
+            self._recommendations.append({
+                # Older records can hold null (GitHub accounts without a display name)
+                "name": record.get("name") or record.get("username") or "Usuário",
+                "text": record.get("text") or "",
+                "avatar": record.get("avatar") or "",
+                "username": record.get("username"),
+                "provider": record.get("provider"),
+            })
+        elif kind == "contact":
+            self.contact_messages_count += 1
+            self._set_contact_sent(record.get("id"), bool(record.get("sent_by_email")))
+        elif kind == "contact_status":
+            self._set_contact_sent(record.get("id"), bool(record.get("sent_by_email")))
+
+    def _set_contact_sent(self, message_id, sent):
+        was_sent = self._contact_sent.get(message_id, False)
+        self._contact_sent[message_id] = sent
+        self.sent_messages_count += int(sent) - int(was_sent)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
@@ -0,0 +1,131 @@
+"""Paginated, filtered and projected views of the projects list.
+
+A `ProjectIndex` is derived once per projects snapshot (see
+`Snapshot.derive`), so it is rebuilt only when projects.json changes:
+
+* an inverted index from each technology (case-insensitive) to the
+  sorted positions of the projects that use it; several `tech` values are
+  ANDed by walking the shortest list and probing the others' sets;
+* each project pre-serialized once per requested field set, so a page is
+  a join of byte fragments;
+* a small LRU of finished pages (`CachedBody`, with their ETag and
+  compressed variants), for the list views that ask the same thing again.
+
+Cursors are opaque to clients; they encode the position of the next
+project, so a page boundary stays put when other filters are used.
+"""
+import base64
+import bisect
+import functools
+import os
+import threading
+
+import fast_json
+from http_cache import CachedBody
+
+PROJECTS_PAGE_MAX = int(os.getenv("PROJECTS_PAGE_MAX", "100"))
+PROJECTS_PAGE_CACHE = int(os.getenv("PROJECTS_PAGE_CACHE", "256"))
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(f"p{position}".encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if raw[:1] == "p" and raw[1:].isdigit():
+            return int(raw[1:])
+    except (ValueError, UnicodeDecodeError):
+        pass
+    raise InvalidQuery("invalid cursor")
+
+
+def _tech_key(tech):
+    return tech.strip().lower()
+
+
+class ProjectIndex:
+    def __init__(self, projects, fields):
+        """`projects`: validated project dicts; `fields`: every field, in output order."""
+        self.projects = projects
+        self.fields = tuple(fields)
+        by_tech = {}
+        for position, project in enumerate(projects):
+            for tech in project.get("tech") or ():
+                positions = by_tech.setdefault(_tech_key(tech), [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        self.by_tech = {tech: tuple(positions) for tech, positions in by_tech.items()}
+        self._tech_sets = {}
+        self._fragments = {}
+        self._lock = threading.Lock()
+        # Per index, so cached pages go away with the snapshot
+        self.page = functools.lru_cache(maxsize=PROJECTS_PAGE_CACHE)(self._page)
+
+    def parse_fields(self, spec):
+        """`"title,tech"` -> the requested fields in output order (None = all)."""
+        if not spec:
+            return None
+        requested = {name.strip() for name in spec.split(",") if name.strip()}
+        unknown = requested.difference(self.fields)
+        if unknown:
+            raise InvalidQuery(f"unknown field(s): {', '.join(sorted(unknown))}")
+        fields = tuple(name for name in self.fields if name in requested)
+        return None if fields == self.fields else fields
+
+    def parse_tech(self, values):
+        """Repeated and/or comma-separated `tech` values -> sorted tuple of keys."""
+        keys = set()
+        for value in values or ():
+            keys.update(_tech_key(tech) for tech in value.split(",") if tech.strip())
+        return tuple(sorted(keys))
+
+    def _fragments_for(self, fields):
+        fragments = self._fragments.get(fields)
+        if fragments is None:
+            with self._lock:
+                fragments = self._fragments.get(fields)
+                if fragments is None:
+                    names = fields or self.fields
+                    fragments = self._fragments[fields] = tuple(
+                        fast_json.dumps({name: project.get(name) for name in names}) for project in self.projects)
+        return fragments
+
+    def _tech_set(self, tech):
+        found = self._tech_sets.get(tech)
+        if found is None:
+            found = self._tech_sets[tech] = frozenset(self.by_tech.get(tech, ()))
+        return found
+
+    def _matches(self, techs, start):
+        """Positions >= `start` of the projects that use every tech in `techs`, in order."""
+        if not techs:
+            return iter(range(start, len(self.projects)))
+        lists = sorted((self.by_tech.get(tech, ()) for tech in techs), key=len)
+        primary = lists[0]
+        others = [self._tech_set(tech) for tech in techs if self.by_tech.get(tech, ()) is not primary]
+        candidates = primary[bisect.bisect_left(primary, start):]
+        if not others:
+            return iter(candidates)
+        return (position for position in candidates if all(position in other for other in others))
+
+    def _page(self, techs, fields, start, limit):
+        """Response body for one query; `limit` None means an unpaginated list."""
+        fragments = self._fragments_for(fields)
+        matches = self._matches(techs, start)
+        if limit is None:
+            return CachedBody(b"[" + b",".join(fragments[position] for position in matches) + b"]")
+        items = []
+        next_cursor = None
+        for position in matches:
+            if len(items) == limit:
+                next_cursor = encode_cursor(position)
+                break
+            items.append(fragments[position])
+        return CachedBody(b'{"items":[' + b",".join(items) + b'],"next_cursor":'
+                          + fast_json.dumps(next_cursor) + b"}")
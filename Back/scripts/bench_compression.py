@@ -0,0 +1,82 @@
+"""Bytes on the wire and server CPU per request, with and without compression.
+
+Starts the backend from a scratch copy (with `--projects` synthetic
+projects added to the data), then fetches each cached read endpoint
+`--requests` times per Accept-Encoding (identity, gzip, br) and reports
+the body size on the wire and the server's CPU time per request. The
+cached endpoints compress once per data version, so the br/gzip CPU
+should stay close to identity; for reference, the cost of compressing
+each body on every request instead is printed at the end.
+
+    python scripts/bench_compression.py --requests 2000
+"""
+import argparse
+import json
+import os
+import time
+
+from bench_support import SubprocessServer, process_cpu_seconds, scratch_backend
+
+import httpx
+
+from compression import compress  # noqa: E402  (bench_support puts the backend on sys.path)
+
+ENDPOINTS = ('/api/skills', '/api/projects', '/api/recommendations', '/api/stats')
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+def _seed_projects(backend_dir, count):
+    path = os.path.join(backend_dir, 'data', 'projects.json')
+    with open(path, encoding='utf-8') as f:
+        projects = json.load(f)
+    template = projects[0] if projects else {"title": "", "description": "", "repo": "", "link": "", "image": "", "tech": []}
+    for i in range(count):
+        projects.append({**template, "title": f"Synthetic project {i}",
+                         "description": f"Benchmark project number {i} " * 4})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(projects, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--projects', type=int, default=100)
+    args = parser.parse_args()
+
+    bodies = {}
+    with scratch_backend() as backend_dir:
+        _seed_projects(backend_dir, args.projects)
+        with SubprocessServer('main:app', env={'ADMIN_PASSWORD': 'bench'}, cwd=backend_dir) as server:
+            pid = server.proc.pid
+            print(f"{'endpoint':<22} {'encoding':<9} {'wire bytes':>10} {'ratio':>6} {'CPU µs/req':>11}")
+            for endpoint in ENDPOINTS:
+                identity_size = None
+                for encoding in ENCODINGS:
+                    with httpx.Client(base_url=server.url, headers={'Accept-Encoding': encoding}) as client:
+                        client.get(endpoint).raise_for_status()  # warm up (and build the cached variant)
+                        cpu_before = process_cpu_seconds(pid)
+                        wire = 0
+                        for _ in range(args.requests):
+                            r = client.get(endpoint)
+                            r.raise_for_status()
+                            wire += r.num_bytes_downloaded
+                        cpu = process_cpu_seconds(pid) - cpu_before
+                    size = wire / args.requests
+                    identity_size = identity_size or size
+                    print(f"{endpoint:<22} {encoding:<9} {size:>10.0f} {size / identity_size:>6.2f} "
+                          f"{cpu / args.requests * 1e6:>11.0f}")
+                bodies[endpoint] = httpx.get(server.url + endpoint, headers={'Accept-Encoding': 'identity'}).content
+
+    print("\ncompressing on every request instead (µs per body):")
+    for endpoint, body in bodies.items():
+        timings = []
+        for encoding, best in (('gzip', False), ('br', False), ('gzip', True), ('br', True)):
+            start = time.perf_counter()
+            for _ in range(50):
+                compress(body, encoding, best=best)
+            timings.append(f"{encoding}{'-max' if best else ''} {(time.perf_counter() - start) / 50 * 1e6:.0f}")
+        print(f"  {endpoint:<22} {len(body):>6} B: " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    main()
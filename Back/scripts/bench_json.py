@@ -0,0 +1,92 @@
+"""JSON encode/decode throughput on a large projects file.
+
+Builds `--projects` projects (10k by default) and times, for each step,
+the previous stdlib/pydantic path against the one the app uses now
+(`fast_json`, backend shown in the header):
+
+* the /api/projects body (with its ETag): pydantic validate + dump vs
+  `_projects_response_body`,
+  for a freshly loaded file and after a write that replaced one project
+  (records the previous version already checked are not checked again)
+* compact encoding (response bodies, journal lines)
+* parsing projects.json
+* writing projects.json (indent=2)
+
+    python scripts/bench_json.py --projects 10000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import fast_json  # noqa: E402
+import main  # noqa: E402
+from http_cache import CachedBody  # noqa: E402
+
+
+def _projects(count):
+    return [{
+        "title": f"Projeto {i}: aplicação de gestão",
+        "description": "Aplicação web com autenticação, painel de administração e API REST. " * 3,
+        "tech": ["React", "Node.js", "PostgreSQL", "Docker"][:1 + i % 4],
+        "repo": f"https://github.com/example/project-{i}",
+        "image": f"/assets/projects/{i}.png",
+        "id": f"p{i:012x}",
+    } for i in range(count)]
+
+
+def _best(fn, repeat, setup='pass'):
+    return min(timeit.repeat(fn, setup=setup, number=1, repeat=repeat))
+
+
+def _forget_checked():
+    main._is_stored_project._known = {}
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    projects = _projects(args.projects)
+    pretty = json.dumps(projects, ensure_ascii=False, indent=2).encode('utf-8')
+    adapter = main._projects_adapter
+    edited = projects[:]
+    edited[len(edited) // 2] = {**edited[len(edited) // 2], "title": "Editado"}
+    steps = [
+        ("/api/projects body",
+         lambda: CachedBody(adapter.dump_json(adapter.validate_python(projects))).body,
+         lambda: main._projects_response_body(projects).body, _forget_checked),
+        ("  after a 1-project PUT",
+         lambda: CachedBody(adapter.dump_json(adapter.validate_python(edited))).body,
+         lambda: main._projects_response_body(edited).body, 'pass'),
+        ("encode compact",
+         lambda: json.dumps(projects, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+         lambda: fast_json.dumps(projects), 'pass'),
+        ("parse projects.json",
+         lambda: json.loads(pretty),
+         lambda: fast_json.loads(pretty), 'pass'),
+        ("write projects.json",
+         lambda: json.dumps(projects, ensure_ascii=False, indent=2).encode('utf-8'),
+         lambda: fast_json.dumps_pretty(projects), 'pass'),
+    ]
+    if main._is_stored_project is None:
+        steps[0] = steps[0][:3] + ('pass',)
+    assert steps[0][1]() == steps[0][2](), "fast path must produce the same body"
+    assert fast_json.dumps_pretty(projects) == pretty, "data files must be byte-identical"
+
+    size = len(pretty) / 2**20
+    print(f"{args.projects} projects ({size:.1f} MB indented), backend: {fast_json.JSON_BACKEND}")
+    print(f"{'step':<24}{'before ms':>10}{'after ms':>10}{'MB/s after':>12}{'speedup':>9}")
+    for name, before, after, setup in steps:
+        old, new = _best(before, args.repeat), _best(after, args.repeat, setup)
+        print(f"{name:<24}{old * 1000:>10.1f}{new * 1000:>10.1f}{size / new:>12.0f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main_()
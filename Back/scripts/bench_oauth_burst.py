@@ -0,0 +1,89 @@
+"""Latency of GET /api/projects while OAuth callbacks are in flight.
+
+Starts a stub OAuth server (every upstream call takes `--upstream-delay`
+seconds) and the backend on local ports, measures /api/projects alone,
+then again while `--callbacks` GitHub/Google callback loops keep the
+upstream busy. With a non-blocking client the p99 should barely move;
+each upstream wait used to stall the whole event loop instead. The load
+generator, stub and backend are separate processes, but on a single core
+they still compete for CPU, so compare runs on the same machine.
+
+    python scripts/bench_oauth_burst.py --duration 5 --callbacks 50
+"""
+import argparse
+import asyncio
+import time
+import urllib.parse
+
+from bench_support import SubprocessServer, stub_oauth_env, summarize
+
+import httpx
+
+
+async def _read_load(client, url, duration, concurrency):
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            r = await client.get(url)
+            r.raise_for_status()
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def _callback_loop(client, base, provider, stop, done):
+    while not stop.is_set():
+        login = await client.get(f"{base}/api/auth/{provider}/login")
+        query = urllib.parse.urlsplit(login.json()["auth_url"]).query
+        state = urllib.parse.parse_qs(query)["state"][0]
+        r = await client.get(f"{base}/api/auth/{provider}/callback", params={"code": "stub", "state": state})
+        if "success=true" not in r.headers.get("location", ""):
+            raise RuntimeError(f"{provider} callback failed: {r.headers.get('location')}")
+        done[provider] += 1
+
+
+async def run(args):
+    stub_env = {'STUB_DELAY': str(args.upstream_delay)}
+    with SubprocessServer('bench_support:stub_oauth_app', env=stub_env, factory=True) as stub:
+        with SubprocessServer('main:app', env=stub_oauth_env(stub.url)) as backend:
+            limits = httpx.Limits(max_connections=args.concurrency + 2 * args.callbacks)
+            async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+                url = f"{backend.url}/api/projects"
+                await client.get(url)
+
+                idle = await _read_load(client, url, args.duration, args.concurrency)
+
+                stop = asyncio.Event()
+                done = {"github": 0, "google": 0}
+                loops = [
+                    asyncio.create_task(_callback_loop(client, backend.url, "github" if i % 2 == 0 else "google", stop, done))
+                    for i in range(args.callbacks)
+                ]
+                await asyncio.sleep(args.upstream_delay)
+                busy = await _read_load(client, url, args.duration, args.concurrency)
+                stop.set()
+                await asyncio.gather(*loops)
+
+    print(f"upstream delay: {args.upstream_delay * 1000:.0f} ms, callbacks in flight: {args.callbacks}")
+    print(f"callbacks completed: github={done['github']} google={done['google']}")
+    print(f"{'phase':<22}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, samples in (("projects alone", idle), ("projects + callbacks", busy)):
+        s = summarize(samples)
+        print(f"{name:<22}{s['count']:>10}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--concurrency', type=int, default=10, help='concurrent /api/projects clients')
+    parser.add_argument('--callbacks', type=int, default=50, help='concurrent OAuth callback loops')
+    parser.add_argument('--upstream-delay', type=float, default=0.2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
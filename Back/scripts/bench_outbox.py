@@ -0,0 +1,64 @@
+"""Write throughput of the outbox journal (group commit).
+
+Appends `--records` recommendations from `--concurrency` concurrent writers
+into a scratch journal and reports records/second and how many fsyncs
+were needed, then replays the file as a restart would.
+
+    python scripts/bench_outbox.py --records 20000 --concurrency 500
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox  # noqa: E402
+
+
+async def run(args):
+    scratch = tempfile.mkdtemp(prefix='bench-outbox-')
+    path = os.path.join(scratch, 'portfolio.outbox.jsonl')
+    try:
+        outbox = Outbox(path)
+        outbox.load()
+        queue = asyncio.Queue()
+        for i in range(args.records):
+            queue.put_nowait(i)
+
+        async def writer():
+            while not queue.empty():
+                i = queue.get_nowait()
+                await outbox.add_recommendation(f"user {i}", "great work", "https://avatars.example/a.png", f"user{i}", "github")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        assert len(outbox.recommendations().data) == args.records
+        print(f"appended {args.records} records with {args.concurrency} writers in {elapsed:.2f} s")
+        print(f"  {args.records / elapsed:,.0f} records/s, {outbox.journal.fsyncs} fsyncs "
+              f"({args.records / max(1, outbox.journal.fsyncs):.1f} records per fsync)")
+
+        start = time.perf_counter()
+        replayed = Outbox(path)
+        replayed.load()
+        elapsed = time.perf_counter() - start
+        assert len(replayed.recommendations().data) == args.records
+        print(f"replayed {replayed.journal.records} records in {elapsed * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Benchmark suite for the API, with a stored baseline and a regression gate.
+
+Imports `main.app` from a scratch copy of the backend and drives it
+in-process through `httpx.ASGITransport` (startup/shutdown hooks run as in
+production). The stub GitHub/Google OAuth server and an SMTP server
+(aiosmtpd) run locally in place of the real services. The groups are:
+
+  read      GET /api/projects, /api/skills, /api/recommendations, /api/stats, /cv
+  admin     project / skill mutations
+  upload    CV and hero image uploads
+  oauth     GitHub / Google login + callback, recommendations with a token
+  contact   POST /api/contact, until the SMTP stub has every message
+
+Each scenario records req/s, p50/p95/p99 latency and the peak RSS growth
+while it runs; it is repeated `--repeat` times and the fastest run is
+kept (with the largest RSS growth seen), which filters out most of the
+noise from other processes on the machine. Results are compared with `scripts/bench_baseline.json`:
+the run fails (exit 1) when req/s drops, or p95 grows, by more than
+`--threshold`, or memory grows by more than `--memory-slack-mb` over the
+baseline. Numbers are only comparable on the same machine, so record
+a baseline there first (the stored one comes from a shared 1-CPU dev VM,
+where run-to-run noise is still ~30%; raise `--repeat` or `--threshold`
+on machines like that):
+
+    python scripts/bench_suite.py --save-baseline
+    python scripts/bench_suite.py                  # compare, exit 1 on regression
+    python scripts/bench_suite.py --only read --scale 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import secrets
+import sys
+import threading
+import time
+import urllib.parse
+
+from bench_support import (StubSMTPServer, SubprocessServer, process_rss, scratch_backend,
+                           stub_oauth_env, summarize)
+
+import httpx
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+ADMIN_PASSWORD = 'bench'
+
+
+class Scenario:
+    def __init__(self, group, name, requests, concurrency, op):
+        self.group = group
+        self.name = name
+        self.requests = requests
+        self.concurrency = concurrency
+        self.op = op  # async (client, i) -> None, raises on failure
+
+
+def _check(r, *ok):
+    if r.status_code not in (ok or (200,)):
+        raise RuntimeError(f"{r.request.method} {r.request.url.path} -> {r.status_code}: {r.text[:200]}")
+    return r
+
+
+def _png_bytes():
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'\x89PNG\r\n\x1a\n' + b'\0' * 1024
+    buf = io.BytesIO()
+    Image.new('RGB', (1600, 900), (40, 90, 160)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def _scenarios(ctx):
+    admin = {'X-ADMIN-TOKEN': ctx['token']}
+    project = {"title": "Bench project", "description": "Created by the benchmark suite",
+               "tech": ["Python", "FastAPI"], "repo": "https://github.com/example/bench", "image": ""}
+    cv_body = b'%PDF-1.4\n' + b''.join(b'%d 0 obj << /Length 44 >> stream BT /F1 12 Tf ET endstream\n' % i
+                                       for i in range(16000))
+
+    def get(path, headers=None, ok=(200,)):
+        async def op(client, i):
+            _check(await client.get(path, headers=headers), *ok)
+        return op
+
+    def oauth_flow(provider):
+        async def op(client, i):
+            login = _check(await client.get(f'/api/auth/{provider}/login')).json()
+            state = urllib.parse.parse_qs(urllib.parse.urlsplit(login['auth_url']).query)['state'][0]
+            r = await client.get(f'/api/auth/{provider}/callback', params={'code': 'bench', 'state': state})
+            if 'success=true' not in r.headers.get('location', ''):
+                raise RuntimeError(f"{provider} callback failed: {r.headers.get('location')}")
+        return op
+
+    async def add_project(client, i):
+        _check(await client.post('/api/projects', json={**project, "title": f"Bench project {i}"}, headers=admin))
+
+    async def edit_project(client, i):
+        _check(await client.put(f'/api/projects/{i % 5}', json={**project, "title": f"Edited {i}"}, headers=admin))
+
+    async def delete_project(client, i):
+        _check(await client.delete('/api/projects/0', headers=admin))
+
+    async def add_skill(client, i):
+        # Skill names are unique per category, and runs repeat on the same data
+        skill = {"name": f"Bench skill {i}-{secrets.token_hex(4)}", "image": "https://cdn.jsdelivr.net/gh/devicons/devicon/icons/python/python-original.svg"}
+        _check(await client.post('/api/skills', json={"category": "bench", "skill": skill}, headers=admin))
+
+    async def batch(client, i):
+        operations = [{"op": "add_project", "project": {**project, "title": f"Batch {i}-{n}"}} for n in range(50)]
+        _check(await client.post('/api/admin/batch', json={"operations": operations}, headers=admin))
+
+    async def upload_cv(client, i):
+        _check(await client.post('/api/admin/upload-cv', headers=admin,
+                                 files={'file': ('cv.pdf', cv_body + b'%d' % i, 'application/pdf')}))
+
+    async def upload_hero(client, i):
+        _check(await client.post('/api/admin/upload-hero', headers=admin,
+                                 files={'file': ('hero.png', ctx['hero'], 'image/png')}))
+
+    async def recommendation(client, i):
+        _check(await client.post('/api/recommendations',
+                                  json={"text": f"Great work {i}", "github_token": f"bench-token-{i % 10}"}))
+
+    async def contact(client, i):
+        _check(await client.post('/api/contact', json={"name": f"Bench {i}", "email": "bench@example.com",
+                                                        "message": "Hello from the benchmark suite"}))
+
+    return [
+        Scenario('read', 'GET /api/projects', 3000, 20, get('/api/projects')),
+        Scenario('read', 'GET /api/projects (304)', 3000, 20,
+                 get('/api/projects', headers={'If-None-Match': ctx['projects_etag']}, ok=(304,))),
+        Scenario('read', 'GET /api/skills (br)', 3000, 20, get('/api/skills', headers={'Accept-Encoding': 'br'})),
+        Scenario('read', 'GET /api/recommendations', 3000, 20, get('/api/recommendations')),
+        Scenario('read', 'GET /api/stats', 3000, 20, get('/api/stats')),
+        Scenario('read', 'GET /cv/<fingerprint> (br)', 1000, 10,
+                 get(ctx['cv_url'], headers={'Accept-Encoding': 'br'})),
+        Scenario('admin', 'POST /api/projects', 300, 10, add_project),
+        Scenario('admin', 'PUT /api/projects/{index}', 300, 10, edit_project),
+        Scenario('admin', 'DELETE /api/projects/0', 300, 10, delete_project),
+        Scenario('admin', 'POST /api/skills', 300, 10, add_skill),
+        Scenario('admin', 'POST /api/admin/batch (50 adds)', 100, 5, batch),
+        Scenario('upload', 'POST /api/admin/upload-cv (1 MB)', 100, 2, upload_cv),
+        Scenario('upload', 'POST /api/admin/upload-hero', 100, 2, upload_hero),
+        Scenario('oauth', 'GitHub login + callback', 300, 20, oauth_flow('github')),
+        Scenario('oauth', 'Google login + callback', 300, 20, oauth_flow('google')),
+        Scenario('oauth', 'POST /api/recommendations', 500, 20, recommendation),
+        Scenario('contact', 'POST /api/contact', 500, 20, contact),
+    ]
+
+
+async def _run_scenario(client, scenario, scale):
+    total = max(1, int(scenario.requests * scale))
+    counter = iter(range(total))
+    samples = []
+    pid = os.getpid()
+    rss_before = process_rss(pid)
+    peak = [rss_before]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.is_set():
+            peak[0] = max(peak[0], process_rss(pid))
+            time.sleep(0.01)
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await scenario.op(client, i)
+            samples.append(time.perf_counter() - start)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    result = summarize(samples)
+    result.update(rps=len(samples) / elapsed, rss_growth_mb=(peak[0] - rss_before) / 2 ** 20)
+    return result
+
+
+async def _run(args, smtp):
+    import main  # from the scratch copy (first on sys.path)
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    await main.app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            token = _check(await client.post('/api/admin/login', json={'password': ADMIN_PASSWORD})).json()['token']
+            cv = _check(await client.post('/api/admin/upload-cv', headers={'X-ADMIN-TOKEN': token},
+                                          files={'file': ('cv.pdf', b'%PDF-1.4\n' + b'stream\n' * 50000,
+                                                          'application/pdf')})).json()['path']
+            etag = _check(await client.get('/api/projects')).headers['etag']
+            ctx = {'token': token, 'cv_url': cv, 'projects_etag': etag, 'hero': _png_bytes()}
+            # Let the CV precompression finish so /cv serves the .br sibling
+            await main.precompressor.join()
+
+            for scenario in _scenarios(ctx):
+                if args.only and scenario.group not in args.only:
+                    continue
+                runs = []
+                for _ in range(args.repeat):
+                    sent_before = len(smtp.messages)
+                    result = await _run_scenario(client, scenario, args.scale)
+                    if scenario.group == 'contact':
+                        # Include the time until the queue has handed everything to the SMTP server
+                        expected = sent_before + result['count']
+                        start = time.perf_counter()
+                        while len(smtp.messages) < expected and time.perf_counter() - start < 60:
+                            await asyncio.sleep(0.01)
+                        result['smtp_drain_s'] = time.perf_counter() - start
+                        result['smtp_delivered'] = len(smtp.messages) - sent_before
+                    runs.append(result)
+                    # Let background work (precompression, renditions) finish before the next run
+                    await main.precompressor.join()
+                    await main.hero_renditions.join()
+                result = dict(max(runs, key=lambda r: r['rps']))
+                result['rss_growth_mb'] = max(r['rss_growth_mb'] for r in runs)
+                results[scenario.name] = result
+                print(f"  {scenario.name:<36}{result['rps']:>9.0f}{result['p50_ms']:>9.2f}"
+                      f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['rss_growth_mb']:>9.1f}",
+                      file=sys.__stdout__, flush=True)
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+
+def _compare(results, baseline, threshold, memory_slack_mb):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['rps'] < base['rps'] * (1 - threshold):
+            regressions.append(f"{name}: {result['rps']:.0f} req/s vs {base['rps']:.0f} baseline")
+        # Ignore sub-millisecond wobble on very fast endpoints
+        if result['p95_ms'] > base['p95_ms'] * (1 + threshold) and result['p95_ms'] - base['p95_ms'] > 1.0:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms baseline")
+        if result['rss_growth_mb'] > base['rss_growth_mb'] + memory_slack_mb:
+            regressions.append(f"{name}: RSS +{result['rss_growth_mb']:.1f} MB vs +{base['rss_growth_mb']:.1f} MB baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', nargs='*', choices=('read', 'admin', 'upload', 'oauth', 'contact'))
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the request count of every scenario')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario (the fastest is kept)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression (0.25 = 25%%)')
+    parser.add_argument('--memory-slack-mb', type=float, default=8.0)
+    parser.add_argument('--upstream-delay', type=float, default=0.005, help='stub OAuth response delay (s)')
+    args = parser.parse_args()
+
+    stub_env = {'STUB_DELAY': str(args.upstream_delay)}
+    with SubprocessServer('bench_support:stub_oauth_app', env=stub_env, factory=True) as stub, \
+            StubSMTPServer() as smtp, scratch_backend() as backend_dir:
+        os.environ.update({
+            **stub_oauth_env(stub.url), **smtp.env(),
+            'ADMIN_PASSWORD': ADMIN_PASSWORD,
+            'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db'),
+            'SESSION_STORE': 'memory',
+            # Per-request INFO logs would measure the log pipeline, not the API
+            'LOG_LEVEL': 'WARNING',
+        })
+        sys.path.insert(0, backend_dir)
+        os.chdir(backend_dir)
+        print(f"{'scenario':<38}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'RSS +MB':>9}")
+        # Keep anything the app still writes out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(_run(args, smtp))
+
+    machine = {"python": platform.python_version(), "platform": platform.platform(),
+               "cpus": len(os.sched_getaffinity(0))}
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            rounded = {name: {k: round(v, 3) for k, v in r.items()} for name, r in results.items()}
+            json.dump({"machine": machine, "scenarios": rounded}, f, indent=2)
+            f.write('\n')
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline first")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        stored = json.load(f)
+    if stored.get("machine") != machine:
+        print(f"warning: baseline recorded on {stored.get('machine')}, this is {machine}")
+    regressions = _compare(results, stored["scenarios"], args.threshold, args.memory_slack_mb)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%} against {os.path.relpath(args.baseline)}")
+
+
+if __name__ == "__main__":
+    main()
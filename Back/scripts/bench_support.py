@@ -0,0 +1,296 @@
+"""Helpers shared by the benchmark scripts.
+
+Runs ASGI apps on local ports in background threads and provides stand-ins
+for the GitHub / Google OAuth endpoints, so the benchmarks never touch the
+real services.
+"""
+import asyncio
+import contextlib
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import uvicorn  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import JSONResponse, RedirectResponse, Response  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+
+class BackgroundServer:
+    """uvicorn serving `app` on 127.0.0.1 from a daemon thread."""
+
+    def __init__(self, app, **config):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        config.setdefault('log_level', 'warning')
+        self.server = uvicorn.Server(uvicorn.Config(app, **config))
+        self.thread = threading.Thread(target=self.server.run, kwargs={'sockets': [self.sock]}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class SubprocessServer:
+    """`uvicorn <target>` in its own process, so it does not share our GIL."""
+
+    def __init__(self, target, env=None, args=(), factory=False, cwd=BACKEND_DIR):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.cmd = [sys.executable, '-m', 'uvicorn', target, '--host', '127.0.0.1',
+                    '--port', str(self.port), '--log-level', 'warning', *args]
+        if factory:
+            self.cmd.append('--factory')
+        self.env = {**os.environ, **(env or {})}
+        self.env['PYTHONPATH'] = os.pathsep.join([cwd, os.path.dirname(os.path.abspath(__file__))])
+        self.cwd = cwd
+        self.proc = None
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(self.cmd, cwd=self.cwd, env=self.env,
+                                     stdout=subprocess.DEVNULL)
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited: {' '.join(self.cmd)}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"server did not start: {' '.join(self.cmd)}")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+class GunicornServer(SubprocessServer):
+    """`gunicorn -c gunicorn.conf.py <target>` (the production launcher) in its own process."""
+
+    def __init__(self, target, env=None, args=(), cwd=BACKEND_DIR):
+        super().__init__(target, env=env, cwd=cwd)
+        self.cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', target,
+                    '--bind', f'127.0.0.1:{self.port}', '--log-level', 'warning', *args]
+
+
+@contextlib.contextmanager
+def scratch_backend():
+    """A throwaway copy of the backend (code + data) so benchmarks never touch the real files."""
+    scratch = tempfile.mkdtemp(prefix='bench-backend-')
+    try:
+        for path in glob.glob(os.path.join(BACKEND_DIR, '*.py')):
+            shutil.copy(path, scratch)
+        shutil.copytree(os.path.join(BACKEND_DIR, 'data'), os.path.join(scratch, 'data'),
+                        ignore=shutil.ignore_patterns('*.lock', '.*.tmp'))
+        yield scratch
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def smtp_controller(handler, port, username, password):
+    """aiosmtpd `Controller` that, like a real provider, refuses mail before AUTH with `username`/`password`."""
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult, LoginPassword
+
+    def authenticator(server, session, envelope, mechanism, auth_data):
+        return AuthResult(success=isinstance(auth_data, LoginPassword)
+                          and auth_data.login == username.encode() and auth_data.password == password.encode())
+
+    return Controller(handler, hostname='127.0.0.1', port=port, authenticator=authenticator,
+                      auth_required=True, auth_require_tls=False)
+
+
+class StubSMTPServer:
+    """Local SMTP server (aiosmtpd) that requires AUTH and accepts every message into `messages`."""
+
+    def __init__(self):
+        self.messages = []
+        self.port = _free_port()
+        self.controller = smtp_controller(self, self.port, "bench@example.com", "bench")
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        return '250 OK'
+
+    def env(self):
+        """Environment that points `main` at this server (no STARTTLS, login as bench@example.com)."""
+        return {
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_STARTTLS": "0",
+            "SENDER_EMAIL": "bench@example.com",
+            "SENDER_PASSWORD": "bench",
+            "RECIPIENT_EMAIL": "inbox@example.com",
+        }
+
+    def __enter__(self):
+        self.controller.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.controller.stop()
+
+
+def process_rss(pid):
+    """Resident set size of `pid` in bytes (Linux)."""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU time consumed by `pid` so far, in seconds (Linux)."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def stub_oauth_app(delay=None):
+    """GitHub and Google OAuth endpoints that answer after `delay` seconds."""
+    if delay is None:
+        delay = float(os.getenv('STUB_DELAY', '0.2'))
+    counter = {'n': 0}
+
+    async def token(request):
+        await asyncio.sleep(delay)
+        counter['n'] += 1
+        return JSONResponse({"access_token": f"stub-token-{counter['n']}", "token_type": "bearer"})
+
+    async def github_user(request):
+        await asyncio.sleep(delay)
+        token = request.headers.get('authorization', '').split(' ')[-1]
+        return JSONResponse({
+            "login": f"user-{token}",
+            "name": "Stub User",
+            "avatar_url": "https://avatars.example/stub.png",
+            "email": "stub@example.com",
+        })
+
+    async def google_userinfo(request):
+        await asyncio.sleep(delay)
+        token = request.headers.get('authorization', '').split(' ')[-1]
+        return JSONResponse({
+            "id": token,
+            "name": "Stub Google User",
+            "email": "stub@example.com",
+            "picture": "https://avatars.example/google.png",
+            "verified_email": True,
+        })
+
+    return Starlette(routes=[
+        Route('/login/oauth/access_token', token, methods=['POST']),
+        Route('/user', github_user),
+        Route('/token', token, methods=['POST']),
+        Route('/userinfo', google_userinfo),
+    ])
+
+
+def stub_image_app(delay=None, size=None):
+    """A remote image host for the media proxy checks.
+
+    `/img/<name>` returns `size` bytes of "PNG" with an ETag (and answers
+    conditional requests); `?ex=expired` gets 404 like an expired Discord
+    link. `/redirect?to=` redirects, `/html` is not an image, `/big` is
+    10 MB. `/stats` reports how many image bodies were served per name.
+    """
+    if delay is None:
+        delay = float(os.getenv('STUB_DELAY', '0.05'))
+    if size is None:
+        size = int(os.getenv('STUB_IMAGE_SIZE', '20000'))
+    served = {}
+
+    async def image(request):
+        await asyncio.sleep(delay)
+        name = request.path_params['name']
+        if request.query_params.get('ex') == 'expired':
+            return Response(status_code=404)
+        etag = f'"{name}-v1"'
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers={'ETag': etag})
+        served[name] = served.get(name, 0) + 1
+        body = b'\x89PNG\r\n\x1a\n' + name.encode().ljust(size - 8, b'.')
+        return Response(body, media_type='image/png', headers={'ETag': etag})
+
+    async def redirect(request):
+        return RedirectResponse(request.query_params['to'], status_code=302)
+
+    async def html(request):
+        return Response('<script>alert(1)</script>', media_type='text/html')
+
+    async def big(request):
+        return Response(b'\0' * (10 * 2**20), media_type='image/png')
+
+    async def stats(request):
+        return JSONResponse(served)
+
+    return Starlette(routes=[
+        Route('/img/{name}', image),
+        Route('/redirect', redirect),
+        Route('/html', html),
+        Route('/big', big),
+        Route('/stats', stats),
+    ])
+
+
+def stub_oauth_env(base_url):
+    """Environment that points `main` at a `stub_oauth_app` server."""
+    return {
+        "GITHUB_CLIENT_ID": "stub-client",
+        "GITHUB_CLIENT_SECRET": "stub-secret",
+        "GITHUB_TOKEN_URL": f"{base_url}/login/oauth/access_token",
+        "GITHUB_USER_URL": f"{base_url}/user",
+        "GOOGLE_CLIENT_ID": "stub-client",
+        "GOOGLE_CLIENT_SECRET": "stub-secret",
+        "GOOGLE_TOKEN_URL": f"{base_url}/token",
+        "GOOGLE_USERINFO_URL": f"{base_url}/userinfo",
+    }
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(samples):
+    """p50/p95/p99/max in milliseconds for a list of durations in seconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": (max(samples) if samples else 0.0) * 1000,
+    }
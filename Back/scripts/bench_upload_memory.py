@@ -0,0 +1,71 @@
+"""Server memory while uploading a large CV.
+
+Starts the backend from a scratch copy, streams a `--size-mb` PDF to
+/api/admin/upload-cv and samples the server's RSS during the upload. With
+streaming uploads the peak should stay within a few MB of the idle RSS
+whatever the file size.
+
+    python scripts/bench_upload_memory.py --size-mb 200
+"""
+import argparse
+import os
+import threading
+import time
+
+from bench_support import SubprocessServer, process_rss, scratch_backend
+
+import httpx
+
+BOUNDARY = 'bench-upload-boundary'
+
+
+def _multipart_body(size, chunk=1024 * 1024):
+    yield (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="cv.pdf"\r\n'
+           f'Content-Type: application/pdf\r\n\r\n').encode()
+    block = b'%PDF' + b'0' * (chunk - 4)
+    remaining = size
+    while remaining > 0:
+        yield block[:min(chunk, remaining)]
+        remaining -= chunk
+    yield f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=200)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    env = {'ADMIN_PASSWORD': 'bench', 'MAX_UPLOAD_BYTES': str(size + 1024 * 1024)}
+    with scratch_backend() as backend_dir, SubprocessServer('main:app', env=env, cwd=backend_dir) as server:
+        with httpx.Client(base_url=server.url, timeout=600) as client:
+            token = client.post('/api/admin/login', json={'password': 'bench'}).json()['token']
+            idle_rss = process_rss(server.proc.pid)
+
+            peak = [idle_rss]
+            done = threading.Event()
+
+            def sample():
+                while not done.is_set():
+                    peak[0] = max(peak[0], process_rss(server.proc.pid))
+                    time.sleep(0.02)
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            start = time.perf_counter()
+            r = client.post('/api/admin/upload-cv', content=_multipart_body(size),
+                            headers={'X-ADMIN-TOKEN': token, 'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'})
+            elapsed = time.perf_counter() - start
+            done.set()
+            sampler.join()
+            r.raise_for_status()
+
+            stored = os.path.getsize(os.path.join(backend_dir, 'public', 'cv', 'Bernardo_Meneses.pdf'))
+
+    mb = 1024 * 1024
+    print(f"uploaded {args.size_mb} MB in {elapsed:.2f} s ({args.size_mb / elapsed:.0f} MB/s), stored {stored / mb:.1f} MB")
+    print(f"server RSS idle {idle_rss / mb:.1f} MB, peak {peak[0] / mb:.1f} MB (+{(peak[0] - idle_rss) / mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
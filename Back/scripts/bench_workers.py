@@ -0,0 +1,92 @@
+"""Throughput of GET /api/projects: single uvicorn process vs the gunicorn launcher.
+
+Runs the backend from a scratch copy as (1) `uvicorn main:app` (the old
+Dockerfile CMD), (2) gunicorn.conf.py with one worker and (3) with
+`--workers` workers, and drives each with `--connections` keep-alive
+connections spread over `--clients` load-generator processes for
+`--duration` seconds. The load generator speaks raw HTTP/1.1 to keep its
+own CPU cost low, but on a small machine it still shares the CPUs with
+the server, so compare runs on the same machine.
+
+    python scripts/bench_workers.py --duration 10 --workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+from bench_support import GunicornServer, SubprocessServer, scratch_backend, summarize
+
+
+async def _connection(port, path, deadline, samples):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: identity\r\n\r\n".encode()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            samples.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+def _client_process(port, path, connections, duration, queue):
+    async def run():
+        samples = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_connection(port, path, deadline, samples) for _ in range(connections)))
+        return samples
+    queue.put(asyncio.run(run()))
+
+
+def _load(port, path, args):
+    queue = multiprocessing.Queue()
+    per_client = max(1, args.connections // args.clients)
+    procs = [multiprocessing.Process(target=_client_process, args=(port, path, per_client, args.duration, queue))
+             for _ in range(args.clients)]
+    for p in procs:
+        p.start()
+    samples = []
+    for _ in procs:
+        samples.extend(queue.get())
+    for p in procs:
+        p.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--clients', type=int, default=2, help='load generator processes')
+    parser.add_argument('--workers', type=int, default=max(2, len(os.sched_getaffinity(0))))
+    args = parser.parse_args()
+
+    env = {'SESSION_STORE': 'sqlite'}
+    setups = [
+        ("uvicorn, 1 process", lambda d: SubprocessServer('main:app', env=env, cwd=d)),
+        ("gunicorn, 1 worker", lambda d: GunicornServer('main:app', env={**env, 'WEB_CONCURRENCY': '1'}, cwd=d)),
+        (f"gunicorn, {args.workers} workers",
+         lambda d: GunicornServer('main:app', env={**env, 'WEB_CONCURRENCY': str(args.workers)}, cwd=d)),
+    ]
+    print(f"CPUs available: {len(os.sched_getaffinity(0))}, {args.connections} connections, {args.duration:.0f} s")
+    print(f"{'setup':<24}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, make_server in setups:
+        with scratch_backend() as backend_dir, make_server(backend_dir) as server:
+            _load(server.port, '/api/projects', argparse.Namespace(**{**vars(args), 'duration': 1.0}))  # warm-up
+            samples = _load(server.port, '/api/projects', args)
+        s = summarize(samples)
+        print(f"{name:<24}{len(samples) / args.duration:>10.0f}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
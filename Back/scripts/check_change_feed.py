@@ -0,0 +1,121 @@
+"""Cost of idle /api/events subscribers and fan-out latency.
+
+Opens `--subscribers` SSE streams on one worker, then reports:
+
+1. the server RSS per subscriber, and its CPU use while they only receive
+   heartbeats (`EVENTS_HEARTBEAT`=`--heartbeat`);
+2. the time until every subscriber has received the event of one admin
+   write (POST /api/projects);
+3. that a reconnect with `Last-Event-ID` replays the missed event, and
+   that an unknown id gets a `reset` event;
+4. that a write handled by a second backend process on the same data
+   (another worker) reaches the first one's subscribers;
+5. how long a SIGTERM takes with streams still open
+   (`--timeout-graceful-shutdown`, as uvicorn_worker.py sets it).
+
+    python scripts/check_change_feed.py --subscribers 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench_support import SubprocessServer, process_cpu_seconds, process_rss, scratch_backend
+
+import httpx
+
+
+async def _subscribe(port, last_event_id=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    extra = f"Last-Event-ID: {last_event_id}\r\n" if last_event_id else ""
+    writer.write(f"GET /api/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n{extra}\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def _read_event(reader, name):
+    """Read until an event called `name`; returns its id."""
+    event_id = None
+    while True:
+        line = (await reader.readline()).decode()
+        if line.startswith("id: "):
+            event_id = line[4:].strip()
+        elif line.strip() == f"event: {name}":
+            return event_id
+
+
+async def _run(args, server, other):
+    streams = []
+    for start in range(0, args.subscribers, 500):
+        streams += await asyncio.gather(*(_subscribe(server.port) for _ in range(start, min(start + 500, args.subscribers))))
+    await asyncio.sleep(1)
+    rss_idle = process_rss(server.proc.pid)
+    cpu = process_cpu_seconds(server.proc.pid)
+    await asyncio.sleep(args.heartbeat * 3)
+    cpu = process_cpu_seconds(server.proc.pid) - cpu
+    print(f"{args.subscribers} idle subscribers: RSS {rss_idle / 2**20:.1f} MB "
+          f"({(rss_idle - args.rss_before) / args.subscribers / 1024:.1f} KB each), "
+          f"CPU {cpu / (args.heartbeat * 3) * 100:.1f}% over {args.heartbeat * 3:.0f}s of heartbeats")
+
+    async with httpx.AsyncClient(base_url=server.url) as client:
+        token = (await client.post('/api/admin/login', json={'password': 'bench'})).json()['token']
+        # One stream reads only up to the first heartbeat, to resume from there afterwards
+        reader, _ = streams[0]
+        await reader.readuntil(b": heartbeat\n\n")
+        started = time.perf_counter()
+        r = await client.post('/api/projects', headers={'X-ADMIN-TOKEN': token}, json={
+            'title': 'Feed', 'description': 'd', 'tech': ['Go'], 'repo': 'r', 'image': 'i'})
+        r.raise_for_status()
+        ids = await asyncio.gather(*(_read_event(reader, 'projects') for reader, _ in streams))
+        elapsed = time.perf_counter() - started
+        print(f"write -> all {len(ids)} subscribers notified in {elapsed * 1000:.0f} ms "
+              f"(same event id everywhere: {len(set(ids)) == 1})")
+
+    epoch, seq = ids[0].split('-')
+    reader, writer = await _subscribe(server.port, f"{epoch}-{int(seq) - 1}")
+    replayed = await asyncio.wait_for(_read_event(reader, 'projects'), 5)
+    writer.close()
+    reader, writer = await _subscribe(server.port, "stale-1")
+    await asyncio.wait_for(_read_event(reader, 'reset'), 5)
+    writer.close()
+    print(f"resume with Last-Event-ID: replayed {replayed}; unknown id -> reset")
+
+    async with httpx.AsyncClient(base_url=other.url) as client:
+        token = (await client.post('/api/admin/login', json={'password': 'bench'})).json()['token']
+        started = time.perf_counter()
+        r = await client.post('/api/projects', headers={'X-ADMIN-TOKEN': token}, json={
+            'title': 'Other worker', 'description': 'd', 'tech': ['Go'], 'repo': 'r', 'image': 'i'})
+        r.raise_for_status()
+        await asyncio.gather(*(_read_event(reader, 'projects') for reader, _ in streams))
+        print(f"write on another process -> all {len(streams)} subscribers notified in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    server.proc.terminate()
+    await asyncio.to_thread(server.proc.wait, 30)
+    print(f"SIGTERM with {len(streams)} open streams: exited in {time.perf_counter() - started:.1f} s")
+    for _, writer in streams:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--heartbeat', type=float, default=2.0)
+    parser.add_argument('--graceful-timeout', type=int, default=5)
+    args = parser.parse_args()
+
+    with scratch_backend() as backend_dir:
+        env = {'ADMIN_PASSWORD': 'bench', 'LOG_LEVEL': 'WARNING', 'EVENTS_HEARTBEAT': str(args.heartbeat),
+               'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db'), 'SESSION_STORE': 'sqlite'}
+        shutdown = ('--timeout-graceful-shutdown', str(args.graceful_timeout))
+        with SubprocessServer('main:app', env=env, args=shutdown, cwd=backend_dir) as server, \
+                SubprocessServer('main:app', env=env, args=shutdown, cwd=backend_dir) as other:
+            time.sleep(0.5)
+            args.rss_before = process_rss(server.proc.pid)
+            asyncio.run(_run(args, server, other))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Exercise `mailer.MailQueue` against a local aiosmtpd server.
+
+Sends a burst of messages (they must all go over one SMTP session), then
+restarts the server so the session dies and checks that the queue
+reconnects and retries. The server requires AUTH, as real providers do,
+so the queue's login is exercised too. Needs `pip install aiosmtpd`.
+
+    python scripts/check_mail_queue.py --messages 50
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MAIL_RETRY_BASE", "0.05")
+
+from bench_support import smtp_controller  # noqa: E402
+from mailer import MailQueue, OutgoingMail  # noqa: E402
+
+
+class _Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        return '250 OK'
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def run(count):
+    inbox = _Inbox()
+    port = _free_port()
+    controller = smtp_controller(inbox, port, 'bench@example.com', 'bench')
+    controller.start()
+
+    results = []
+    queue = MailQueue('127.0.0.1', port, 'bench@example.com', 'bench', starttls=False,
+                      on_result=lambda mail, sent: results.append(sent))
+
+    start = time.perf_counter()
+    for i in range(count):
+        assert queue.enqueue(OutgoingMail('bench@example.com', 'me@example.com', f"Subject: {i}\r\n\r\nbody {i}"))
+    enqueue_time = time.perf_counter() - start
+    await _wait_for(lambda: len(results) == count)
+    drain_time = time.perf_counter() - start
+    print(f"burst: {count} messages enqueued in {enqueue_time * 1000:.1f} ms, delivered in {drain_time * 1000:.1f} ms")
+    print(f"  {queue.stats()}")
+    assert len(inbox.messages) == count and queue.connects == 1, "burst should reuse one SMTP session"
+
+    # Drop the session under the queue: the next send must reconnect
+    controller.stop()
+    controller = smtp_controller(inbox, port, 'bench@example.com', 'bench')
+    controller.start()
+    for i in range(5):
+        queue.enqueue(OutgoingMail('bench@example.com', 'me@example.com', f"Subject: late {i}\r\n\r\nbody"))
+    await _wait_for(lambda: len(results) == count + 5)
+    print(f"after server restart: {queue.stats()}")
+    assert queue.connects == 2 and all(results), "queue should reconnect and deliver everything"
+
+    await queue.stop()
+    controller.stop()
+    print("✅ OK")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=50)
+    asyncio.run(run(parser.parse_args().messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""/media/proxy against a local stub image host.
+
+Runs the backend with a small media cache and checks that:
+
+1. `--concurrency` simultaneous requests for an uncached image cause one
+   upstream fetch, and later requests are served from disk (with ETag,
+   304 on revalidation and long Cache-Control);
+2. a re-signed Discord-style link (other `ex`/`is`/`hm`) hits the same
+   entry, and once the signature has expired the cached copy is still
+   served;
+3. hosts outside the allowlist (directly or through a redirect), non-image
+   responses and oversized images are refused;
+4. the cache stays under MEDIA_CACHE_MAX_BYTES, evicting the least
+   recently used images first;
+5. with a second backend process sharing the cache directory (as gunicorn
+   workers do), images one evicts are fetched again by the other instead
+   of failing, and the limit holds for the directory as a whole.
+
+    python scripts/check_media_proxy.py --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench_support import SubprocessServer, scratch_backend
+
+import httpx
+
+IMAGE_SIZE = 20000
+
+
+def _cache_bytes(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if not name.endswith('.json'))
+    return total
+
+
+async def _run(args, backend, other, stub, cache_dir):
+    def proxied(path):
+        return {'url': f"{stub.url}{path}"}
+
+    async with httpx.AsyncClient(base_url=backend.url, timeout=30) as client, \
+            httpx.AsyncClient(base_url=stub.url) as upstream:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.get('/media/proxy', params=proxied('/img/logo'))
+                                           for _ in range(args.concurrency)))
+        miss = time.perf_counter() - started
+        fetched = (await upstream.get('/stats')).json().get('logo', 0)
+        print(f"{args.concurrency} concurrent misses: statuses {sorted({r.status_code for r in responses})}, "
+              f"{fetched} upstream fetch(es), {miss * 1000:.0f} ms")
+
+        started = time.perf_counter()
+        for _ in range(args.hits):
+            r = await client.get('/media/proxy', params=proxied('/img/logo'))
+        hit = (time.perf_counter() - started) / args.hits
+        revalidated = await client.get('/media/proxy', params=proxied('/img/logo'),
+                                       headers={'If-None-Match': r.headers['etag']})
+        print(f"hit: {hit * 1000:.2f} ms, {len(r.content)} bytes, {r.headers['content-type']}, "
+              f"Cache-Control '{r.headers['cache-control']}', If-None-Match -> {revalidated.status_code}, "
+              f"upstream fetches still {(await upstream.get('/stats')).json()['logo']}")
+
+        first = await client.get('/media/proxy', params=proxied('/img/attachment?ex=1&is=2&hm=aa&width=400'))
+        resigned = await client.get('/media/proxy', params=proxied('/img/attachment?ex=3&is=4&hm=bb&width=400'))
+        await asyncio.sleep(args.revalidate_after + 0.5)
+        expired = await client.get('/media/proxy', params=proxied('/img/attachment?ex=expired&is=5&hm=cc&width=400'))
+        print(f"signed link: {first.status_code}, re-signed {resigned.status_code}, expired {expired.status_code} "
+              f"(same bytes: {first.content == resigned.content == expired.content}); "
+              f"upstream fetches {(await upstream.get('/stats')).json()['attachment']}")
+
+        refused = {
+            'other host': (await client.get('/media/proxy', params={'url': 'http://169.254.169.254/latest'})).status_code,
+            'redirect out': (await client.get('/media/proxy', params=proxied(
+                '/redirect?to=http://127.0.0.2:9/img/x'))).status_code,
+            'html': (await client.get('/media/proxy', params=proxied('/html'))).status_code,
+            'too big': (await client.get('/media/proxy', params=proxied('/big'))).status_code,
+            'not http': (await client.get('/media/proxy', params={'url': 'file:///etc/passwd'})).status_code,
+        }
+        print(f"refused: {refused}")
+
+        for i in range(args.images):
+            (await client.get('/media/proxy', params=proxied(f'/img/fill{i}'))).raise_for_status()
+        before = (await upstream.get('/stats')).json()
+        await client.get('/media/proxy', params=proxied('/img/fill0'))
+        await client.get('/media/proxy', params=proxied(f'/img/fill{args.images - 1}'))
+        after = (await upstream.get('/stats')).json()
+        print(f"{args.images} images of {IMAGE_SIZE} bytes into a {args.max_bytes}-byte cache: "
+              f"{_cache_bytes(cache_dir)} bytes on disk; oldest refetched: {after['fill0'] > before['fill0']}, "
+              f"newest refetched: {after[f'fill{args.images - 1}'] > before[f'fill{args.images - 1}']}")
+
+        async with httpx.AsyncClient(base_url=other.url, timeout=30) as second:
+            # The second process indexes what is cached now, then the first one evicts it
+            cached = [i for i in range(args.images)
+                      if (await second.get('/media/proxy', params=proxied(f'/img/fill{i}'))).status_code == 200]
+            for i in range(args.images, 2 * args.images):
+                (await client.get('/media/proxy', params=proxied(f'/img/fill{i}'))).raise_for_status()
+            statuses = [(await second.get('/media/proxy', params=proxied(f'/img/fill{i}'))).status_code
+                        for i in cached]
+            print(f"two processes, one cache: {len(cached)} images evicted by the other process -> statuses "
+                  f"{sorted(set(statuses))}; {_cache_bytes(cache_dir)} bytes on disk (limit {args.max_bytes})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--hits', type=int, default=200)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--max-bytes', type=int, default=10 * IMAGE_SIZE)
+    parser.add_argument('--revalidate-after', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with SubprocessServer('bench_support:stub_image_app', env={'STUB_DELAY': '0.2',
+                                                               'STUB_IMAGE_SIZE': str(IMAGE_SIZE)},
+                          factory=True) as stub, scratch_backend() as backend_dir:
+        cache_dir = os.path.join(backend_dir, 'media_cache')
+        env = {'LOG_LEVEL': 'ERROR', 'MEDIA_CACHE_DIR': cache_dir, 'MEDIA_ALLOWED_HOSTS': f'127.0.0.1:{stub.port}',
+               'MEDIA_CACHE_MAX_BYTES': str(args.max_bytes), 'MEDIA_MAX_BYTES': str(2**20),
+               'MEDIA_REVALIDATE_AFTER': str(args.revalidate_after),
+               'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db')}
+        with SubprocessServer('main:app', env=env, cwd=backend_dir) as backend, \
+                SubprocessServer('main:app', env=env, cwd=backend_dir) as other:
+            asyncio.run(_run(args, backend, other, stub, cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""OAuth state handling across workers and under a login flood.
+
+1. For each SESSION_STORE backend, runs the backend with `--workers 2`
+   behind a stub OAuth server and completes `--logins` GitHub logins, each
+   login and callback on a fresh connection so they land on either
+   worker. With the memory store about half the callbacks should fail with
+   `invalid_state`; with the SQLite store none should.
+2. Floods a single worker (memory store, OAUTH_STATES_MAX=`--max-states`)
+   with `--flood` logins that never call back, and reports the store size
+   and server RSS: both should stay bounded.
+3. Pops the same SQLite states from several threads, each with its own
+   connection, with `DELETE ... RETURNING` and with the SELECT + DELETE
+   fallback used on SQLite < 3.35: every state must be handed out once.
+
+    python scripts/check_session_store.py --logins 200 --flood 50000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import urllib.parse
+
+from bench_support import SubprocessServer, process_rss, scratch_backend, stub_oauth_env
+from session_store import SQLITE_HAS_RETURNING, SqliteSessionStore
+
+import httpx
+
+
+def _cross_worker_logins(backend_url, count):
+    failed = 0
+    for _ in range(count):
+        # New connection per request, so the kernel spreads them over the workers
+        login = httpx.get(f"{backend_url}/api/auth/github/login", headers={'Connection': 'close'})
+        state = urllib.parse.parse_qs(urllib.parse.urlsplit(login.json()["auth_url"]).query)["state"][0]
+        r = httpx.get(f"{backend_url}/api/auth/github/callback", params={"code": "stub", "state": state},
+                      headers={'Connection': 'close'})
+        if "success=true" not in r.headers.get("location", ""):
+            failed += 1
+    return failed
+
+
+def _concurrent_pops(returning, states=500, threads=8):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sessions.db')
+        stores = [SqliteSessionStore(path, 'oauth', returning=returning) for _ in range(threads)]
+        for i in range(states):
+            stores[0].put(f"state-{i}", i, ttl=60)
+        won = [[] for _ in stores]
+
+        def consume(store, results):
+            for i in range(states):
+                if store.pop(f"state-{i}") is not None:
+                    results.append(i)
+
+        workers = [threading.Thread(target=consume, args=pair) for pair in zip(stores, won)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        for store in stores:
+            store.close()
+    handed_out = sorted(i for results in won for i in results)
+    return handed_out == list(range(states)), len(handed_out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--flood', type=int, default=50000)
+    parser.add_argument('--max-states', type=int, default=10000)
+    args = parser.parse_args()
+
+    with SubprocessServer('bench_support:stub_oauth_app', env={'STUB_DELAY': '0'}, factory=True) as stub:
+        for backend in ('memory', 'sqlite'):
+            with scratch_backend() as backend_dir:
+                env = {**stub_oauth_env(stub.url), 'SESSION_STORE': backend,
+                       'SESSION_DB_PATH': os.path.join(backend_dir, 'sessions.db'),
+                       'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db')}
+                with SubprocessServer('main:app', env=env, args=('--workers', '2'), cwd=backend_dir) as server:
+                    failed = _cross_worker_logins(server.url, args.logins)
+            print(f"{backend:<7} 2 workers: {args.logins - failed}/{args.logins} callbacks accepted, "
+                  f"{failed} rejected as invalid_state")
+
+    with scratch_backend() as backend_dir:
+        env = {'ADMIN_PASSWORD': 'bench', 'GITHUB_CLIENT_ID': 'stub-client', 'SESSION_STORE': 'memory',
+               'OAUTH_STATES_MAX': str(args.max_states), 'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db')}
+        with SubprocessServer('main:app', env=env, cwd=backend_dir) as server, \
+                httpx.Client(base_url=server.url) as client:
+            token = client.post('/api/admin/login', json={'password': 'bench'}).json()['token']
+            rss_before = process_rss(server.proc.pid)
+            for i in range(args.flood):
+                client.get('/api/auth/github/login').raise_for_status()
+                if (i + 1) % (args.flood // 4 or 1) == 0:
+                    stats = client.get('/api/admin/sessions', headers={'X-ADMIN-TOKEN': token}).json()['oauth_states']
+                    rss = process_rss(server.proc.pid)
+                    print(f"flood {i + 1:>7} logins: {stats['size']} states kept, {stats['evicted']} evicted, "
+                          f"RSS {rss / 2**20:.1f} MB (+{(rss - rss_before) / 2**20:.1f} MB)")
+
+    for returning in (True, False):
+        if returning and not SQLITE_HAS_RETURNING:
+            continue
+        once, count = _concurrent_pops(returning)
+        label = "DELETE ... RETURNING" if returning else "SELECT + DELETE"
+        print(f"{label:<20} concurrent pops: {count} states handed out, {'each once' if once else 'DUPLICATES'}")
+        assert once
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Per-category and single-skill reads, with names that contain "/".
+
+Runs the backend on a scratch copy of the data and checks that:
+
+1. GET /api/skills/{category} lists the category's skills;
+2. GET /api/skills/{category}/{name} finds every skill in data/skills.json,
+   including "Sass/SCSS" (both as-is and with the "/" percent-encoded);
+3. a rename through PUT /api/skills is readable under the new name (also
+   one with a "/") and 404s under the old one.
+
+    python scripts/check_skill_routes.py
+"""
+import os
+import urllib.parse
+
+from bench_support import SubprocessServer, scratch_backend
+
+import httpx
+
+
+def main():
+    with scratch_backend() as backend_dir:
+        env = {'ADMIN_PASSWORD': 'bench', 'LOG_LEVEL': 'WARNING',
+               'DATABASE_PATH': os.path.join(backend_dir, 'portfolio.db')}
+        with SubprocessServer('main:app', env=env, cwd=backend_dir) as server, \
+                httpx.Client(base_url=server.url) as client:
+            skills = client.get('/api/skills').json()
+            missing = []
+            for category, items in skills.items():
+                listed = client.get(f'/api/skills/{category}')
+                assert listed.status_code == 200 and listed.json() == items, category
+                for skill in items:
+                    r = client.get(f"/api/skills/{category}/{skill['name']}")
+                    if r.status_code != 200 or r.json() != skill:
+                        missing.append((category, skill['name'], r.status_code))
+            print(f"{sum(map(len, skills.values()))} skills in {len(skills)} categories; not found: {missing}")
+            assert not missing
+
+            category = next(c for c, items in skills.items() if any(s['name'] == 'Sass/SCSS' for s in items))
+            raw = client.get(f'/api/skills/{category}/Sass/SCSS')
+            encoded = client.get(f"/api/skills/{category}/{urllib.parse.quote('Sass/SCSS', safe='')}")
+            print(f"Sass/SCSS: {raw.status_code}, percent-encoded: {encoded.status_code}")
+            assert raw.status_code == encoded.status_code == 200 and raw.json()['name'] == 'Sass/SCSS'
+
+            token = client.post('/api/admin/login', json={'password': 'bench'}).json()['token']
+            renamed = {**raw.json(), 'name': 'Sass/SCSS/Less'}
+            client.put('/api/skills', headers={'X-ADMIN-TOKEN': token},
+                       json={'category': category, 'name': 'Sass/SCSS', 'skill': renamed}).raise_for_status()
+            new = client.get(f'/api/skills/{category}/Sass/SCSS/Less')
+            old = client.get(f'/api/skills/{category}/Sass/SCSS')
+            print(f"after rename: new name {new.status_code}, old name {old.status_code}")
+            assert new.status_code == 200 and new.json() == renamed and old.status_code == 404
+    print("✅ OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Stress test for the admin write path (`JsonDocument.transaction`).
+
+Runs several worker processes against a scratch copy of `data/`, each one
+firing many concurrent mutations, while a reader thread keeps parsing the
+file and reading snapshots. Fails if any update is lost or if a reader
+ever sees a partially written file.
+
+    python scripts/stress_admin_writes.py --processes 4 --mutations 200
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_store import ContentStore  # noqa: E402
+
+
+async def _mutate(store, worker, count):
+    async def add(i):
+        async with store.projects.transaction() as projects:
+            projects.append({
+                "title": f"stress-{worker}-{i}",
+                "description": "stress",
+                "tech": ["Python"],
+                "repo": "",
+                "image": "",
+            })
+        # Interleave skill edits so both documents are under contention
+        async with store.skills.transaction() as skills:
+            stress = skills.setdefault('stress', {})
+            stress[f"s-{worker}-{i}"] = {"name": f"s-{worker}-{i}", "image": ""}
+            if len(stress) > 1:
+                del stress[next(iter(stress))]
+
+    await asyncio.gather(*(add(i) for i in range(count)))
+
+
+def _worker(data_dir, worker, count):
+    asyncio.run(_mutate(ContentStore(data_dir), worker, count))
+
+
+def _reader(data_dir, stop, errors):
+    store = ContentStore(data_dir)
+    path = os.path.join(data_dir, 'projects.json')
+    last = 0
+    while not stop.is_set():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+        except ValueError as e:
+            errors.append(f"torn read: {e}")
+        size = len(store.projects.data)
+        if size < last:
+            errors.append(f"snapshot went backwards: {last} -> {size}")
+        last = size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--mutations', type=int, default=200, help='concurrent mutations per process')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    scratch = tempfile.mkdtemp(prefix='stress-data-')
+    try:
+        for name in ('projects.json', 'skills.json'):
+            shutil.copy(os.path.join(here, 'data', name), scratch)
+        initial = len(ContentStore(scratch).projects.data)
+
+        stop = threading.Event()
+        errors = []
+        reader = threading.Thread(target=_reader, args=(scratch, stop, errors))
+        reader.start()
+
+        procs = [multiprocessing.Process(target=_worker, args=(scratch, w, args.mutations)) for w in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        stop.set()
+        reader.join()
+
+        with open(os.path.join(scratch, 'projects.json'), 'r', encoding='utf-8') as f:
+            projects = json.load(f)
+        expected = {f"stress-{w}-{i}" for w in range(args.processes) for i in range(args.mutations)}
+        found = {p['title'] for p in projects if p['title'].startswith('stress-')}
+        lost = expected - found
+
+        print(f"projects: {initial} -> {len(projects)} (expected {initial + len(expected)})")
+        print(f"lost updates: {len(lost)}")
+        print(f"reader errors: {len(errors)}")
+        for e in errors[:5]:
+            print(f"  {e}")
+        if lost or errors or any(p.exitcode != 0 for p in procs):
+            print("❌ FAILED")
+            sys.exit(1)
+        print("✅ OK")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
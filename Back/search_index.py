@@ -0,0 +1,207 @@
+"""Full-text search over projects and skills (`GET /api/search`).
+
+`SearchIndex` is an in-memory inverted index (term -> {doc: weighted term
+frequency}) ranked with BM25. Fields are weighted by repeating their
+terms (title and skill names count more than descriptions). Every query
+term is also a prefix: it expands to the indexed terms that start with it
+(through a sorted term list), with a lower weight than an exact match, so
+"fla" already finds Flutter while the visitor is still typing.
+
+`ContentSearch` keeps the index in step with projects.json and
+skills.json: it subscribes to both documents and, for every new snapshot,
+diffs the old and new entries by their stable keys (project id; category
+and skill name), re-indexing only the entries that changed and dropping
+only what was removed. Nothing is ever rebuilt from scratch.
+"""
+import bisect
+import collections
+import math
+import os
+import re
+import threading
+import unicodedata
+
+from content_store import project_positions
+
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+# Indexed terms a single query prefix may expand to
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "50"))
+
+# Keeps "c++", "c#" and "f#" intact; "node.js" becomes "node", "js"
+_TOKEN_RE = re.compile(r"[a-z0-9]+[+#]*")
+
+PROJECT_FIELDS = (("title", 3), ("tech", 2), ("description", 1))
+SKILL_FIELDS = (("name", 3), ("category", 1))
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+class SearchIndex:
+    def __init__(self, k1=1.2, b=0.75, prefix_weight=0.6):
+        self.k1 = k1
+        self.b = b
+        self.prefix_weight = prefix_weight
+        self._docs = {}       # key -> (payload, length, terms)
+        self._postings = {}   # term -> {key: weighted tf}
+        self._terms = []      # sorted, for prefix lookups
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, key, fields, payload):
+        """Index `fields` ((text, weight) pairs) under `key`, replacing any previous version."""
+        frequencies = collections.Counter()
+        for text, weight in fields:
+            for term in tokenize(text):
+                frequencies[term] += weight
+        length = sum(frequencies.values())
+        with self._lock:
+            self._remove(key)
+            self._docs[key] = (payload, length, tuple(frequencies))
+            self._total_length += length
+            for term, tf in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                postings[key] = tf
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return
+        self._total_length -= entry[1]
+        # Only the postings of the doc's own terms are touched
+        for term in entry[2]:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def _expand(self, token):
+        """Indexed terms for a query token: itself (weight 1) and its extensions."""
+        start = bisect.bisect_left(self._terms, token)
+        expansions = []
+        for term in self._terms[start:start + SEARCH_MAX_EXPANSIONS + 1]:
+            if not term.startswith(token):
+                break
+            expansions.append((term, 1.0 if term == token else self.prefix_weight))
+        return expansions
+
+    def search(self, query, limit=10, kind=None):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            count = len(self._docs)
+            if not count:
+                return []
+            average = self._total_length / count
+            scores = collections.defaultdict(float)
+            for token in tokens:
+                best = {}
+                for term, weight in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, tf in postings.items():
+                        if kind is not None and key[0] != kind:
+                            continue
+                        length = self._docs[key][1]
+                        score = weight * idf * tf * (self.k1 + 1) / (
+                            tf + self.k1 * (1 - self.b + self.b * length / average))
+                        # A token counts once per doc, through its best-matching term
+                        if score > best.get(key, 0.0):
+                            best[key] = score
+                for key, score in best.items():
+                    scores[key] += score
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [{**self._docs[key][0], "score": round(score, 4)} for key, score in ranked]
+
+
+def _project_document(project):
+    """(fields, payload) to index for one project."""
+    fields = []
+    for name, weight in PROJECT_FIELDS:
+        value = project.get(name)
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        if value:
+            fields.append((value, weight))
+    payload = {"type": "project", **{k: project.get(k) for k in ("id", "title", "description", "tech", "repo")}}
+    return fields, payload
+
+
+def _skill_document(category, skill):
+    fields = [(skill["name"], SKILL_FIELDS[0][1]), (category, SKILL_FIELDS[1][1])]
+    payload = {"type": "skill", "category": category, "name": skill["name"], "image": skill.get("image")}
+    return fields, payload
+
+
+def _unchanged(old, new):
+    # Entries a transaction did not touch are the same objects in both snapshots;
+    # a reload from disk builds new ones, compared by value
+    return old is new or old == new
+
+
+class ContentSearch:
+    """A `SearchIndex` kept up to date with the projects and skills documents."""
+
+    def __init__(self, content_store, index=None):
+        self.index = index or SearchIndex()
+        self.updates = 0
+        content_store.projects.subscribe(self._on_projects)
+        content_store.skills.subscribe(self._on_skills)
+        self._documents = content_store.documents()
+
+    def _on_projects(self, previous, snapshot):
+        # Keyed by the stable project id: an edit re-indexes that project only
+        old_projects = previous.data if previous else []
+        old_positions = previous.derive('positions', project_positions) if previous else {}
+        current = set()
+        for project in snapshot.data:
+            if not isinstance(project, dict):
+                continue
+            current.add(project['id'])
+            position = old_positions.get(project['id'])
+            if position is None or not _unchanged(old_projects[position], project):
+                self.index.add(("project", project['id']), *_project_document(project))
+        for project_id in old_positions.keys() - current:
+            self.index.remove(("project", project_id))
+        self.updates += 1
+
+    def _on_skills(self, previous, snapshot):
+        # Keyed by (category, key in the category): skills.json is already indexed that way
+        old_skills = previous.data if previous else {}
+        for category, items in snapshot.data.items():
+            old_items = old_skills.get(category, {})
+            for key, skill in items.items():
+                old = old_items.get(key)
+                if old is not None and _unchanged(old, skill):
+                    continue
+                if isinstance(skill, dict) and skill.get("name"):
+                    self.index.add(("skill", category, key), *_skill_document(category, skill))
+                else:
+                    self.index.remove(("skill", category, key))
+            for key in old_items.keys() - items.keys():
+                self.index.remove(("skill", category, key))
+        for category in old_skills.keys() - snapshot.data.keys():
+            for key in old_skills[category]:
+                self.index.remove(("skill", category, key))
+        self.updates += 1
+
+    def search(self, query, limit=10, kind=None):
+        for document in self._documents:
+            # Picks up edits made on disk (or by another worker) before searching
+            document.snapshot()
+        return self.index.search(query, limit=limit, kind=kind)
@@ -0,0 +1,249 @@
+"""Short-lived session state (OAuth `state` values, admin tokens).
+
+Two interchangeable stores behind the same small interface (`put`, `get`,
+`pop`, `delete`, `stats`, `close`):
+
+* `MemorySessionStore` — per-process, entries expire through a timing
+  wheel and the size is bounded (the soonest-to-expire entries are evicted
+  first), so a flood of logins that never call back cannot grow memory.
+  Only correct with a single worker.
+* `SqliteSessionStore` — a SQLite file (WAL) shared by every worker on the
+  machine, so a callback can land on any worker. `pop` is atomic, so a
+  state can only be consumed once. It only shares state between workers
+  on one machine: with several Fly machines a callback routed to another
+  machine still misses its state.
+
+`create_session_store` picks one from `SESSION_STORE` ("memory" or
+"sqlite"); values must be JSON-serializable.
+"""
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+# Granularity of the expiry wheel, in seconds
+SESSION_WHEEL_RESOLUTION = float(os.getenv("SESSION_WHEEL_RESOLUTION", "1"))
+# SQLite: purge expired rows (and enforce maxsize) every N writes
+SESSION_PURGE_EVERY = int(os.getenv("SESSION_PURGE_EVERY", "256"))
+# DELETE ... RETURNING needs SQLite 3.35 (older Python builds ship an older one)
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+class MemorySessionStore:
+    def __init__(self, maxsize=10000, resolution=SESSION_WHEEL_RESOLUTION, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self._clock = clock
+        self._entries = {}   # key -> (expires_at, value)
+        self._wheel = {}     # tick -> keys expiring during that tick
+        self._ticks = []     # heap of ticks present in _wheel
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _tick(self, expires_at):
+        return int(expires_at // self.resolution)
+
+    def _sweep(self, now):
+        """Drop every entry whose tick has fully passed (call with the lock held)."""
+        current = self._tick(now)
+        while self._ticks and self._ticks[0] < current:
+            for key in self._wheel.pop(heapq.heappop(self._ticks)):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self.expired += 1
+
+    def _evict_one(self):
+        """Remove the entry closest to expiry (call with the lock held)."""
+        while self._ticks:
+            bucket = self._wheel[self._ticks[0]]
+            while bucket:
+                key = bucket.pop()
+                entry = self._entries.get(key)
+                if entry is not None and self._tick(entry[0]) == self._ticks[0]:
+                    del self._entries[key]
+                    self.evicted += 1
+                    return
+            del self._wheel[heapq.heappop(self._ticks)]
+
+    def put(self, key, value, ttl):
+        now = self._clock()
+        expires_at = now + ttl
+        with self._lock:
+            self._sweep(now)
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                self._evict_one()
+            self._entries[key] = (expires_at, value)
+            tick = self._tick(expires_at)
+            bucket = self._wheel.get(tick)
+            if bucket is None:
+                bucket = self._wheel[tick] = set()
+                heapq.heappush(self._ticks, tick)
+            bucket.add(key)
+
+    def get(self, key, default=None):
+        now = self._clock()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                return default
+            return entry[1]
+
+    def pop(self, key, default=None):
+        """Remove and return `key` (None/`default` if missing or expired)."""
+        now = self._clock()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= now:
+                return default
+            # Its wheel slot is cleaned up lazily by _sweep
+            return entry[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(self._clock())
+            return len(self._entries)
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self), "maxsize": self.maxsize,
+                "expired": self.expired, "evicted": self.evicted}
+
+    def close(self):
+        pass
+
+
+class SqliteSessionStore:
+    def __init__(self, path, namespace, maxsize=10000, purge_every=SESSION_PURGE_EVERY, clock=time.time,
+                 returning=SQLITE_HAS_RETURNING):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.purge_every = purge_every
+        self._clock = clock
+        self.returning = returning
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writes = 0
+        self.expired = 0
+        self.evicted = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Throwaway connection: a connection must never be inherited by a forked worker
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (namespace, expires_at)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # One connection per thread (the event loop thread and the thread pool),
+        # opened lazily so that each (possibly forked) worker opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def put(self, key, value, ttl):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), self._clock() + ttl))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def get(self, key, default=None):
+        row = self._connect().execute(
+            "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, self._clock())).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def pop(self, key, default=None):
+        """Remove and return `key`; atomic across workers, so only one caller gets it."""
+        conn = self._connect()
+        if self.returning:
+            row = conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND key = ? RETURNING value, expires_at",
+                (self.namespace, key)).fetchone()
+        else:
+            # The write lock is taken up front, so no other worker can read the row in between
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value, expires_at FROM sessions WHERE namespace = ? AND key = ?",
+                                   (self.namespace, key)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM sessions WHERE namespace = ? AND key = ?", (self.namespace, key))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None or row[1] <= self._clock():
+            return default
+        return json.loads(row[0])
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM sessions WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def purge(self):
+        """Delete expired rows, then the soonest-to-expire ones beyond `maxsize`."""
+        conn = self._connect()
+        cur = conn.execute("DELETE FROM sessions WHERE namespace = ? AND expires_at <= ?",
+                           (self.namespace, self._clock()))
+        self.expired += cur.rowcount
+        cur = conn.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND key IN ("
+            " SELECT key FROM sessions WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.maxsize))
+        self.evicted += cur.rowcount
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM sessions WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, self._clock())).fetchone()[0]
+
+    def stats(self):
+        return {"backend": "sqlite", "size": len(self), "maxsize": self.maxsize,
+                "expired": self.expired, "evicted": self.evicted}
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_session_store(namespace, maxsize, path=None, backend=SESSION_STORE):
+    """Session store selected by `SESSION_STORE` ("memory" or "sqlite")."""
+    if backend == "memory":
+        return MemorySessionStore(maxsize=maxsize)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("SESSION_STORE=sqlite needs a database path")
+        return SqliteSessionStore(path, namespace, maxsize=maxsize)
+    raise ValueError(f"Unknown SESSION_STORE {backend!r} (expected 'memory' or 'sqlite')")
@@ -0,0 +1,39 @@
+"""Single flight: concurrent calls for the same key share one execution.
+
+Used by the caches in front of upstream services (`token_cache`,
+`media_proxy`): when several requests miss on the same key at once, only
+the first one calls upstream and the others wait for its result (or its
+exception).
+"""
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self.coalesced = 0
+        self._inflight = {}  # key -> asyncio.Future
+
+    async def run(self, key, call):
+        """`await call()`, unless a call for `key` is already running: then wait for that one."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved: nobody else may be waiting on this call
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
@@ -2,6 +2,8 @@ import uvicorn
 import os
 
 
-# Iniciar servidor
+# Servidor de desenvolvimento (um processo, auto-reload).
+# Em produção usar: gunicorn -c gunicorn.conf.py main:app
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="localhost", port=8000, reload=True)
+    # Streams SSE abertos (/api/events) não atrasam o reload mais do que isto
+    uvicorn.run("main:app", host="localhost", port=8000, reload=True, timeout_graceful_shutdown=5)
@@ -0,0 +1,298 @@
+"""Static serving for uploaded assets (`/cv`, `/hero`).
+
+`AssetFiles` is a drop-in `StaticFiles` that adds:
+
+* content-hashed URLs: `/cv/<fingerprint>/Bernardo_Meneses.pdf` is served
+  with `Cache-Control: immutable`; the plain URL stays revalidated
+  (`no-cache`), and a superseded fingerprint redirects to the current one;
+* precompressed `.br` / `.gz` siblings (built by `precompress` after an
+  upload), picked from `Accept-Encoding`. A sibling is only used while its
+  mtime matches the source, so a new upload never serves stale bytes;
+* single `Range` requests (206 / 416) on the identity file.
+
+Bodies are sent with the ASGI zero-copy extension when the server offers
+it, and otherwise read in chunks with `os.pread` in the thread pool.
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import stat
+import tempfile
+import threading
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import accepted_values
+
+try:
+    import brotli
+except ImportError:  # brotli not installed: only .gz siblings are built
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+ASSET_BROTLI_QUALITY = int(os.getenv("ASSET_BROTLI_QUALITY", "11"))
+ASSET_GZIP_LEVEL = int(os.getenv("ASSET_GZIP_LEVEL", "9"))
+
+# Sibling suffix per content-coding, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_COMPRESSIBLE = {"application/pdf", "application/json", "application/javascript", "image/svg+xml"}
+_FINGERPRINT_RE = re.compile(r"[0-9a-f]{16}")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+_fingerprints = {}  # path -> ((mtime_ns, size, ino), fingerprint)
+_fingerprints_lock = threading.Lock()
+
+
+def fingerprint(path, stat_result=None):
+    """Short content hash of `path` (memoized until the file changes)."""
+    st = stat_result or os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _fingerprints.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()[:16]
+    with _fingerprints_lock:
+        _fingerprints[path] = (signature, value)
+    return value
+
+
+def fingerprinted_url(prefix, path):
+    """`<prefix>/<fingerprint>/<file name>` for a file under a mounted directory."""
+    return f"{prefix}/{fingerprint(path)}/{os.path.basename(path)}"
+
+
+def is_compressible(path):
+    media_type = mimetypes.guess_type(path)[0] or ""
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE
+
+
+def precompress(path):
+    """Write `.br` / `.gz` siblings of `path`; returns the encodings written.
+
+    Siblings that do not save at least 5% are removed instead. Blocking:
+    run it in a thread.
+    """
+    if not is_compressible(path):
+        return []
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    written = []
+    for encoding, suffix in ENCODINGS:
+        sibling = path + suffix
+        if encoding == "br":
+            if brotli is None:
+                continue
+            body = brotli.compress(data, quality=ASSET_BROTLI_QUALITY)
+        else:
+            body = gzip.compress(data, compresslevel=ASSET_GZIP_LEVEL, mtime=0)
+        if len(body) > len(data) * 0.95:
+            _unlink(sibling)
+            continue
+        if os.stat(path).st_mtime_ns != st.st_mtime_ns:
+            # Replaced by a newer upload meanwhile; its own job writes the siblings
+            return written
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix="." + os.path.basename(sibling) + ".")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(body)
+            os.chmod(tmp, 0o644)
+            # Ties the sibling to this version of the source (checked when serving)
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp, sibling)
+        except BaseException:
+            _unlink(tmp)
+            raise
+        written.append(encoding)
+    return written
+
+
+class Precompressor:
+    """Runs `precompress` in the background, one job per file at a time.
+
+    Uploads that land while a file's job is running are folded into one
+    rerun, so a burst of uploads cannot pile compression jobs up in the
+    thread pool.
+    """
+
+    def __init__(self):
+        self._running = {}  # path -> task
+        self._rerun = set()
+
+    def schedule(self, path):
+        if path in self._running:
+            self._rerun.add(path)
+            return self._running[path]
+        task = asyncio.get_running_loop().create_task(self._run(path))
+        self._running[path] = task
+        return task
+
+    async def join(self):
+        """Wait until every scheduled job (and rerun) has finished."""
+        while self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def _run(self, path):
+        try:
+            while True:
+                self._rerun.discard(path)
+                try:
+                    encodings = await anyio.to_thread.run_sync(precompress, path)
+                    logger.info("Precompressed %s: %s", path, ", ".join(encodings) or "not worth it")
+                except Exception as e:
+                    logger.error("Could not precompress %s: %s", path, e)
+                if path not in self._rerun:
+                    break
+        finally:
+            del self._running[path]
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to ignore, or "unsatisfiable"."""
+    match = _RANGE_RE.fullmatch(header.strip())
+    if not match or not any(match.groups()):
+        # Malformed or multi-range: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+class AssetResponse(FileResponse):
+    """`FileResponse` for a byte range of a file, sent with zero-copy when available."""
+
+    def __init__(self, path, stat_result, offset=0, length=None, **kwargs):
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.offset = offset
+        self.length = stat_result.st_size - offset if length is None else length
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd,
+                            "offset": self.offset, "count": self.length, "more_body": False})
+                return
+            position, end = self.offset, self.offset + self.length
+            while position < end:
+                chunk = await anyio.to_thread.run_sync(
+                    os.pread, fd, min(self.chunk_size, end - position), position)
+                if not chunk:
+                    raise RuntimeError(f"File at path {self.path} was truncated while being sent.")
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": position < end})
+        finally:
+            os.close(fd)
+
+
+class AssetFiles(StaticFiles):
+    async def get_response(self, path, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        parts = path.split(os.sep)
+        requested = None
+        if len(parts) > 1 and _FINGERPRINT_RE.fullmatch(parts[0]):
+            requested, path = parts[0], os.path.join(*parts[1:])
+        # Upload temp files and lock files are never served
+        if any(part.startswith(".") for part in path.split(os.sep)):
+            raise HTTPException(status_code=404)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+
+        if requested is not None:
+            current = await anyio.to_thread.run_sync(fingerprint, full_path, stat_result)
+            if requested != current:
+                # Superseded upload: point at the current version (not cacheable)
+                url = f"{scope.get('root_path', '')}/{current}/{path.replace(os.sep, '/')}"
+                return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-cache"})
+        return await anyio.to_thread.run_sync(
+            self.asset_response, full_path, stat_result, scope, requested is not None)
+
+    def asset_response(self, full_path, stat_result, scope, immutable=False):
+        request_headers = Headers(scope=scope)
+        headers = {
+            "Cache-Control": f"public, max-age={ASSET_MAX_AGE}, immutable" if immutable else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        range_header = request_headers.get("range")
+
+        if range_header is None:
+            accepted = accepted_values(request_headers.get("accept-encoding"))
+            for encoding, suffix in ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    sibling = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                if sibling.st_mtime_ns != stat_result.st_mtime_ns:
+                    continue  # left over from a previous upload
+                response = AssetResponse(full_path + suffix, sibling, media_type=media_type,
+                                         headers={**headers, "Content-Encoding": encoding})
+                return self._not_modified_or(response, request_headers)
+
+        headers["Accept-Ranges"] = "bytes"
+        response = AssetResponse(full_path, stat_result, media_type=media_type, headers=headers)
+        if range_header is None or not self._if_range_matches(request_headers, response.headers):
+            return self._not_modified_or(response, request_headers)
+
+        size = stat_result.st_size
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return self._not_modified_or(response, request_headers)
+        if byte_range == "unsatisfiable":
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return AssetResponse(full_path, stat_result, offset=start, length=end - start + 1,
+                             status_code=206, media_type=media_type, headers=headers)
+
+    def _not_modified_or(self, response, request_headers):
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _if_range_matches(request_headers, response_headers):
+        validator = request_headers.get("if-range")
+        if validator is None:
+            return True
+        return validator.strip() in (response_headers.get("etag"), response_headers.get("last-modified"))
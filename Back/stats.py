@@ -0,0 +1,56 @@
+"""In-process counters behind `/api/stats`.
+
+The counters are bumped at the write sites, rebuilt once at startup from
+the content store and the outbox, and periodically reconciled against
+them (which also picks up writes made by other workers). Reading the
+stats never scans data: it returns a `Snapshot` memoized per version.
+"""
+import threading
+
+from content_store import Snapshot
+
+STATS_FIELDS = (
+    "recommendations_count",
+    "projects_count",
+    "contact_messages_count",
+    "sent_messages_count",
+)
+
+
+class StatsCounters:
+    def __init__(self, extra=None):
+        self._values = dict.fromkeys(STATS_FIELDS, 0)
+        # Static fields included in every snapshot (e.g. database_path)
+        self._extra = dict(extra or {})
+        self._version = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def add(self, field, delta=1):
+        with self._lock:
+            self._values[field] += delta
+            self._version += 1
+
+    def rebuild(self, values):
+        """Replace every counter with freshly computed `values`."""
+        with self._lock:
+            self._values.update((k, values[k]) for k in STATS_FIELDS)
+            self._version += 1
+
+    def reconcile(self, values):
+        """Compare with recomputed `values`, fix and return any drift."""
+        with self._lock:
+            drift = {k: values[k] - self._values[k] for k in STATS_FIELDS if values[k] != self._values[k]}
+            if drift:
+                self._values.update((k, values[k]) for k in drift)
+                self._version += 1
+            return drift
+
+    def snapshot(self):
+        current = self._snapshot
+        if current is not None and current.version == self._version:
+            return current
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != self._version:
+                self._snapshot = Snapshot({**self._values, **self._extra}, self._version, None)
+            return self._snapshot
@@ -0,0 +1,235 @@
+"""Structured (JSON) logging that never blocks the request path.
+
+`configure_logging` puts a single `QueueHandler` on the root logger (and on
+uvicorn's loggers): callers only append the record to a bounded in-memory
+queue, and a `QueueListener` thread formats it and writes it to stdout. If
+stdout stalls and the queue fills up, records are dropped and counted
+rather than making requests wait.
+
+Every record carries the id of the request it was logged from:
+`RequestIdMiddleware` takes `X-Request-ID` from the client (or generates
+one), stores it in a context variable, which follows the request into
+thread-pool work and `asyncio.to_thread`, and echoes it in the response.
+
+Configuration (environment):
+
+* `LOG_LEVEL` — minimum level (default INFO).
+* `LOG_FORMAT` — "json" (default) or "text" for local development.
+* `LOG_SAMPLE` — keep only a fraction of the records of noisy loggers,
+  e.g. `uvicorn.access=0.1,portfolio.contact=0.5`. Warnings and errors are
+  never sampled.
+* `LOG_QUEUE_SIZE` — records buffered before dropping (default 10000).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import secrets
+import sys
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Accept only ids that are safe to echo back and to put in a log line
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and extras."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid:
+            entry["request_id"] = rid
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every 1/rate records of the configured loggers (below WARNING)."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._seen = {}
+
+    @classmethod
+    def from_spec(cls, spec):
+        rates = {}
+        for part in spec.split(","):
+            name, _, rate = part.strip().partition("=")
+            if name and rate:
+                rates[name] = min(1.0, max(0.0, float(rate)))
+        return cls(rates)
+
+    def _rate(self, name):
+        while True:
+            rate = self.rates.get(name)
+            if rate is not None or not name:
+                return rate
+            name = name.rpartition(".")[0]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        # Deterministic: the n-th record passes when the running total crosses an integer
+        seen = self._seen.get(record.name, 0) + 1
+        self._seen[record.name] = seen
+        return int(seen * rate) != int((seen - 1) * rate)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue without blocking; everything that depends on the caller is resolved here."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Format the message and traceback now (the arguments may change after
+        # this call returns) and capture the request id of the calling context.
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, sample=LOG_SAMPLE, queue_size=LOG_QUEUE_SIZE,
+                      stream=None):
+    """Route the root and uvicorn loggers through the queue; idempotent."""
+    global _handler, _listener
+    if _handler is not None:
+        return _handler
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+    handler = AsyncQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(SamplingFilter.from_spec(sample))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    # uvicorn (and gunicorn's UvicornWorker) install their own stream handlers
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(name)
+        logger.handlers = [handler] if name != "uvicorn.error" else []
+        logger.propagate = name == "uvicorn.error"
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    _handler = handler
+    atexit.register(shutdown_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    return handler
+
+
+def _restart_after_fork():
+    """Give a forked child (gunicorn worker with preload) its own queue and listener.
+
+    Only the forking thread survives fork(), so the parent's listener is
+    gone in the child and nothing would drain the queue. The queue is
+    replaced too: its lock may have been held by that thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _handler.queue = queue.Queue(_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers,
+                                               respect_handler_level=_listener.respect_handler_level)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Write out whatever is still queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+class RequestIdMiddleware:
+    """Bind a request id to the request's context and echo it as `X-Request-ID`."""
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rid = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_RE.match(candidate):
+                    rid = candidate
+                break
+        if rid is None:
+            rid = secrets.token_hex(8)
+        token = request_id.set(rid)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), (self.header, rid.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
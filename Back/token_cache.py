@@ -0,0 +1,82 @@
+"""LRU + TTL cache for OAuth token -> user profile lookups.
+
+Entries are keyed by a SHA-256 of the provider and token, so raw tokens are
+never kept in memory longer than the request that carried them. Concurrent
+lookups for the same token share one upstream call (single flight), and
+only successful lookups are cached.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from single_flight import SingleFlight
+
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+
+def _token_key(provider, token):
+    return hashlib.sha256(f"{provider}:{token}".encode('utf-8')).hexdigest()
+
+
+class TokenProfileCache:
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, profile)
+        self._flights = SingleFlight()
+
+    async def get(self, provider, token, fetch):
+        """Return the cached profile for `token`, or `await fetch(token)` once.
+
+        `fetch` returns the normalized profile, or None when the token is
+        rejected (None is not cached).
+        """
+        key = _token_key(provider, token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        return await self._flights.run(key, lambda: self._lookup(key, token, fetch))
+
+    async def _lookup(self, key, token, fetch):
+        self.misses += 1
+        profile = await fetch(token)
+        if profile is not None:
+            self._store(key, profile)
+        return profile
+
+    @property
+    def coalesced(self):
+        return self._flights.coalesced
+
+    def put(self, provider, token, profile):
+        """Prime the cache, e.g. with the profile fetched during an OAuth callback."""
+        self._store(_token_key(provider, token), profile)
+
+    def invalidate(self, provider, token):
+        return self._entries.pop(_token_key(provider, token), None) is not None
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def _store(self, key, profile):
+        self._entries[key] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
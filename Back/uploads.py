@@ -0,0 +1,101 @@
+"""Streaming, size-limited saving of admin uploads (CV PDF, hero image).
+
+Uploads are copied chunk by chunk into a temp file next to the final path
+(disk writes run in the thread pool), and moved into place with
+`os.replace` once complete, so a half-uploaded file is never served.
+`UploadLimitMiddleware` rejects oversized bodies while they are still
+being received, before the multipart parser spools them to disk.
+"""
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_bytes):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {max_bytes} byte limit")
+
+
+async def save_upload(file: UploadFile, dest_path, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Stream `file` to `dest_path` atomically; returns the number of bytes written."""
+    directory = os.path.dirname(dest_path)
+    fd, tmp_path = await run_in_threadpool(
+        tempfile.mkstemp, dir=directory, prefix='.' + os.path.basename(dest_path) + '.', suffix='.part')
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await run_in_threadpool(out.write, chunk)
+            await run_in_threadpool(_flush_and_sync, out)
+        os.chmod(tmp_path, 0o644)
+        await run_in_threadpool(os.replace, tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def _flush_and_sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class UploadLimitMiddleware:
+    """Cap the request body size for the upload routes while it is in flight."""
+
+    def __init__(self, app, paths, max_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = tuple(paths)
+        self.limit = max_bytes
+        # Leave room for the multipart framing around the file itself
+        self.max_bytes = max_bytes + 64 * 1024
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await _send_413(send, self.limit)
+                return
+
+        received = 0
+        max_bytes, limit = self.max_bytes, self.limit
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Surfaces as a 413 through the app's exception handling
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def _send_413(send, max_bytes):
+    body = ('{"detail":"Upload exceeds the %d byte limit"}' % max_bytes).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close")],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,21 @@
+"""gunicorn worker class for the production launcher (see gunicorn.conf.py).
+
+`uvicorn.workers.UvicornWorker` with uvloop and httptools requested
+explicitly, so a missing dependency fails at startup instead of silently
+falling back to the pure-Python asyncio loop and h11 parser.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class PortfolioWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": os.getenv("UVICORN_LOOP", "uvloop"),
+        "http": os.getenv("UVICORN_HTTP", "httptools"),
+        # On shutdown uvicorn waits for open connections before running the
+        # app's shutdown hooks, and /api/events streams never end by
+        # themselves: past this many seconds they are cancelled, leaving the
+        # rest of gunicorn's graceful_timeout to flush the mail queue.
+        "timeout_graceful_shutdown": float(os.getenv("UVICORN_GRACEFUL_TIMEOUT", "5")),
+    }
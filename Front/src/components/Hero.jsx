@@ -5,11 +5,17 @@ import profileImage from '../assets/eu.jpg'
 import { API_URL } from '../config/api'
 import { useToast } from './ToastProvider'
 
+// Larguras renderizadas pelo backend (HERO_WIDTHS em image_renditions.py)
+const HERO_WIDTHS = [480, 768, 1080]
+
 const Hero = () => {
   const [adminToken, setAdminToken] = useState(null)
   const [uploading, setUploading] = useState(false)
   const { showToast } = useToast()
-  const [heroSrc, setHeroSrc] = useState(profileImage)
+  // Hero servido pelo backend em GET /hero, que escolhe formato (AVIF/WebP/JPEG) e largura;
+  // sem upload no backend (404) fica a imagem local
+  const [heroMissing, setHeroMissing] = useState(false)
+  const [heroVersion, setHeroVersion] = useState(null)
 
   useEffect(() => {
     if (typeof window !== 'undefined') setAdminToken(localStorage.getItem('admin_token'))
@@ -56,29 +62,13 @@ const Hero = () => {
     } finally { setUploading(false) }
   }
 
-  const checkBackendHero = async () => {
-    try {
-      const backendFallback = 'https://portfolio-backend-shy-butterfly-71.fly.dev'
-      const base = (API_URL && API_URL.startsWith('http')) ? API_URL.replace(/\/$/, '') : backendFallback
-      const exts = ['.jpg', '.jpeg', '.png', '.webp']
-      for (const ext of exts) {
-        try {
-          const res = await fetch(`${base}/hero/hero${ext}`, { method: 'HEAD' })
-          if (res.ok) {
-            setHeroSrc(`${base}/hero/hero${ext}`)
-            return
-          }
-        } catch (e) {
-          // ignore and try next
-        }
-      }
-      // fallback: keep local imported image
-      setHeroSrc(profileImage)
-    } catch (e) { setHeroSrc(profileImage) }
+  const heroUrl = (width) => {
+    const backendFallback = 'https://portfolio-backend-shy-butterfly-71.fly.dev'
+    const base = (API_URL && API_URL.startsWith('http')) ? API_URL.replace(/\/$/, '') : backendFallback
+    // t= só depois de um upload, para não reutilizar a versão anterior em cache
+    return `${base}/hero?w=${width}` + (heroVersion ? `&t=${heroVersion}` : '')
   }
 
-  useEffect(()=>{ checkBackendHero() }, [])
-
   const handleUploadHero = async (file) => {
     if (!file) return
     if (!/\.(jpg|jpeg|png|webp)$/i.test(file.name)) { showToast('Please select an image (jpg/png/webp)', { type: 'error' }); return }
@@ -99,11 +89,9 @@ const Hero = () => {
         showToast('Hero upload failed: ' + msg, { type: 'error' })
         return
       }
-      const j = await res.json()
-      // try to update displayed hero (append timestamp to bypass cache)
-      const path = j.path || '/hero/hero.jpg'
-      const url = (path.startsWith('http') ? path : `${base}${path}`) + '?t=' + Date.now()
-      setHeroSrc(url)
+      // reload /hero (the original upload is served until the renditions are ready)
+      setHeroVersion(Date.now())
+      setHeroMissing(false)
       showToast('Hero image uploaded successfully', { type: 'success' })
     } catch (err) {
       console.error('Hero upload error', err)
@@ -181,9 +169,12 @@ const Hero = () => {
               <div className="avatar">
                 <div className="avatar-inner">
                   <img 
-                    src={heroSrc} 
+                    src={heroMissing ? profileImage : heroUrl(HERO_WIDTHS[0])} 
+                    srcSet={heroMissing ? undefined : HERO_WIDTHS.map((w) => `${heroUrl(w)} ${w}w`).join(', ')}
+                    sizes="(max-width: 768px) 250px, 300px"
                     alt="Bernardo Meneses"
                     className="profile-image"
+                    onError={() => setHeroMissing(true)}
                   />
                 </div>
               </div>
@@ -73,7 +73,8 @@ const Portfolio = () => {
   }
 
   const startEditProject = (proj, idx) => {
-    setEditingIndex(idx)
+    // Projects are addressed by their stable id (list index only for older data)
+    setEditingIndex(proj.id ?? idx)
     setEditingProject({
       title: proj.title || '',
       description: proj.description || '',
@@ -177,7 +178,7 @@ const Portfolio = () => {
         <div className="ProjectsGrid">
           {projects.map((project, index) => (
             <ProjectCard
-              key={index}
+              key={project.id ?? index}
               title={project.title}
               description={project.description}
               repoLink={project.repo}
@@ -189,7 +190,7 @@ const Portfolio = () => {
                 const ok = await showConfirm(`Remove project ${project.title}?`, 'Remove project')
                 if (!ok) return
                 try {
-                  const res = await fetch(`${API_URL}/api/projects/${index}`, {
+                  const res = await fetch(`${API_URL}/api/projects/${project.id ?? index}`, {
                     method: 'DELETE',
                     headers: { 'X-ADMIN-TOKEN': adminToken || '' }
                   })
@@ -1,4 +1,5 @@
 import React from 'react';
+import { mediaUrl } from '../config/api';
 
 const ProjectCard = ({ title, description, repoLink, projectLink, image, tech, isAdmin = false, onDelete, onEdit }) => {
     return (
@@ -15,7 +16,7 @@ const ProjectCard = ({ title, description, repoLink, projectLink, image, tech, i
             )}
             {image && (
                 <div className="project-card-image">
-                    <img src={image} alt={title} />
+                    <img src={mediaUrl(image)} alt={title} />
                 </div>
             )}
             <div className="project-card-content">
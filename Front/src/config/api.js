@@ -5,3 +5,25 @@ const DEFAULT_FLY_URL = 'https://portfolio-backend-shy-butterfly-71.fly.dev'
 export const API_URL = import.meta.env.VITE_API_URL || (
   import.meta.env.PROD ? DEFAULT_FLY_URL : 'http://localhost:8000'
 );
+
+// Imagens remotas (Discord, GitHub, Google) passam pela cache do backend.
+// Só os hosts que o backend aceita (MEDIA_ALLOWED_HOSTS, mesma sintaxe:
+// "host", "host:porta" ou "*.dominio"); os restantes são carregados diretamente.
+const MEDIA_PROXY_HOSTS = (import.meta.env.VITE_MEDIA_PROXY_HOSTS ||
+  'cdn.discordapp.com,media.discordapp.net,avatars.githubusercontent.com,*.googleusercontent.com'
+).split(',').map((host) => host.trim().toLowerCase()).filter(Boolean);
+
+const isProxiedHost = ({ hostname, host }) => MEDIA_PROXY_HOSTS.some((pattern) => (
+  pattern.startsWith('*.') ? hostname.endsWith(pattern.slice(1)) : pattern === hostname || pattern === host
+));
+
+export const mediaUrl = (url) => {
+  if (!/^https?:\/\//i.test(url || '')) return url;
+  let parsed;
+  try {
+    parsed = new URL(url);
+  } catch {
+    return url;
+  }
+  return isProxiedHost(parsed) ? `${API_URL}/media/proxy?url=${encodeURIComponent(url)}` : url;
+};